@@ -1,57 +1,180 @@
 import time
 import logging
-from datetime import date
-from core.broker_interface import get_position, get_last_closed_order
-from core.journal_logger import get_open_trades, update_closed_trade
+import threading
+from datetime import date, datetime, timedelta
+from zoneinfo import ZoneInfo
+from core.config import resolve_path
+from core.broker_interface import settings, list_positions, list_closed_orders
+from core.journal_logger import get_open_trades, update_closed_trades, recover_journal
+from core.order_ledger import OrderLedger, TradeUpdateStream
+from core.logging_setup import setup_logging, log_event
 
-# Setup logging
 logger = logging.getLogger(__name__)
-logging.basicConfig(level=logging.INFO)
 
-def check_for_closed_trades():
+MARKET_TZ = ZoneInfo("America/New_York")
+
+# ------------------------------
+# Reconciliation helpers
+# ------------------------------
+
+def index_closed_orders(orders):
+    """
+    Index closed orders by id, and collect filled sell-side exits (bracket legs
+    or standalone orders) by symbol, newest first.
+    """
+    by_id = {}
+    exits_by_symbol = {}
+    for order in orders:
+        by_id[str(order.id)] = order
+        for leg in [order] + list(getattr(order, "legs", None) or []):
+            if leg.side == "sell" and leg.status == "filled" and leg.filled_avg_price is not None:
+                exits_by_symbol.setdefault(leg.symbol, []).append(leg)
+
+    for fills in exits_by_symbol.values():
+        fills.sort(key=lambda o: o.filled_at, reverse=True)
+    return by_id, exits_by_symbol
+
+
+def find_exit_fill(trade, by_id, exits_by_symbol, positions):
+    """The filled order that closed this journal trade, or None if it's still open."""
+    order_id = trade.get("order_id")
+
+    if order_id:
+        parent = by_id.get(order_id)
+        if parent is None:
+            return None  # entry hasn't filled yet, so the bracket isn't closed
+        for leg in getattr(parent, "legs", None) or []:
+            if leg.status == "filled" and leg.filled_avg_price is not None:
+                return leg
+        if parent.status in ("canceled", "expired", "rejected") and not float(parent.filled_qty or 0):
+            logger.warning(f"Entry order {order_id} for {trade['symbol']} ended {parent.status} without a fill")
+        return None
+
+    # Journal rows written before order ids were recorded: once the position is
+    # gone, take the latest filled exit for the symbol
+    if trade["symbol"] in positions:
+        return None
+    fills = exits_by_symbol.get(trade["symbol"])
+    return fills[0] if fills else None
+
+
+def _fill_date(filled_at):
+    """Market-timezone date of a fill time (a Timestamp, or an ISO string from the ledger)."""
+    try:
+        if isinstance(filled_at, str):
+            filled_at = datetime.fromisoformat(filled_at)
+        return filled_at.astimezone(MARKET_TZ).date()
+    except Exception:
+        return date.today()
+
+
+def _close_update(trade, price, filled_at):
+    symbol, qty, buy_price = trade["symbol"], trade["qty"], float(trade["buy_price"])
+    sell_price = round(float(price), 2)
+    net_pnl = round((sell_price - buy_price) * qty, 2)
+    net_roi = round(((sell_price - buy_price) / buy_price) * 100, 2)
+    logger.info(f"🔒 Trade closed: {symbol} | PnL: {net_pnl} | ROI: {net_roi}%")
+    log_event("closed", ref=trade["ref"], symbol=symbol, qty=qty, buy_price=buy_price,
+              sell_price=sell_price, net_pnl=net_pnl, filled_at=filled_at)
+    return {
+        "ref": trade["ref"],
+        "sell_date": _fill_date(filled_at),
+        "sell_price": sell_price,
+        "net_pnl": net_pnl,
+        "net_roi": net_roi
+    }
+
+# ------------------------------
+# Close check
+# ------------------------------
+
+def check_for_closed_trades(ledger=None, order_ids=None, poll_open=False):
+    """
+    Close out journal trades whose bracket exit has filled. Trades the
+    `ledger` has an exit fill for are answered from it; the rest cost a
+    positions snapshot and a closed-order history. With `poll_open` false,
+    trades the ledger knows but has no exit for are taken as still open
+    (the streamed close path); the periodic pass sets it, since fills made
+    while the stream was down are never replayed. `order_ids` limits the
+    pass to those entry orders.
+    """
     open_trades = get_open_trades()
+    if order_ids is not None:
+        open_trades = [t for t in open_trades if t.get("order_id") in order_ids]
     logger.info(f"Checking {len(open_trades)} open trades...")
+    if not open_trades:
+        return
+
+    updates = []
+    polled = []
+    for trade in open_trades:
+        if ledger is None or trade.get("order_id") not in ledger:
+            polled.append(trade)
+            continue
+        fill = ledger.exit_fill(trade["order_id"])
+        if fill is not None:
+            updates.append(_close_update(trade, fill["price"], fill["filled_at"]))
+        elif poll_open:
+            polled.append(trade)
+
+    if polled:
+        updates.extend(_poll_closed_trades(polled))
+
+    # All close-outs from this pass go to the DB as one batched UPDATE
+    update_closed_trades(updates)
+
 
+def _poll_closed_trades(open_trades):
+    """Close-out updates for trades found closed in the broker's order history."""
+    # One positions snapshot and one (paginated) closed-order history per pass
+    positions = list_positions()
+    if positions is None:
+        logger.warning("Couldn’t fetch positions, skipping this pass")
+        return []
+
+    earliest = min((t["date"] for t in open_trades if t.get("date")), default=date.today())
+    orders = list_closed_orders(after=f"{(earliest - timedelta(days=1)).isoformat()}T00:00:00Z")
+    if orders is None:
+        logger.warning("Couldn’t fetch closed orders, skipping this pass")
+        return []
+
+    by_id, exits_by_symbol = index_closed_orders(orders)
+    updates = []
     for trade in open_trades:
-        symbol = trade["symbol"]
-        ref = trade["ref"]
-        qty = trade["qty"]
-        buy_price = trade["buy_price"]
-
-        position = get_position(symbol)
-
-        if position is None:
-            # Trade is now closed, fetch order fill data instead of live price
-            order = get_last_closed_order(symbol)
-            if order is None:
-                logger.warning(f"Couldn’t fetch closed order for {symbol}")
-                continue
-
-            sell_price = round(float(order.filled_avg_price), 2)
-            net_pnl = round((sell_price - buy_price) * qty, 2)
-            net_roi = round(((sell_price - buy_price) / buy_price) * 100, 2)
-
-            update_data = {
-                "ref": ref,
-                "sell_date": date.today(),
-                "sell_price": sell_price,
-                "net_pnl": net_pnl,
-                "net_roi": net_roi
-            }
-
-            update_closed_trade(update_data)
-            logger.info(f"🔒 Trade closed: {symbol} | PnL: {net_pnl} | ROI: {net_roi}%")
-        else:
-            logger.debug(f"Still open: {symbol}")
-
-# Continuous loop
+        order = find_exit_fill(trade, by_id, exits_by_symbol, positions)
+        if order is None:
+            logger.debug(f"Still open: {trade['symbol']}")
+            continue
+        updates.append(_close_update(trade, order.filled_avg_price, order.filled_at))
+    return updates
+
+
+def start_trade_ledger():
+    """
+    Recover the order ledger from its log and keep it current from the trade
+    updates stream, closing each trade as soon as its exit fills. Returns the
+    ledger, or None when it's disabled (order_ledger_path: null).
+    """
+    if not settings.get("order_ledger_path"):
+        return None
+    ledger = OrderLedger(resolve_path(settings["order_ledger_path"])).recover()
+    listener = TradeUpdateStream(ledger, on_close=lambda order_id: check_for_closed_trades(ledger, {order_id}))
+    threading.Thread(target=listener.run, name="trade-updates", daemon=True).start()
+    return ledger
+
+
+# Continuous loop: exits are closed as their fills stream in; the periodic pass
+# catches trades opened before the ledger and anything missed while disconnected
 if __name__ == "__main__":
+    setup_logging()
+    recover_journal()
+    ledger = start_trade_ledger()
     while True:
         try:
             logger.info("Running close check...")
-            check_for_closed_trades()
+            check_for_closed_trades(ledger, poll_open=True)
         except Exception as e:
             logger.exception(f"Error during close check: {e}")
 
         logger.info("Sleeping for 60 seconds...")
-        time.sleep(60)
\ No newline at end of file
+        time.sleep(60)
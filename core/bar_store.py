@@ -0,0 +1,132 @@
+import os
+import datetime
+import logging
+import numpy as np
+import pytz
+
+logger = logging.getLogger(__name__)
+
+MARKET_TZ = pytz.timezone("America/New_York")
+
+# One fixed-width record per minute bar; `t` is the bar's UTC timestamp in epoch nanoseconds
+BAR_DTYPE = np.dtype([
+    ("t", "<i8"),
+    ("open", "<f8"),
+    ("high", "<f8"),
+    ("low", "<f8"),
+    ("close", "<f8"),
+    ("volume", "<f8"),
+])
+
+# ------------------------------
+# Append-only on-disk bar store
+# ------------------------------
+
+class BarStore:
+    """
+    Minute bars on local disk, one flat binary file per trading day and symbol:
+
+        <root>/<YYYY-MM-DD>/<SYMBOL>.bars
+
+    Files are arrays of BAR_DTYPE records in timestamp order. Writers only
+    append (a bar with the same timestamp as the last record overwrites it,
+    since the latest minute can still be forming). Readers get a read-only
+    np.memmap over the file, so nothing is copied until it's used.
+    """
+
+    def __init__(self, root):
+        self.root = root
+        self._last_ts = {}  # (symbol, day) -> last stored timestamp (ns)
+
+    def path(self, symbol, day):
+        return os.path.join(self.root, day.isoformat(), f"{symbol}.bars")
+
+    def days(self):
+        if not os.path.isdir(self.root):
+            return []
+        return sorted(datetime.date.fromisoformat(d) for d in os.listdir(self.root))
+
+    def symbols(self, day):
+        folder = os.path.join(self.root, day.isoformat())
+        if not os.path.isdir(folder):
+            return []
+        return sorted(f[:-len(".bars")] for f in os.listdir(folder) if f.endswith(".bars"))
+
+    # --- reading ---
+
+    def read(self, symbol, day):
+        """Read-only memmap of a day's bars (empty array if none are stored)."""
+        path = self.path(symbol, day)
+        n = os.path.getsize(path) // BAR_DTYPE.itemsize if os.path.exists(path) else 0
+        if n == 0:
+            return np.empty(0, dtype=BAR_DTYPE)
+        return np.memmap(path, dtype=BAR_DTYPE, mode="r", shape=(n,))
+
+    def read_frame(self, symbol, day, tail=None):
+        """A day's bars as a timestamp-indexed DataFrame, like one entry of a `get_bars_batch` panel."""
+        import pandas as pd  # not needed by readers of raw records, so kept off the import path
+        records = self.read(symbol, day)
+        if tail is not None:
+            records = records[-tail:]
+        frame = pd.DataFrame({name: records[name] for name in BAR_DTYPE.names[1:]})
+        frame.index = pd.DatetimeIndex(pd.to_datetime(records["t"], unit="ns", utc=True), name="timestamp")
+        return frame
+
+    def last_timestamp(self, symbol, day):
+        key = (symbol, day)
+        if key not in self._last_ts:
+            records = self.read(symbol, day)
+            self._last_ts[key] = int(records["t"][-1]) if len(records) else None
+        return self._last_ts[key]
+
+    # --- writing ---
+
+    def append(self, symbol, bars):
+        """Append a timestamp-indexed bar DataFrame, skipping bars already stored."""
+        if bars is None or bars.empty:
+            return 0
+
+        stamps = bars.index.tz_convert("UTC") if bars.index.tz is not None else bars.index.tz_localize("UTC")
+        records = np.empty(len(bars), dtype=BAR_DTYPE)
+        records["t"] = stamps.as_unit("ns").asi8
+        for name in BAR_DTYPE.names[1:]:
+            records[name] = bars[name].to_numpy(dtype=float)
+
+        written = 0
+        days = stamps.tz_convert(MARKET_TZ).date
+        for day in sorted(set(days)):
+            written += self._append_day(symbol, day, records[days == day])
+        return written
+
+    def append_bar(self, symbol, timestamp, open, high, low, close, volume):
+        import pandas as pd
+        ts = pd.Timestamp(timestamp)
+        ts = ts.tz_localize("UTC") if ts.tzinfo is None else ts.tz_convert("UTC")
+        record = np.array([(ts.value, open, high, low, close, volume)], dtype=BAR_DTYPE)
+        return self._append_day(symbol, ts.tz_convert(MARKET_TZ).date(), record)
+
+    def _append_day(self, symbol, day, records):
+        last = self.last_timestamp(symbol, day)
+        path = self.path(symbol, day)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+
+        if last is not None:
+            # The latest stored bar may have been captured mid-minute: rewrite it in place
+            revised = records[records["t"] == last]
+            if len(revised):
+                with open(path, "r+b") as f:
+                    f.seek(-BAR_DTYPE.itemsize, os.SEEK_END)
+                    f.write(revised[-1:].tobytes())
+            records = records[records["t"] > last]
+
+        if len(records) == 0:
+            return 0
+
+        with open(path, "ab") as f:
+            f.write(records.tobytes())
+        self._last_ts[(symbol, day)] = int(records["t"][-1])
+        return len(records)
+
+
+def market_today():
+    return datetime.datetime.now(MARKET_TZ).date()
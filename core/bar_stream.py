@@ -0,0 +1,80 @@
+import logging
+import pandas as pd
+from concurrent.futures import ThreadPoolExecutor
+from alpaca_trade_api.stream import Stream
+from core.config import load_secrets
+from core.broker_interface import settings, bar_store
+from core.vwap_signal_generator import indicator_engine, evaluate_vwap_bounce_state, is_in_vwap_window
+from core.metrics import timed, signals_total
+
+logger = logging.getLogger(__name__)
+
+# ------------------------------
+# Event-driven scanning on streamed minute bars
+# ------------------------------
+
+class BarStreamScanner:
+    """
+    Subscribes to minute bars and evaluates a symbol only when one of its bars
+    closes. Indicators are updated incrementally from each bar (over the same
+    50-bar window the polling scan fetches, see `IndicatorState`), and signals are
+    handed to `on_signal` (normally `process_signal`) on a single worker thread
+    so order handling never blocks the stream.
+    """
+
+    def __init__(self, symbols, on_signal, data_stream_url=None, feed="iex", engine=None, store=bar_store):
+        self.symbols = list(symbols)
+        self.on_signal = on_signal
+        self.engine = engine or indicator_engine
+        self.store = store
+        secrets = load_secrets()
+        self.stream = Stream(
+            secrets["alpaca_api_key"],
+            secrets["alpaca_secret_key"],
+            base_url=secrets["alpaca_base_url"],
+            data_stream_url=data_stream_url or settings.get("data_stream_url"),
+            data_feed=feed,
+        )
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="signal")
+        self.bars_received = 0
+
+    def warm_up(self, panel):
+        """Seed indicator state from a `get_bars_batch` panel so the first streamed bar can fire."""
+        for symbol, bars in panel.items():
+            self.engine.update_frame(symbol, bars)
+        logger.info(f"Warmed up indicators for {len(panel)} symbols.")
+
+    async def on_bar(self, bar):
+        self.bars_received += 1
+        timestamp = pd.Timestamp(bar.timestamp, tz="UTC")
+        with timed("indicators"):
+            state = self.engine.update_bar(bar.symbol, timestamp, bar.high, bar.low, bar.close, bar.volume)
+        if self.store is not None:
+            self.store.append_bar(bar.symbol, timestamp, bar.open, bar.high, bar.low, bar.close, bar.volume)
+
+        if not is_in_vwap_window(timestamp):
+            return
+
+        with timed("signal_rule"):
+            signal = evaluate_vwap_bounce_state(bar.symbol, state)
+        if signal:
+            signals_total.inc(setup_tag=signal["setup_tag"])
+            self.executor.submit(self._handle_signal, signal)
+
+    def _handle_signal(self, signal):
+        try:
+            self.on_signal(signal)
+        except Exception as e:
+            logger.exception(f"Error handling signal for {signal['symbol']}: {e}")
+
+    def run(self):
+        """Blocks until `stop()` is called (from another thread) or the process is interrupted."""
+        self.stream.subscribe_bars(self.on_bar, *self.symbols)
+        logger.info(f"Streaming minute bars for {len(self.symbols)} symbols...")
+        try:
+            self.stream.run()
+        finally:
+            self.executor.shutdown(wait=True)
+
+    def stop(self):
+        self.stream.stop()
@@ -1,26 +1,35 @@
-import os
-import yaml
+import time
 import logging
-from alpaca_trade_api.rest import REST, TimeFrame, APIError
+import threading
+from core.config import load_settings, resolve_path, LazyRESTClient
+from core.bar_store import BarStore, market_today
+from core.request_scheduler import RequestScheduler, PRIORITY_ORDER, PRIORITY_ACCOUNT, PRIORITY_DATA
+from core.error_handler import CircuitOpenError
+from core.metrics import timed
 
 # Load logging
 logger = logging.getLogger(__name__)
-logging.basicConfig(level=logging.INFO)
 
 # Load config
-with open("config/secrets.yaml", "r") as f:
-    secrets = yaml.safe_load(f)
+settings = load_settings()
 
-with open("config/settings.yaml", "r") as f:
-    settings = yaml.safe_load(f)
+# Client is built from config/secrets.yaml on the first API call. The SDK and
+# pandas are imported inside the functions that use them, so importing this
+# module stays cheap for short-lived jobs.
+api = LazyRESTClient()
 
-# Determine environment
-BASE_URL = secrets["alpaca_base_url"]
-API_KEY = secrets["alpaca_api_key"]
-API_SECRET = secrets["alpaca_secret_key"]
+# Every API call goes through one rate-limited, prioritized scheduler, with a
+# circuit breaker per endpoint
+scheduler = RequestScheduler(
+    rate_per_minute=int(settings.get("api_rate_limit_per_min", 200)),
+    workers=int(settings.get("api_workers", 8)),
+    failure_threshold=int(settings.get("breaker_failure_threshold", 5)),
+    reset_timeout=float(settings.get("breaker_reset_seconds", 30)),
+    retry_base=float(settings.get("api_retry_base_seconds", 0.5)),
+)
 
-# Initialize client
-api = REST(API_KEY, API_SECRET, BASE_URL)
+# Reads are retried in the background after transient failures; orders never are
+API_RETRIES = int(settings.get("api_retries", 2))
 
 # ------------------------------
 # Core broker functions
@@ -28,7 +37,7 @@ api = REST(API_KEY, API_SECRET, BASE_URL)
 
 def connect():
     try:
-        account = api.get_account()
+        account = scheduler.call(api.get_account, priority=PRIORITY_ACCOUNT, retries=API_RETRIES)
         logger.info(f"Connected to Alpaca account: {account.account_number}")
         return True
     except Exception as e:
@@ -37,14 +46,15 @@ def connect():
 
 def get_account():
     try:
-        return api.get_account()
+        return scheduler.call(api.get_account, priority=PRIORITY_ACCOUNT, retries=API_RETRIES)
     except Exception as e:
         logger.error(f"Error fetching account: {e}")
         return None
 
 def get_position(symbol):
+    from alpaca_trade_api.rest import APIError
     try:
-        return api.get_position(symbol)
+        return scheduler.call(api.get_position, symbol, priority=PRIORITY_ACCOUNT, retries=API_RETRIES)
     except APIError as e:
         if "position does not exist" in str(e):
             return None
@@ -52,16 +62,42 @@ def get_position(symbol):
         return None
 
 def get_price(symbol):
+    from alpaca_trade_api.rest import TimeFrame
     try:
-        barset = api.get_bars(symbol, TimeFrame.Minute, limit=1)
+        barset = scheduler.call(api.get_bars, symbol, TimeFrame.Minute, limit=1, priority=PRIORITY_ACCOUNT,
+                                retries=API_RETRIES)
         return float(barset[0].c) if barset else None
     except Exception as e:
         logger.error(f"Error fetching price for {symbol}: {e}")
         return None
 
+def get_prices(symbols, batch_size=None, feed="iex"):
+    """
+    Latest trade price (last minute bar close) for many symbols, as a dict of
+    symbol -> price. One latest-bars request per chunk of `batch_size`
+    symbols, all queued at once; symbols with no bar are left out.
+    """
+    symbols = list(dict.fromkeys(symbols))
+    requests = [
+        (chunk, scheduler.submit(api.get_latest_bars, chunk, feed=feed, priority=PRIORITY_ACCOUNT,
+                                 retries=API_RETRIES))
+        for chunk in _chunks(symbols, batch_size or BAR_BATCH_SIZE)
+    ]
+    prices = {}
+    for chunk, future in requests:
+        try:
+            bars = future.result()
+        except Exception as e:
+            logger.error(f"Error fetching prices for {len(chunk)} symbols ({chunk[0]}..{chunk[-1]}): {e}")
+            continue
+        prices.update({symbol: float(bar.c) for symbol, bar in bars.items()})
+    return prices
+
 def submit_order(symbol, qty, side, type="market", time_in_force="gtc", limit_price=None, stop_price=None):
     try:
-        order = api.submit_order(
+        order = scheduler.call(
+            api.submit_order,
+            priority=PRIORITY_ORDER,
             symbol=symbol,
             qty=qty,
             side=side,
@@ -75,11 +111,15 @@ def submit_order(symbol, qty, side, type="market", time_in_force="gtc", limit_pr
     except Exception as e:
         logger.error(f"Order failed: {e}")
         return None
+    finally:
+        invalidate_account_cache()
     
 
 def submit_bracket_order(symbol, qty, side, entry_price, stop_loss, take_profit):
     try:
-        order = api.submit_order(
+        order = scheduler.call(
+            api.submit_order,
+            priority=PRIORITY_ORDER,
             symbol=symbol,
             qty=qty,
             side=side,
@@ -95,35 +135,61 @@ def submit_bracket_order(symbol, qty, side, entry_price, stop_loss, take_profit)
     except Exception as e:
         logger.exception(f"Failed to submit bracket order for {symbol}: {e}")
         return None
+    finally:
+        invalidate_account_cache()
 
 def cancel_order(order_id):
     try:
-        api.cancel_order(order_id)
+        scheduler.call(api.cancel_order, order_id, priority=PRIORITY_ORDER)
         logger.info(f"Order {order_id} cancelled.")
     except Exception as e:
         logger.error(f"Error cancelling order {order_id}: {e}")
+    finally:
+        invalidate_account_cache()
 
 def get_order_status(order_id):
     try:
-        return api.get_order(order_id)
+        return scheduler.call(api.get_order, order_id, priority=PRIORITY_ACCOUNT, retries=API_RETRIES)
     except Exception as e:
         logger.error(f"Error checking order {order_id}: {e}")
         return None
     
-def get_last_closed_order(symbol):
+def list_positions():
+    """All open positions as a dict of symbol -> position (None if the call fails)."""
     try:
-        orders = api.list_orders(status='closed', limit=10)
-        for order in orders:
-            if order.symbol == symbol and order.filled_avg_price is not None:
-                return order
+        return {p.symbol: p for p in scheduler.call(api.list_positions, priority=PRIORITY_ACCOUNT,
+                                                     retries=API_RETRIES)}
+    except Exception as e:
+        logger.error(f"Error fetching positions: {e}")
         return None
+
+def list_closed_orders(after, page_size=500):
+    """
+    Every closed order submitted since `after`, newest first, with bracket
+    legs nested under their parent. Pages backwards through the history
+    `page_size` orders at a time, so nothing is missed on busy days.
+    Returns None if any page fails.
+    """
+    orders, seen = [], set()
+    until = None
+    try:
+        while True:
+            page = scheduler.call(api.list_orders, status="closed", limit=page_size, after=after, until=until,
+                                  direction="desc", nested=True, priority=PRIORITY_DATA, retries=API_RETRIES)
+            fresh = [o for o in page if o.id not in seen]
+            orders.extend(fresh)
+            seen.update(o.id for o in fresh)
+            if len(page) < page_size or not fresh:
+                break
+            until = page[-1].submitted_at.isoformat()
+        return orders
     except Exception as e:
-        logger.error(f"Error fetching closed order for {symbol}: {e}")
+        logger.error(f"Error fetching closed orders since {after}: {e}")
         return None
 
 def get_tradable_symbols():
     try:
-        assets = api.list_assets(status="active")
+        assets = scheduler.call(api.list_assets, status="active", priority=PRIORITY_DATA, retries=API_RETRIES)
         tradable = [
             asset.symbol for asset in assets
             if asset.tradable and asset.exchange in ["NASDAQ", "NYSE", "AMEX"]
@@ -132,4 +198,234 @@ def get_tradable_symbols():
         return tradable
     except Exception as e:
         logger.error(f"Error fetching tradable symbols: {e}")
-        return []
\ No newline at end of file
+        return []
+
+# ------------------------------
+# Account state cache
+# ------------------------------
+
+ACCOUNT_CACHE_TTL = float(settings.get("account_cache_ttl", 2.0))
+
+class AccountStateCache:
+    """
+    Short-lived snapshot of the account and all open positions.
+
+    Risk checks and sizing read from here instead of calling the API for every
+    signal. Entries expire after `ttl` seconds, and are dropped immediately
+    whenever we submit or cancel an order (see `invalidate_account_cache`).
+    Positions come from one `list_positions` call rather than one call per symbol,
+    and open orders from one `list_orders` call.
+    """
+
+    def __init__(self, ttl):
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._account = None
+        self._account_at = 0.0
+        self._positions = None
+        self._positions_at = 0.0
+        self._open_orders = None
+        self._open_orders_at = 0.0
+
+    def _fresh(self, fetched_at):
+        return time.monotonic() - fetched_at < self.ttl
+
+    def account(self):
+        with self._lock:
+            if self._account is None or not self._fresh(self._account_at):
+                account = get_account()
+                if account is None:
+                    return None
+                self._account, self._account_at = account, time.monotonic()
+            return self._account
+
+    def positions(self):
+        with self._lock:
+            if self._positions is None or not self._fresh(self._positions_at):
+                try:
+                    positions = scheduler.call(api.list_positions, priority=PRIORITY_ACCOUNT, retries=API_RETRIES)
+                except Exception as e:
+                    logger.error(f"Error fetching positions: {e}")
+                    return None
+                self._positions = {p.symbol: p for p in positions}
+                self._positions_at = time.monotonic()
+            return self._positions
+
+    def portfolio(self):
+        """
+        (account, positions, open orders) for a risk decision, or None if any
+        of them can't be fetched. Whatever has expired is refetched with
+        concurrent requests, so a cold snapshot costs one round trip.
+        """
+        with self._lock:
+            calls = {
+                "account": (self._account, self._account_at, api.get_account, {}),
+                "positions": (self._positions, self._positions_at, api.list_positions, {}),
+                "open orders": (self._open_orders, self._open_orders_at, api.list_orders,
+                                {"status": "open", "limit": 500}),
+            }
+            futures = {
+                name: scheduler.submit(fn, priority=PRIORITY_ACCOUNT, retries=API_RETRIES, **kwargs)
+                for name, (value, fetched_at, fn, kwargs) in calls.items()
+                if value is None or not self._fresh(fetched_at)
+            }
+            for name, future in futures.items():
+                try:
+                    result = future.result()
+                except Exception as e:
+                    logger.error(f"Error fetching {name}: {e}")
+                    return None
+                now = time.monotonic()
+                if name == "account":
+                    self._account, self._account_at = result, now
+                elif name == "positions":
+                    self._positions, self._positions_at = {p.symbol: p for p in result}, now
+                else:
+                    self._open_orders, self._open_orders_at = list(result), now
+            return self._account, self._positions, self._open_orders
+
+    def position(self, symbol):
+        positions = self.positions()
+        if positions is None:
+            # fall back to the single-symbol call
+            return get_position(symbol)
+        return positions.get(symbol)
+
+    def invalidate(self):
+        with self._lock:
+            self._account = None
+            self._positions = None
+            self._open_orders = None
+
+account_cache = AccountStateCache(ACCOUNT_CACHE_TTL)
+
+def get_cached_account():
+    return account_cache.account()
+
+def get_cached_position(symbol):
+    return account_cache.position(symbol)
+
+def get_cached_portfolio():
+    return account_cache.portfolio()
+
+def invalidate_account_cache():
+    account_cache.invalidate()
+
+# ------------------------------
+# Batched market data
+# ------------------------------
+
+BAR_BATCH_SIZE = int(settings.get("bar_batch_size", 100))
+BAR_LOOKBACK_MINUTES = int(settings.get("bar_lookback_minutes", 120))
+
+# Local minute-bar store (set bar_store_dir to null in settings to disable)
+BAR_STORE_DIR = settings.get("bar_store_dir", "data/bars")
+bar_store = BarStore(resolve_path(BAR_STORE_DIR)) if BAR_STORE_DIR else None
+
+def _chunks(items, size):
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
+@timed("bar_fetch")
+def get_bars_batch(symbols, limit=50, batch_size=None, feed="iex", failed=None):
+    """
+    Fetch the last `limit` minute bars for many symbols at once.
+
+    Symbols are requested in chunks of `batch_size` (one multi-symbol
+    request per chunk) and the result is a panel: a dict of
+    symbol -> DataFrame indexed by timestamp with open/high/low/close/volume
+    columns, sorted oldest to newest. Symbols with no data are left out.
+
+    With the bar store enabled, fetched bars are appended to it, only bars
+    newer than what's already stored are requested, and the panel is read
+    back from the store.
+
+    Chunks are not retried here, so one bad request can't hold up the scan:
+    pass a list as `failed` to collect the symbols whose request errored
+    (or was refused by an open circuit), and retry them later.
+    """
+    import pandas as pd
+    from alpaca_trade_api.rest import TimeFrame
+
+    batch_size = batch_size or BAR_BATCH_SIZE
+    start = pd.Timestamp.now(tz="UTC") - pd.Timedelta(minutes=BAR_LOOKBACK_MINUTES)
+    today = market_today()
+    panel = {}
+
+    # Queue every chunk up front; the scheduler runs them concurrently within the rate limit
+    requests = []
+    for chunk in _chunks(list(symbols), batch_size):
+        chunk_start = start
+        if bar_store is not None:
+            stored = [bar_store.last_timestamp(symbol, today) for symbol in chunk]
+            if all(ts is not None for ts in stored):
+                # Everything up to the oldest last-stored bar is already on disk
+                chunk_start = max(start, pd.Timestamp(min(stored), tz="UTC"))
+
+        future = scheduler.submit(api.get_bars, chunk, TimeFrame.Minute, start=chunk_start.isoformat(),
+                                  feed=feed, priority=PRIORITY_DATA)
+        requests.append((chunk, future))
+
+    for chunk, future in requests:
+        try:
+            bars = future.result().df
+        except CircuitOpenError as e:
+            logger.warning(f"Skipping bars for {len(chunk)} symbols ({chunk[0]}..{chunk[-1]}): {e}",
+                           extra={"sample": "bars_circuit_open"})
+            bars = pd.DataFrame()
+            if failed is not None:
+                failed.extend(chunk)
+        except Exception as e:
+            logger.error(f"Error fetching bars for {len(chunk)} symbols ({chunk[0]}..{chunk[-1]}): {e}")
+            bars = pd.DataFrame()
+            if failed is not None:
+                failed.extend(chunk)
+
+        if not bars.empty:
+            for symbol, frame in bars.groupby("symbol", sort=False):
+                frame = frame.drop(columns="symbol").sort_index()
+                if bar_store is not None:
+                    bar_store.append(symbol, frame)
+                else:
+                    panel[symbol] = frame.tail(limit)
+
+        if bar_store is not None:
+            for symbol in chunk:
+                frame = bar_store.read_frame(symbol, today, tail=limit)
+                if not frame.empty:
+                    panel[symbol] = frame
+
+    logger.info(f"Fetched bars for {len(panel)}/{len(symbols)} symbols.")
+    return panel
+
+def get_daily_bars_batch(symbols, days=30, batch_size=None, feed="iex"):
+    """
+    Daily bars covering the last `days` calendar days for many symbols, as a
+    panel like `get_bars_batch` returns. Chunks are fetched concurrently and
+    nothing is written to the bar store.
+    """
+    import pandas as pd
+    from alpaca_trade_api.rest import TimeFrame
+
+    batch_size = batch_size or BAR_BATCH_SIZE
+    start = (pd.Timestamp.now(tz="UTC") - pd.Timedelta(days=days)).normalize()
+    panel = {}
+
+    requests = [
+        (chunk, scheduler.submit(api.get_bars, chunk, TimeFrame.Day, start=start.isoformat(),
+                                 feed=feed, priority=PRIORITY_DATA, retries=API_RETRIES))
+        for chunk in _chunks(list(symbols), batch_size)
+    ]
+    for chunk, future in requests:
+        try:
+            bars = future.result().df
+        except Exception as e:
+            logger.error(f"Error fetching daily bars for {len(chunk)} symbols ({chunk[0]}..{chunk[-1]}): {e}")
+            continue
+        if bars.empty:
+            continue
+        for symbol, frame in bars.groupby("symbol", sort=False):
+            panel[symbol] = frame.drop(columns="symbol").sort_index()
+
+    logger.info(f"Fetched daily bars for {len(panel)}/{len(symbols)} symbols.")
+    return panel
@@ -0,0 +1,62 @@
+import os
+import threading
+import yaml
+
+# Everything resolves from the repo root, so entry points work from any directory
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+CONFIG_DIR = os.environ.get("BOT_CONFIG_DIR", os.path.join(ROOT, "config"))
+
+_lock = threading.RLock()
+_loaded = {}
+
+# ------------------------------
+# Settings and secrets
+# ------------------------------
+
+def _load(name):
+    with _lock:
+        if name not in _loaded:
+            with open(os.path.join(CONFIG_DIR, name), "r") as f:
+                _loaded[name] = yaml.safe_load(f) or {}
+        return _loaded[name]
+
+def load_settings():
+    """config/settings.yaml, read once per process and shared by every module."""
+    return _load("settings.yaml")
+
+def load_secrets():
+    """config/secrets.yaml, read on first use (only the broker and journal need it)."""
+    return _load("secrets.yaml")
+
+def resolve_path(path):
+    """Relative paths from settings (data/..., etc.) are taken from the repo root, not the cwd."""
+    if path is None or os.path.isabs(path):
+        return path
+    return os.path.join(ROOT, path)
+
+# ------------------------------
+# Broker client
+# ------------------------------
+
+_client = None
+
+def rest_client():
+    """The shared Alpaca REST client, built (and the SDK imported) on first use."""
+    global _client
+    with _lock:
+        if _client is None:
+            from alpaca_trade_api.rest import REST
+            secrets = load_secrets()
+            _client = REST(secrets["alpaca_api_key"], secrets["alpaca_secret_key"], secrets["alpaca_base_url"])
+        return _client
+
+
+class LazyRESTClient:
+    """
+    Stands in for the REST client until something actually calls the API:
+    `api.get_account` builds the client then, so importing the broker
+    module doesn't pull in the SDK (and pandas with it).
+    """
+
+    def __getattr__(self, name):
+        return getattr(rest_client(), name)
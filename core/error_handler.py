@@ -0,0 +1,189 @@
+import time
+import heapq
+import random
+import logging
+import threading
+from core.metrics import circuit_state_changes_total
+
+logger = logging.getLogger(__name__)
+
+# ------------------------------
+# Error classification
+# ------------------------------
+
+class CircuitOpenError(RuntimeError):
+    """Raised instead of calling an endpoint whose circuit breaker is open."""
+
+    def __init__(self, endpoint, retry_after):
+        super().__init__(f"{endpoint} circuit open, retrying in {retry_after:.1f}s")
+        self.endpoint = endpoint
+        self.retry_after = retry_after
+
+
+def is_transient(error):
+    """
+    True for failures worth retrying and counting against an endpoint's
+    breaker: connection errors and timeouts (requests' errors are OSErrors),
+    rate limiting and server errors. Client errors such as "position does
+    not exist" are answers, not outages.
+    """
+    if isinstance(error, CircuitOpenError):
+        return False
+    if isinstance(error, (OSError, TimeoutError)):
+        return True
+    status = getattr(error, "status_code", None)
+    return isinstance(status, int) and (status == 429 or status >= 500)
+
+
+def backoff_delay(attempt, base=0.5, cap=30.0):
+    """Exponential backoff with full jitter: uniform over [0, min(cap, base * 2**(attempt - 1))]."""
+    return random.uniform(0, min(cap, base * 2 ** (max(attempt, 1) - 1)))
+
+# ------------------------------
+# Circuit breaker
+# ------------------------------
+
+CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+class CircuitBreaker:
+    """
+    Fails calls to one endpoint fast while it's down.
+
+    After `failure_threshold` transient failures in a row the breaker opens
+    and `allow()` returns False for `reset_timeout` seconds. Then it goes
+    half-open and lets one probe call through: success closes it, failure
+    opens it again. A probe that never reports back is replaced after
+    another `reset_timeout`.
+    """
+
+    def __init__(self, endpoint, failure_threshold=5, reset_timeout=30.0, clock=time.monotonic):
+        self.endpoint = endpoint
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.clock = clock
+        self.state = CLOSED
+        self.failures = 0
+        self._opened_at = 0.0
+        self._probe_at = None
+        self._lock = threading.Lock()
+
+    def allow(self):
+        with self._lock:
+            if self.state == CLOSED:
+                return True
+            now = self.clock()
+            if self.state == OPEN:
+                if now - self._opened_at < self.reset_timeout:
+                    return False
+                self._set_state(HALF_OPEN)
+            if self._probe_at is not None and now - self._probe_at < self.reset_timeout:
+                return False
+            self._probe_at = now
+            return True
+
+    def is_open(self):
+        """True while `allow()` would refuse a call (checking doesn't claim the half-open probe)."""
+        with self._lock:
+            now = self.clock()
+            if self.state == OPEN:
+                return now - self._opened_at < self.reset_timeout
+            if self.state == HALF_OPEN:
+                return self._probe_at is not None and now - self._probe_at < self.reset_timeout
+            return False
+
+    def retry_after(self):
+        """Seconds until the breaker lets a call through again (0 unless open)."""
+        with self._lock:
+            if self.state != OPEN:
+                return 0.0
+            return max(0.0, self._opened_at + self.reset_timeout - self.clock())
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self._probe_at = None
+            if self.state != CLOSED:
+                self._set_state(CLOSED)
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            self._probe_at = None
+            if self.state == HALF_OPEN or (self.state == CLOSED and self.failures >= self.failure_threshold):
+                self._opened_at = self.clock()
+                self._set_state(OPEN)
+
+    def _set_state(self, state):
+        self.state = state
+        circuit_state_changes_total.inc(endpoint=self.endpoint, state=state)
+        if state == OPEN:
+            logger.warning(f"⚡ {self.endpoint} circuit open after {self.failures} failure(s); "
+                           f"pausing calls for {self.reset_timeout:g}s")
+        elif state == CLOSED:
+            logger.info(f"{self.endpoint} circuit closed")
+
+# ------------------------------
+# Deferred retries
+# ------------------------------
+
+class DeferredRetries:
+    """
+    Work that failed and should be picked up again later, instead of being
+    retried on the spot.
+
+    `defer(keys)` schedules each key after a jittered exponential backoff
+    that grows with its consecutive failures; after `max_attempts` failures
+    a key is dropped (and returned) so it only comes back through the
+    caller's regular schedule. `pop_due()` hands back the keys whose time has
+    come, and `clear(keys)` forgets the failures of keys that succeeded.
+    """
+
+    def __init__(self, base=2.0, cap=30.0, max_attempts=3, clock=time.time):
+        self.base = base
+        self.cap = cap
+        self.max_attempts = max_attempts
+        self.clock = clock
+        self._attempts = {}  # key -> consecutive failures
+        self._heap = []      # (ready at, key); stale entries are skipped when popped
+        self._ready_at = {}  # key -> ready at, for keys currently scheduled
+
+    def __len__(self):
+        return len(self._ready_at)
+
+    def defer(self, keys, now=None):
+        """Schedule a retry of each key; returns the keys given up on."""
+        now = self.clock() if now is None else now
+        dropped = []
+        for key in keys:
+            attempts = self._attempts.get(key, 0) + 1
+            if attempts > self.max_attempts:
+                self._attempts.pop(key, None)
+                self._ready_at.pop(key, None)
+                dropped.append(key)
+                continue
+            self._attempts[key] = attempts
+            ready_at = now + backoff_delay(attempts, self.base, self.cap)
+            self._ready_at[key] = ready_at
+            heapq.heappush(self._heap, (ready_at, key))
+        return dropped
+
+    def next_due(self):
+        """When the earliest deferred key is ready (None if nothing is deferred)."""
+        while self._heap and self._ready_at.get(self._heap[0][1]) != self._heap[0][0]:
+            heapq.heappop(self._heap)
+        return self._heap[0][0] if self._heap else None
+
+    def pop_due(self, now=None):
+        """The deferred keys ready by `now`, earliest first."""
+        now = self.clock() if now is None else now
+        due = []
+        while self.next_due() is not None and self._heap[0][0] <= now:
+            _, key = heapq.heappop(self._heap)
+            del self._ready_at[key]
+            due.append(key)
+        return due
+
+    def clear(self, keys):
+        for key in keys:
+            self._attempts.pop(key, None)
+            self._ready_at.pop(key, None)
@@ -1,12 +1,13 @@
 import logging
-from core.broker_interface import get_price, submit_order, get_account
-from core.risk_manager import is_trade_allowed
+from core.broker_interface import get_prices
+from core.risk_manager import portfolio_snapshot, evaluate_signals
 from core.journal_logger import log_trade
 from core.broker_interface import submit_bracket_order
+from core.metrics import timed
+from core.logging_setup import log_event
 
 # Setup logging
 logger = logging.getLogger(__name__)
-logging.basicConfig(level=logging.INFO)
 
 # Example trade signal structure
 # {
@@ -17,82 +18,101 @@ logging.basicConfig(level=logging.INFO)
 # }
 
 def process_signal(signal):
-    symbol     = signal["symbol"]
-    side       = signal["side"]
-    stop_loss  = float(signal["stop_loss"])
-    confidence = signal.get("confidence", 0)
-
-    logger.info(f"Received signal: {symbol} | {side.upper()} | confidence: {confidence} | stop: {stop_loss}")
-
-    if not is_trade_allowed(symbol, side):
-        logger.warning(f"Trade blocked by risk manager: {symbol} {side}")
-        return None
-
-    price = get_price(symbol)
-    if price is None:
-        logger.error(f"Could not fetch price for {symbol}")
-        return None
-
-    qty = determine_position_size(price, stop_loss, risk_pct=0.01)
-    if qty == 0:
-        logger.warning("Position size calculated as 0 — skipping trade.")
+    """Risk check, size, submit and journal one signal inline (see core/pipeline.py for the staged version)."""
+    ticket = prepare_order(signal)
+    if ticket is None:
         return None
+    order = submit_prepared_order(ticket)
+    if order:
+        journal_order(ticket, order)
+    return order
 
-    take_profit = round(price + abs(price - stop_loss) * 1.5, 2)
-
-    order = submit_bracket_order(
-        symbol=symbol,
-        qty=qty,
-        side=side,
-        entry_price=price,
-        stop_loss=stop_loss,
-        take_profit=take_profit
-    )
+def prepare_order(signal):
+    """Risk check and sizing for one signal (see `prepare_orders`)."""
+    return prepare_orders([signal])[0]
+
+def prepare_orders(signals, pending=None):
+    """
+    Risk check and sizing for a batch of signals against one portfolio
+    snapshot and one price request. Returns an order ticket (the bracket
+    order's parameters plus the signal's metadata) per signal, or None where
+    the trade is blocked or can't be sized. `pending` maps symbol -> notional
+    already approved but not yet submitted, so it counts against the limits.
+    """
+    for signal in signals:
+        logger.info(f"Received signal: {signal['symbol']} | {signal['side'].upper()} | "
+                    f"confidence: {signal.get('confidence', 0)} | stop: {signal['stop_loss']}")
+        log_event("signal", symbol=signal["symbol"], side=signal["side"], stop_loss=signal["stop_loss"],
+                  confidence=signal.get("confidence", 0), setup_tag=signal.get("setup_tag"))
+
+    with timed("risk_check"):
+        snapshot = portfolio_snapshot(pending)
+    if snapshot is None:
+        logger.warning(f"Risk manager unavailable: blocking {len(signals)} signal(s)")
+        return [None] * len(signals)
+
+    with timed("price_fetch"):
+        prices = get_prices([signal["symbol"] for signal in signals])
+
+    with timed("sizing"):
+        decisions = evaluate_signals(signals, snapshot, prices, risk_pct=0.01)
+
+    tickets = []
+    for signal, decision in zip(signals, decisions):
+        log_event("risk", symbol=signal["symbol"], side=signal["side"], approved=bool(decision["approved"]),
+                  qty=decision.get("qty"), price=decision.get("price"), reason=decision.get("reason"))
+        if not decision["approved"]:
+            logger.warning(f"Trade blocked by risk manager: {signal['symbol']} {signal['side']} ({decision['reason']})")
+            tickets.append(None)
+            continue
+
+        price, stop_loss = decision["price"], float(signal["stop_loss"])
+        tickets.append({
+            "symbol":      signal["symbol"],
+            "side":        signal["side"],
+            "qty":         decision["qty"],
+            "entry_price": price,
+            "stop_loss":   stop_loss,
+            "take_profit": round(price + abs(price - stop_loss) * 1.5, 2),
+            "confidence":  signal.get("confidence", 0),
+            "setup_tag":   signal.get("setup_tag"),
+        })
+    return tickets
+
+def submit_prepared_order(ticket):
+    symbol, side, qty = ticket["symbol"], ticket["side"], ticket["qty"]
+
+    with timed("bracket_submit"):
+        order = submit_bracket_order(
+            symbol=symbol,
+            qty=qty,
+            side=side,
+            entry_price=ticket["entry_price"],
+            stop_loss=ticket["stop_loss"],
+            take_profit=ticket["take_profit"]
+        )
 
     if order:
         logger.info(f"Executed trade: {order.id} | {symbol} | {side} | qty: {qty}")
-
-        trade_data = {
-            "symbol":           symbol,
-            "qty":              qty,
-            "entry_price":      price,
-            "stop_loss":        stop_loss,
-            "risk_amount":      abs(price - stop_loss) * qty,
-            "confidence_score": confidence,
-            "setup_tag":        signal.get("setup_tag"),
-            "r_multiple":       1.5,
-        }
-        log_trade(trade_data)
+        log_event("order", order_id=order.id, symbol=symbol, side=side, qty=qty,
+                  entry_price=ticket["entry_price"], stop_loss=ticket["stop_loss"], take_profit=ticket["take_profit"])
     else:
         logger.error(f"Trade execution failed for {symbol} {side}")
-
+        log_event("order_failed", symbol=symbol, side=side, qty=qty, entry_price=ticket["entry_price"])
     return order
 
-def determine_position_size(price, stop_loss, risk_pct=0.01, max_position_pct=0.03):
-    account = get_account()
-    if not account:
-        return 0
-
-    equity = float(account.equity)
-
-    # Capital you're willing to risk on this trade (e.g. 1% of equity)
-    risk_capital = equity * risk_pct
-
-    # Maximum capital you're willing to commit to any single trade (e.g. 3%)
-    max_position_value = equity * max_position_pct
-
-    stop_distance = abs(price - stop_loss)
-    if stop_distance == 0:
-        return 0
-
-    # Qty based on risk and stop loss
-    qty_based_on_risk = int(risk_capital / stop_distance)
-
-    # Qty based on total capital commitment limit
-    qty_based_on_exposure = int(max_position_value / price)
-
-    # Final qty is the smaller of the two
-    qty = min(qty_based_on_risk, qty_based_on_exposure)
-
-    logger.info(f"Qty calculated: risk-based = {qty_based_on_risk}, exposure-capped = {qty_based_on_exposure}, final = {qty}")
-    return qty
\ No newline at end of file
+def journal_order(ticket, order):
+    price, stop_loss, qty = ticket["entry_price"], ticket["stop_loss"], ticket["qty"]
+    trade_data = {
+        "symbol":           ticket["symbol"],
+        "qty":              qty,
+        "entry_price":      price,
+        "stop_loss":        stop_loss,
+        "risk_amount":      abs(price - stop_loss) * qty,
+        "confidence_score": ticket["confidence"],
+        "setup_tag":        ticket["setup_tag"],
+        "r_multiple":       1.5,
+        "order_id":         str(order.id),
+    }
+    with timed("journal_enqueue"):
+        log_trade(trade_data)
@@ -0,0 +1,228 @@
+import datetime
+from collections import deque
+import pytz
+
+MARKET_TZ = pytz.timezone("America/New_York")
+
+# ----------------------------
+# Per-symbol incremental state
+# ----------------------------
+
+class IndicatorState:
+    """
+    Streaming VWAP / RSI / average volume for one symbol.
+
+    Each `update` costs O(1) regardless of how many bars have been seen.
+    `vwap` and `rsi` follow the same definitions as `calculate_vwap` and
+    `calculate_rsi` in core/utils.py (ta's rolling typical-price VWAP and
+    Wilder RSI), so they match those functions run over the last `lookback`
+    bars, the window the polling scan fetches (None: every bar seen).
+    `session_vwap` is the cumulative VWAP since the start of the trading day.
+    """
+
+    _SCALARS = (
+        "pv_sum", "vol_sum", "avg_vol_sum", "ema_up", "ema_dn", "count",
+        "session_date", "session_pv", "session_vol",
+        "timestamp", "high", "low", "close", "volume", "prev_low", "prev_close",
+    )
+
+    def __init__(self, vwap_window=14, rsi_window=14, volume_window=10, lookback=50):
+        self.vwap_window = vwap_window
+        self.rsi_window = rsi_window
+        self.volume_window = volume_window
+        self.lookback = lookback
+        self.reset()
+
+    def reset(self):
+        self._vwap_bars = deque()   # (typical_price * volume, volume)
+        self._volumes = deque()
+        self._moves = deque()       # (up, down) of each close-to-close move inside the lookback
+        self.pv_sum = 0.0
+        self.vol_sum = 0.0
+        self.avg_vol_sum = 0.0
+        self.ema_up = 0.0
+        self.ema_dn = 0.0
+        self.count = 0
+        self.session_date = None
+        self.session_pv = 0.0
+        self.session_vol = 0.0
+        self.timestamp = None
+        self.high = None
+        self.low = None
+        self.close = None
+        self.volume = None
+        self.prev_low = None
+        self.prev_close = None
+        self._undo = None
+
+    def update(self, timestamp, high, low, close, volume):
+        """Fold one new bar into the running indicators."""
+        high, low, close, volume = float(high), float(low), float(close), float(volume)
+        saved = {name: getattr(self, name) for name in self._SCALARS}
+
+        # Rolling VWAP (ta VolumeWeightedAveragePrice)
+        pv = (high + low + close) / 3.0 * volume
+        self._vwap_bars.append((pv, volume))
+        self.pv_sum += pv
+        self.vol_sum += volume
+        evicted_vwap = None
+        if len(self._vwap_bars) > self.vwap_window:
+            evicted_vwap = self._vwap_bars.popleft()
+            self.pv_sum -= evicted_vwap[0]
+            self.vol_sum -= evicted_vwap[1]
+
+        # Rolling average volume
+        self._volumes.append(volume)
+        self.avg_vol_sum += volume
+        evicted_volume = None
+        if len(self._volumes) > self.volume_window:
+            evicted_volume = self._volumes.popleft()
+            self.avg_vol_sum -= evicted_volume
+
+        # Wilder RSI (ewm with alpha=1/window, adjust=False) started at the first
+        # bar of the lookback, which has no diff: a move leaving the window is
+        # taken back out at the weight it has decayed to
+        moved = self.count > 0
+        evicted_move = None
+        if not moved:
+            self.ema_up, self.ema_dn = 0.0, 0.0
+        else:
+            diff = close - self.close
+            up = diff if diff > 0 else 0.0
+            down = -diff if diff < 0 else 0.0
+            alpha = 1.0 / self.rsi_window
+            self.ema_up = (1 - alpha) * self.ema_up + alpha * up
+            self.ema_dn = (1 - alpha) * self.ema_dn + alpha * down
+            self._moves.append((up, down))
+            if self.lookback and len(self._moves) > self.lookback - 1:
+                evicted_move = self._moves.popleft()
+                weight = alpha * (1 - alpha) ** (self.lookback - 1)
+                self.ema_up = max(self.ema_up - weight * evicted_move[0], 0.0)
+                self.ema_dn = max(self.ema_dn - weight * evicted_move[1], 0.0)
+        self.count += 1
+
+        # Session VWAP, reset at the start of each trading day
+        day = _session_date(timestamp)
+        if day != self.session_date:
+            self.session_date = day
+            self.session_pv = 0.0
+            self.session_vol = 0.0
+        self.session_pv += pv
+        self.session_vol += volume
+
+        self.prev_low, self.prev_close = self.low, self.close
+        self.timestamp, self.high, self.low, self.close, self.volume = timestamp, high, low, close, volume
+        self._undo = (saved, evicted_vwap, evicted_volume, moved, evicted_move)
+        return self
+
+    def revise(self, timestamp, high, low, close, volume):
+        """Replace the most recent bar (e.g. a minute bar that was still forming)."""
+        if self._undo is None:
+            return self.update(timestamp, high, low, close, volume)
+
+        saved, evicted_vwap, evicted_volume, moved, evicted_move = self._undo
+        self._vwap_bars.pop()
+        if evicted_vwap is not None:
+            self._vwap_bars.appendleft(evicted_vwap)
+        self._volumes.pop()
+        if evicted_volume is not None:
+            self._volumes.appendleft(evicted_volume)
+        if moved:
+            self._moves.pop()
+        if evicted_move is not None:
+            self._moves.appendleft(evicted_move)
+        for name, value in saved.items():
+            setattr(self, name, value)
+        return self.update(timestamp, high, low, close, volume)
+
+    @property
+    def ready(self):
+        return self.count >= max(self.vwap_window, self.rsi_window, self.volume_window)
+
+    @property
+    def vwap(self):
+        if len(self._vwap_bars) < self.vwap_window or self.vol_sum == 0:
+            return float("nan")
+        return self.pv_sum / self.vol_sum
+
+    @property
+    def rsi(self):
+        if self.count < self.rsi_window:
+            return float("nan")
+        if self.ema_dn == 0:
+            return 100.0
+        return 100.0 - 100.0 / (1.0 + self.ema_up / self.ema_dn)
+
+    @property
+    def avg_volume(self):
+        if len(self._volumes) < self.volume_window:
+            return float("nan")
+        return self.avg_vol_sum / self.volume_window
+
+    @property
+    def session_vwap(self):
+        if self.session_vol == 0:
+            return float("nan")
+        return self.session_pv / self.session_vol
+
+
+def _session_date(timestamp):
+    if isinstance(timestamp, datetime.datetime) and timestamp.tzinfo is not None:
+        return timestamp.astimezone(MARKET_TZ).date()
+    if isinstance(timestamp, datetime.datetime):
+        return timestamp.date()
+    # epoch nanoseconds (as delivered by the stream client)
+    return datetime.datetime.fromtimestamp(timestamp / 1e9, tz=pytz.utc).astimezone(MARKET_TZ).date()
+
+# ----------------------------
+# Engine over many symbols
+# ----------------------------
+
+class IndicatorEngine:
+    """Holds one IndicatorState per symbol and feeds it only bars it hasn't seen."""
+
+    def __init__(self, vwap_window=14, rsi_window=14, volume_window=10, lookback=50):
+        self.windows = (vwap_window, rsi_window, volume_window, lookback)
+        self.states = {}
+
+    def get(self, symbol):
+        return self.states.get(symbol)
+
+    def reset(self, symbol=None):
+        if symbol is None:
+            self.states.clear()
+        else:
+            self.states.pop(symbol, None)
+
+    def _state(self, symbol):
+        state = self.states.get(symbol)
+        if state is None:
+            state = self.states[symbol] = IndicatorState(*self.windows)
+        return state
+
+    def update_bar(self, symbol, timestamp, high, low, close, volume):
+        state = self._state(symbol)
+        if state.timestamp is not None and timestamp == state.timestamp:
+            return state.revise(timestamp, high, low, close, volume)
+        if state.timestamp is not None and timestamp < state.timestamp:
+            return state  # stale bar
+        return state.update(timestamp, high, low, close, volume)
+
+    def update_frame(self, symbol, bars):
+        """
+        Feed a timestamp-indexed bar DataFrame (oldest first), skipping bars
+        already folded in. If the frame doesn't overlap what was seen before,
+        the state is rebuilt from the frame.
+        """
+        state = self._state(symbol)
+        if bars.empty:
+            return state
+
+        if state.timestamp is not None and state.timestamp < bars.index[0]:
+            state.reset()
+        if state.timestamp is not None:
+            bars = bars[bars.index >= state.timestamp]
+
+        for row in bars[["high", "low", "close", "volume"]].itertuples():
+            self.update_bar(symbol, row.Index, row.high, row.low, row.close, row.volume)
+        return state
@@ -1,22 +1,369 @@
-import yaml, logging
+import os, json, time, uuid, queue, atexit, threading
+import logging
 import psycopg2
+from psycopg2.pool import ThreadedConnectionPool, PoolError
+from psycopg2.extras import execute_values
+from contextlib import contextmanager
 from datetime import date
+from core.metrics import timed
+from core.config import load_settings, load_secrets, resolve_path
+from core.trade_rollups import CLOSED_COLUMNS, ensure_rollups, rollup_rows
 
-# — load DB creds —
-with open("config/secrets.yaml", "r") as f:
-    cfg = yaml.safe_load(f)
+settings = load_settings()
 
-DB_PARAMS = {
-    "host":     cfg["pg_host"],
-    "port":     cfg["pg_port"],
-    "dbname":   cfg["pg_name"],
-    "user":     cfg["pg_user"],
-    "password": cfg["pg_password"],
-}
+# — DB creds (read when the first connection is opened) —
+def db_params():
+    cfg = load_secrets()
+    return {
+        "host":     cfg["pg_host"],
+        "port":     cfg["pg_port"],
+        "dbname":   cfg["pg_name"],
+        "user":     cfg["pg_user"],
+        "password": cfg["pg_password"],
+    }
+
+# — journal tuning —
+POOL_SIZE      = int(settings.get("journal_pool_size", 4))
+BATCH_SIZE     = int(settings.get("journal_batch_size", 200))
+FLUSH_INTERVAL = float(settings.get("journal_flush_interval", 0.5))   # seconds
+SPOOL_PATH     = resolve_path(settings.get("journal_spool_path", "data/journal_spool.jsonl"))
+DEAD_LETTER_PATH = resolve_path(settings.get("journal_dead_letter_path", "data/journal_dead_letter.jsonl"))
 
 # — logging setup —
 logger = logging.getLogger(__name__)
-logging.basicConfig(level=logging.INFO)
+
+# — connection pool (opened on first use) —
+_pool = None
+_pool_lock = threading.Lock()
+
+@contextmanager
+def _connection():
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            pool = ThreadedConnectionPool(1, POOL_SIZE, **db_params())
+            try:
+                conn = pool.getconn()
+                try:
+                    _ensure_schema(conn)
+                finally:
+                    pool.putconn(conn)
+            except Exception:
+                # not ready until the schema is: the next call starts over
+                pool.closeall()
+                raise
+            _pool = pool
+    conn = _pool.getconn()
+    try:
+        yield conn
+    finally:
+        _pool.putconn(conn)
+
+
+def _ensure_schema(conn):
+    with conn.cursor() as cur:
+        # broker order id of the bracket parent, used to match exit fills back to journal rows
+        cur.execute("ALTER TABLE trades ADD COLUMN IF NOT EXISTS order_id TEXT")
+        # key given to each row when it's queued, so a replayed insert is recognized
+        cur.execute("ALTER TABLE trades ADD COLUMN IF NOT EXISTS journal_key TEXT")
+        cur.execute("CREATE UNIQUE INDEX IF NOT EXISTS trades_order_id_key ON trades (order_id) "
+                    "WHERE order_id IS NOT NULL")
+        cur.execute("CREATE UNIQUE INDEX IF NOT EXISTS trades_journal_key ON trades (journal_key) "
+                    "WHERE journal_key IS NOT NULL")
+    conn.commit()
+    ensure_rollups(conn)
+
+
+INSERT_COLUMNS = (
+    "date", "symbol", "num_shares", "buy_price", "position_size",
+    "sell_date", "sell_price", "net_pnl", "net_roi", "notes",
+    "risk_amount", "r_multiple", "setup_tag", "confidence_score", "review_notes",
+    "failure_reasons", "success_reasons", "order_id", "journal_key",
+)
+
+# A row already written (same order id or journal key) is skipped, so a replayed
+# insert isn't written twice; only the new rows come back for the rollups
+INSERT_SQL = f"""
+INSERT INTO trades ({', '.join(INSERT_COLUMNS)}) VALUES %s
+ON CONFLICT DO NOTHING
+RETURNING {', '.join(INSERT_COLUMNS)}
+"""
+INSERT_TEMPLATE = "(%s::date, %s, %s, %s, %s, %s::date, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)"
+
+# Only still-open rows are closed, so a replayed update can't be counted twice in
+# the rollups; the closed rows come back for the rollups to summarize
+UPDATE_SQL = f"""
+UPDATE trades AS t
+SET sell_date = v.sell_date,
+    sell_price = v.sell_price,
+    net_pnl = v.net_pnl,
+    net_roi = v.net_roi
+FROM (VALUES %s) AS v(ref, sell_date, sell_price, net_pnl, net_roi)
+WHERE t.ref = v.ref AND t.sell_date IS NULL
+RETURNING {', '.join(f't.{c}' for c in CLOSED_COLUMNS)}
+"""
+UPDATE_TEMPLATE = "(%s, %s::date, %s::numeric, %s::numeric, %s::numeric)"
+
+
+def _insert_row(trade_data):
+    # map our data into your schema
+    return [
+        date.today().isoformat(),               # date
+        trade_data["symbol"],
+        trade_data["qty"],                      # num_shares
+        trade_data["entry_price"],              # buy_price
+        trade_data["qty"] * trade_data["entry_price"],  # position_size
+        None,                                    # sell_date
+        0.0,                                     # sell_price
+        0.0,                                     # net_pnl
+        0.0,                                     # net_roi
+        "",                                      # notes
+        trade_data["risk_amount"],
+        trade_data.get("r_multiple"),
+        trade_data.get("setup_tag"),
+        trade_data.get("confidence_score"),
+        trade_data.get("review_notes", ""),
+        "",  # failure_reasons
+        "",  # success_reasons
+        trade_data.get("order_id"),
+        uuid.uuid4().hex,                        # journal_key
+    ]
+
+
+def _retryable(error):
+    """Lost connections and server trouble are retried; rows the DB rejects are not."""
+    return isinstance(error, (psycopg2.OperationalError, psycopg2.InterfaceError, PoolError, OSError))
+
+
+def _update_row(update_data):
+    sell_date = update_data["sell_date"]
+    return [
+        update_data["ref"],
+        sell_date.isoformat() if isinstance(sell_date, date) else sell_date,
+        update_data["sell_price"],
+        update_data["net_pnl"],
+        update_data["net_roi"],
+    ]
+
+
+# Queued by flush() to make the writer deliver its batch without waiting for more rows
+FLUSH = object()
+
+class JournalWriter:
+    """
+    Write-behind queue in front of the trades table.
+
+    Callers only append the row to a local spool file and enqueue it; a
+    background thread writes queued rows in batches (one multi-row INSERT, one
+    multi-row UPDATE and the matching rollup upserts per flush, see
+    core/trade_rollups.py) over a pooled connection. Rows stay in the
+    spool until their batch commits, and a restarted process replays whatever
+    was left, so a crash between a trade and its DB write loses nothing.
+    Delivery is at-least-once, so writes are idempotent: inserts skip rows
+    already written (by order id or journal key) and updates only close
+    still-open rows.
+
+    A batch that fails because the DB is unreachable is retried with backoff.
+    One the DB rejects is split until the bad rows are isolated; those go to
+    the dead-letter file (one JSON line each, with the error) and the rest
+    are written.
+    """
+
+    def __init__(self, spool_path, batch_size, flush_interval, dead_letter_path=None):
+        self.spool_path = spool_path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.dead_letter_path = dead_letter_path or f"{spool_path}.dead"
+        self._queue = queue.Queue()
+        self._spool_lock = threading.Lock()
+        self._seq = 0
+        self._unacked = set()
+        self._thread = None
+
+    # — producer side —
+
+    def submit(self, op, row):
+        self.submit_many(op, [row])
+
+    def submit_many(self, op, rows):
+        """Queue several rows so the writer picks them up in the same batch."""
+        entries = []
+        with self._spool_lock:
+            for row in rows:
+                self._seq += 1
+                entry = {"id": self._seq, "op": op, "row": row}
+                self._spool_write(entry)
+                self._unacked.add(entry["id"])
+                entries.append(entry)
+        self._queue.put(entries)
+        self._ensure_started()
+
+    def flush(self, timeout=10.0):
+        """Write everything queued so far now, and block until it has been written (or `timeout` passes)."""
+        deadline = time.monotonic() + timeout
+        if self._unacked:
+            # cut the writer's current batch short instead of waiting out flush_interval
+            self._queue.put(FLUSH)
+        while self._unacked and time.monotonic() < deadline:
+            time.sleep(0.01)
+        return not self._unacked
+
+    def recover(self):
+        """Re-queue entries a previous process spooled but never wrote."""
+        if not os.path.exists(self.spool_path):
+            return 0
+
+        entries, acked = {}, set()
+        with open(self.spool_path, "r") as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    continue  # torn last line from a crash
+                if "ack" in record:
+                    acked.update(record["ack"])
+                else:
+                    entries[record["id"]] = record
+
+        pending = [e for i, e in sorted(entries.items()) if i not in acked]
+        with self._spool_lock:
+            self._seq = 0
+            self._unacked.clear()
+            open(self.spool_path, "w").close()
+            for entry in pending:
+                self._seq += 1
+                entry["id"] = self._seq
+                self._spool_write(entry)
+                self._unacked.add(entry["id"])
+                self._queue.put(entry)
+
+        if pending:
+            logger.info(f"♻️ Recovered {len(pending)} unwritten journal entries.")
+            self._ensure_started()
+        return len(pending)
+
+    # — spool file —
+
+    def _spool_write(self, record):
+        os.makedirs(os.path.dirname(self.spool_path) or ".", exist_ok=True)
+        with open(self.spool_path, "a") as f:
+            f.write(json.dumps(record) + "\n")
+
+    def _ack(self, entries):
+        ids = [e["id"] for e in entries]
+        with self._spool_lock:
+            # the spool is updated before _unacked, so flush() never returns ahead of it
+            if self._unacked.difference(ids):
+                self._spool_write({"ack": ids})
+            else:
+                # nothing outstanding: start the spool over
+                open(self.spool_path, "w").close()
+            self._unacked.difference_update(ids)
+
+    # — writer thread —
+
+    def _ensure_started(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._run, name="journal-writer", daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while True:
+            batch = []
+            item = self._queue.get()
+            if item is FLUSH:
+                continue  # nothing was waiting
+            self._take(batch, item)
+            deadline = time.monotonic() + self.flush_interval
+            while len(batch) < self.batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    item = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                if item is FLUSH:
+                    break
+                self._take(batch, item)
+
+            self._deliver(batch)
+
+    def _deliver(self, batch):
+        delay = 1.0
+        parts = [batch]
+        while parts:
+            part = parts.pop()
+            error = self._write(part)
+            if error is None:
+                self._ack(part)
+            elif _retryable(error):
+                parts.append(part)
+                time.sleep(delay)
+                delay = min(delay * 2, 30.0)
+            elif len(part) > 1:
+                # halve until the rejected rows are on their own
+                middle = len(part) // 2
+                parts.extend([part[middle:], part[:middle]])
+            else:
+                self._dead_letter(part[0], error)
+                self._ack(part)
+
+    def _dead_letter(self, entry, error):
+        logger.error(f"❌ Journal {entry['op']} rejected, moved to {self.dead_letter_path}: {error}")
+        os.makedirs(os.path.dirname(self.dead_letter_path) or ".", exist_ok=True)
+        with open(self.dead_letter_path, "a") as f:
+            f.write(json.dumps({"op": entry["op"], "row": entry["row"], "error": str(error),
+                                "at": time.time()}, default=str) + "\n")
+
+    @staticmethod
+    def _take(batch, item):
+        # submit_many() enqueues a list of entries that must stay together
+        if isinstance(item, list):
+            batch.extend(item)
+        else:
+            batch.append(item)
+
+    def _write(self, batch):
+        """Write one batch in a single transaction; returns None, or the error it failed with."""
+        inserts = [e["row"] for e in batch if e["op"] == "insert"]
+        updates = [e["row"] for e in batch if e["op"] == "update"]
+        try:
+            with timed("journal_write"), _connection() as conn:
+                try:
+                    with conn.cursor() as cur:
+                        opened, closed = [], []
+                        if inserts:
+                            opened = execute_values(cur, INSERT_SQL, inserts, template=INSERT_TEMPLATE,
+                                                    page_size=self.batch_size, fetch=True)
+                        if updates:
+                            closed = execute_values(cur, UPDATE_SQL, updates, template=UPDATE_TEMPLATE,
+                                                    page_size=self.batch_size, fetch=True)
+                        # rollups commit (or roll back) together with the trades they summarize
+                        opened = [dict(zip(INSERT_COLUMNS, row)) for row in opened]
+                        closed = [dict(zip(CLOSED_COLUMNS, row)) for row in closed]
+                        for _, sql, rows in rollup_rows(opened, closed):
+                            execute_values(cur, sql, rows, page_size=self.batch_size)
+                    conn.commit()
+                except Exception:
+                    conn.rollback()
+                    raise
+            logger.info(f"✅ Journal flushed: {len(inserts)} trades logged, {len(updates)} closed.")
+            return None
+        except Exception as e:
+            if _retryable(e):
+                logger.error(f"❌ Journal flush failed ({len(batch)} entries kept for retry): {e}")
+            return e
+
+
+journal_writer = JournalWriter(SPOOL_PATH, BATCH_SIZE, FLUSH_INTERVAL, DEAD_LETTER_PATH)
+atexit.register(journal_writer.flush, 5.0)
+
+
+def recover_journal():
+    """Replay journal writes a previous run spooled but never committed (call once at startup)."""
+    return journal_writer.recover()
+
 
 def log_trade(trade_data):
     """
@@ -30,85 +377,34 @@ def log_trade(trade_data):
       - setup_tag       (str),    optional
       - review_notes    (str),    optional
       - r_multiple      (float),  optional
+      - order_id        (str),    optional
+
+    Returns immediately; the row is written to the DB in the background.
     """
     try:
-        conn = psycopg2.connect(**DB_PARAMS)
-        cur  = conn.cursor()
-
-        insert_sql = """
-        INSERT INTO trades (
-          date,
-          symbol,
-          num_shares,
-          buy_price,
-          position_size,
-          sell_date,
-          sell_price,
-          net_pnl,
-          net_roi,
-          notes,
-          risk_amount,
-          r_multiple,
-          setup_tag,
-          confidence_score,
-          review_notes,
-          failure_reasons,
-          success_reasons
-        )
-        VALUES (
-          %s, %s, %s, %s, %s,
-          %s, %s, %s, %s, %s,
-          %s, %s, %s, %s, %s,
-          %s, %s
-        )
-        """
-
-        # map our data into your schema
-        values = (
-            date.today(),                           # date
-            trade_data["symbol"],
-            trade_data["qty"],                      # num_shares
-            trade_data["entry_price"],              # buy_price
-            trade_data["qty"] * trade_data["entry_price"],  # position_size
-            None,                                    # sell_date
-            0.0,                                     # sell_price
-            0.0,                                     # net_pnl
-            0.0,                                     # net_roi
-            "",                                      # notes
-            trade_data["risk_amount"],
-            trade_data.get("r_multiple"),
-            trade_data.get("setup_tag"),
-            trade_data.get("confidence_score"),
-            trade_data.get("review_notes", ""),
-            "",  # failure_reasons
-            ""   # success_reasons
-        )
-
-        cur.execute(insert_sql, values)
-        conn.commit()
-        cur.close()
-        conn.close()
-
-        logger.info(f"✅ Trade logged: {trade_data['symbol']} x{trade_data['qty']}")
-
+        journal_writer.submit("insert", _insert_row(trade_data))
+        logger.info(f"✅ Trade queued for journal: {trade_data['symbol']} x{trade_data['qty']}")
     except Exception as e:
-        logger.error(f"❌ Couldn’t log trade to DB: {e}")
+        logger.error(f"❌ Couldn’t queue trade for journal: {e}")
+
+
+def flush_journal(timeout=10.0):
+    return journal_writer.flush(timeout)
 
 
 def get_open_trades():
     """Fetch all trades from the DB that are still open."""
+    flush_journal()
     try:
-        conn = psycopg2.connect(**DB_PARAMS)
-        cur = conn.cursor()
-
-        cur.execute("""
-            SELECT ref, symbol, num_shares, buy_price
-            FROM trades
-            WHERE sell_price = 0.0 AND sell_date IS NULL
-        """)
-        trades = cur.fetchall()
-        cur.close()
-        conn.close()
+        with _connection() as conn:
+            with conn.cursor() as cur:
+                cur.execute("""
+                    SELECT ref, symbol, num_shares, buy_price, date, order_id
+                    FROM trades
+                    WHERE sell_price = 0.0 AND sell_date IS NULL
+                """)
+                trades = cur.fetchall()
+            conn.commit()
 
         # Format as list of dicts for easier use
         return [
@@ -116,7 +412,9 @@ def get_open_trades():
                 "ref": row[0],
                 "symbol": row[1],
                 "qty": row[2],
-                "buy_price": row[3]
+                "buy_price": row[3],
+                "date": row[4],
+                "order_id": row[5]
             }
             for row in trades
         ]
@@ -124,35 +422,26 @@ def get_open_trades():
     except Exception as e:
         logger.error(f"❌ Couldn’t fetch open trades: {e}")
         return []
-    
+
 
 def update_closed_trade(update_data):
+    """Queue a close-out update; it is applied in the background with other pending writes."""
     try:
-        conn = psycopg2.connect(**DB_PARAMS)
-        cur = conn.cursor()
-
-        update_sql = """
-        UPDATE trades
-        SET sell_date = %s,
-            sell_price = %s,
-            net_pnl = %s,
-            net_roi = %s
-        WHERE ref = %s
-        """
-
-        values = (
-            update_data["sell_date"],
-            update_data["sell_price"],
-            update_data["net_pnl"],
-            update_data["net_roi"],
-            update_data["ref"]
-        )
-
-        cur.execute(update_sql, values)
-        conn.commit()
-        cur.close()
-        conn.close()
-
-        logger.info(f"✅ Trade ref {update_data['ref']} marked as closed.")
+        journal_writer.submit("update", _update_row(update_data))
+        logger.info(f"✅ Trade ref {update_data['ref']} queued to be marked as closed.")
     except Exception as e:
-        logger.error(f"❌ Failed to update closed trade: {e}")
\ No newline at end of file
+        logger.error(f"❌ Failed to queue closed trade update: {e}")
+
+
+def update_closed_trades(updates):
+    """Queue many close-out updates together and wait for them to be written as one batch."""
+    if not updates:
+        return True
+    try:
+        journal_writer.submit_many("update", [_update_row(u) for u in updates])
+        logger.info(f"✅ {len(updates)} trades queued to be marked as closed.")
+    except Exception as e:
+        logger.error(f"❌ Failed to queue closed trade updates: {e}")
+        return False
+    return flush_journal()
+
@@ -0,0 +1,162 @@
+import os
+import json
+import queue
+import atexit
+import logging
+import threading
+from logging.handlers import QueueHandler, QueueListener
+from core.config import load_settings, resolve_path
+
+logger = logging.getLogger(__name__)
+
+LOG_FORMAT = "%(asctime)s %(levelname)s %(name)s: %(message)s"
+
+# Trade events (see `log_event`) go through this logger to the event log only
+events = logging.getLogger("trade_events")
+events.propagate = False
+
+_listener = None
+_installed = []  # (logger, handler) pairs added by setup_logging
+
+# ------------------------------
+# Background handlers
+# ------------------------------
+
+class _BackgroundHandler(QueueHandler):
+    """
+    Hands records to the listener thread untouched: message formatting and
+    stream/file I/O happen there, not on the thread that logged.
+    """
+
+    def prepare(self, record):
+        return record
+
+
+class SampleFilter(logging.Filter):
+    """
+    Rate-limits records logged with `extra={"sample": key}`: the first record
+    for a key passes, the rest within `interval` seconds are dropped and
+    counted, and the next one to pass reports how many were dropped.
+    Records without a sample key always pass.
+    """
+
+    def __init__(self, interval=60.0):
+        super().__init__()
+        self.interval = interval
+        self._windows = {}  # key -> [window start, suppressed count]
+        self._lock = threading.Lock()
+
+    def filter(self, record):
+        key = getattr(record, "sample", None)
+        if key is None:
+            return True
+        now = record.created
+        with self._lock:
+            window = self._windows.get(key)
+            if window is not None and now - window[0] < self.interval:
+                window[1] += 1
+                return False
+            suppressed = window[1] if window is not None else 0
+            self._windows[key] = [now, 0]
+        if suppressed:
+            record.msg = f"{record.getMessage()} (+{suppressed} similar in the last {self.interval:g}s)"
+            record.args = None
+        return True
+
+
+class EventFormatter(logging.Formatter):
+    """One compact JSON object per trade event: {"ts", "event", **fields}."""
+
+    def format(self, record):
+        return json.dumps({"ts": round(record.created, 6), "event": record.event, **record.fields},
+                          separators=(",", ":"), default=str)
+
+
+def _is_event(record):
+    return hasattr(record, "event")
+
+def _not_event(record):
+    return not hasattr(record, "event")
+
+# ------------------------------
+# Setup
+# ------------------------------
+
+def setup_logging(level=None, event_log=None, sample_seconds=None):
+    """
+    Route all logging through one queue drained by a background thread.
+
+    Console output uses LOG_FORMAT, records marked with a sample key are
+    rate-limited (log_sample_seconds), and trade events are appended to
+    `event_log` (settings: event_log_path; null disables it) as JSON lines.
+    Safe to call more than once; only the first call configures anything.
+    """
+    global _listener
+    if _listener is not None:
+        return
+    settings = load_settings()
+    level = level or settings.get("log_level", "INFO")
+    event_log = event_log or resolve_path(settings.get("event_log_path"))
+    sample_seconds = float(sample_seconds if sample_seconds is not None else settings.get("log_sample_seconds", 60))
+
+    console = logging.StreamHandler()
+    console.setFormatter(logging.Formatter(LOG_FORMAT))
+    console.addFilter(_not_event)
+    handlers = [console]
+    if event_log:
+        os.makedirs(os.path.dirname(event_log) or ".", exist_ok=True)
+        event_file = logging.FileHandler(event_log, encoding="utf-8")
+        event_file.setFormatter(EventFormatter())
+        event_file.addFilter(_is_event)
+        handlers.append(event_file)
+
+    records = queue.SimpleQueue()
+    root_handler = _BackgroundHandler(records)
+    root_handler.addFilter(SampleFilter(sample_seconds))
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    root.addHandler(root_handler)
+    root.setLevel(level)
+    event_handler = _BackgroundHandler(records)
+    events.addHandler(event_handler)
+    _installed[:] = [(root, root_handler), (events, event_handler)]
+    events.setLevel(logging.INFO if event_log else logging.CRITICAL + 1)
+
+    _listener = QueueListener(records, *handlers, respect_handler_level=True)
+    _listener.start()
+    atexit.register(stop_logging)
+
+def stop_logging():
+    """Write out everything still queued and stop the background thread."""
+    global _listener
+    if _listener is None:
+        return
+    for owner, handler in _installed:
+        owner.removeHandler(handler)
+    _installed.clear()
+    _listener.stop()
+    for handler in _listener.handlers:
+        handler.close()
+    _listener = None
+    events.setLevel(logging.NOTSET)
+
+# ------------------------------
+# Trade events
+# ------------------------------
+
+def log_event(event, **fields):
+    """Record a trade event (signal, risk decision, order, fill, close) in the event log."""
+    if events.isEnabledFor(logging.INFO):
+        events.info(event, extra={"event": event, "fields": fields})
+
+def read_events(path, kinds=None):
+    """Replay an event log: yields each event dict in order, optionally only `kinds`."""
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue  # a line cut off by a crash
+            if kinds is None or record["event"] in kinds:
+                yield record
@@ -0,0 +1,188 @@
+import time
+import bisect
+import logging
+import threading
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+logger = logging.getLogger(__name__)
+
+# Upper bounds in seconds; covers sub-millisecond numpy passes up to multi-second API stalls
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+# ------------------------------
+# Metric types
+# ------------------------------
+
+class _Metric:
+    kind = None
+
+    def __init__(self, name, help, labelnames=()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._values = {}
+
+    def _key(self, labels):
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def _labels(self, key, extra=None):
+        pairs = list(zip(self.labelnames, key)) + (extra or [])
+        if not pairs:
+            return ""
+        return "{" + ",".join(f'{name}="{value}"' for name, value in pairs) + "}"
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        with self._lock:
+            items = sorted(self._values.items())
+        for key, value in items:
+            lines.extend(self._render_value(key, value))
+        return lines
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels):
+        return self._values.get(self._key(labels), 0)
+
+    def _render_value(self, key, value):
+        return [f"{self.name}{self._labels(key)} {value}"]
+
+
+class Histogram(_Metric):
+    """
+    Fixed-bucket histogram. `observe` is a bisect and three additions under a
+    lock, cheap enough for the per-signal path.
+    """
+    kind = "histogram"
+
+    def __init__(self, name, help, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, help, labelnames)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        i = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is None:
+                entry = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            entry[0][i] += 1
+            entry[1] += value
+            entry[2] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def count(self, **labels):
+        entry = self._values.get(self._key(labels))
+        return entry[2] if entry else 0
+
+    def _render_value(self, key, value):
+        counts, total, n = value
+        lines, cumulative = [], 0
+        for bound, c in zip(self.buckets + (float("inf"),), counts):
+            cumulative += c
+            le = "+Inf" if bound == float("inf") else repr(bound)
+            lines.append(f"{self.name}_bucket{self._labels(key, [('le', le)])} {cumulative}")
+        lines.append(f"{self.name}_sum{self._labels(key)} {total}")
+        lines.append(f"{self.name}_count{self._labels(key)} {n}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def render(self):
+        """All metrics in the Prometheus text exposition format."""
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+# ------------------------------
+# Bot metrics
+# ------------------------------
+
+REGISTRY = Registry()
+
+stage_seconds = REGISTRY.register(Histogram(
+    "bot_stage_seconds", "Time spent in each hot-path stage", ["stage"]))
+scan_cycle_seconds = REGISTRY.register(Histogram(
+    "bot_scan_cycle_seconds", "Duration of one full scan cycle"))
+api_request_seconds = REGISTRY.register(Histogram(
+    "bot_api_request_seconds", "Broker API call latency, excluding time queued for rate limit", ["endpoint"]))
+api_requests_total = REGISTRY.register(Counter(
+    "bot_api_requests_total", "Broker API calls made", ["endpoint"]))
+api_errors_total = REGISTRY.register(Counter(
+    "bot_api_errors_total", "Broker API calls that raised", ["endpoint"]))
+signals_total = REGISTRY.register(Counter(
+    "bot_signals_total", "Signals generated", ["setup_tag"]))
+queue_wait_seconds = REGISTRY.register(Histogram(
+    "bot_queue_wait_seconds", "Time an item waited in a pipeline stage's queue", ["stage"]))
+pipeline_dropped_total = REGISTRY.register(Counter(
+    "bot_pipeline_dropped_total", "Items dropped by a pipeline stage's backpressure policy", ["stage"]))
+receiver_signals_total = REGISTRY.register(Counter(
+    "bot_receiver_signals_total", "External signals by outcome (accepted, duplicate, shed, invalid)", ["result"]))
+indicator_cache_total = REGISTRY.register(Counter(
+    "bot_indicator_cache_total", "Indicator rows served from the memo cache (hit) or computed (miss)", ["result"]))
+api_retries_total = REGISTRY.register(Counter(
+    "bot_api_retries_total", "Broker API calls re-queued after a transient failure", ["endpoint"]))
+circuit_state_changes_total = REGISTRY.register(Counter(
+    "bot_circuit_state_changes_total", "Circuit breaker transitions by endpoint and new state", ["endpoint", "state"]))
+
+def timed(stage):
+    """`with timed("risk_check"): ...` records the block's duration under that stage."""
+    return stage_seconds.time(stage=stage)
+
+def record_api_call(endpoint, seconds, failed):
+    api_request_seconds.observe(seconds, endpoint=endpoint)
+    api_requests_total.inc(endpoint=endpoint)
+    if failed:
+        api_errors_total.inc(endpoint=endpoint)
+
+# ------------------------------
+# HTTP endpoint
+# ------------------------------
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split("?")[0] != "/metrics":
+            self.send_error(404)
+            return
+        body = REGISTRY.render().encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass  # scrapes would otherwise flood the log
+
+
+def start_metrics_server(port, host="127.0.0.1"):
+    """Serve /metrics from a background thread; returns the server (port 0 picks a free one)."""
+    server = ThreadingHTTPServer((host, port), _MetricsHandler)
+    thread = threading.Thread(target=server.serve_forever, name="metrics-http", daemon=True)
+    thread.start()
+    logger.info(f"📈 Metrics at http://{host}:{server.server_address[1]}/metrics")
+    return server
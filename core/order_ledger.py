@@ -0,0 +1,232 @@
+import os
+import json
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from core.config import load_secrets
+
+logger = logging.getLogger(__name__)
+
+# Order fields kept from each trade update (Alpaca order JSON, values as sent)
+ORDER_FIELDS = (
+    "id", "symbol", "side", "qty", "filled_qty", "filled_avg_price", "filled_at",
+    "status", "order_class", "type",
+)
+
+# ------------------------------
+# Order / position ledger
+# ------------------------------
+
+class OrderLedger:
+    """
+    Local order and position state built from trade updates.
+
+    Every update is appended to a write-ahead log before it's applied, so
+    `recover()` rebuilds the same state after a restart. Bracket legs are
+    linked to their parent (the entry order id the journal records), so
+    `exit_fill(parent_id)` answers "is this trade closed, at what fill"
+    without an API call. Every `checkpoint_every` updates the state is
+    written to `<wal>.snapshot` and the log starts over.
+
+    Updates are Alpaca trade update payloads: {"event", "order", "position_qty", ...}.
+    """
+
+    def __init__(self, wal_path=None, fsync=True, checkpoint_every=10000):
+        self.wal_path = wal_path
+        self.fsync = fsync
+        self.checkpoint_every = checkpoint_every
+        self._orders = {}     # order id -> {ORDER_FIELDS..., "legs": [leg ids]}
+        self._parents = {}    # leg id -> parent order id
+        self._positions = {}  # symbol -> qty
+        self._lock = threading.Lock()
+        self._wal = None
+        self._wal_entries = 0
+
+    def __contains__(self, order_id):
+        with self._lock:
+            return order_id in self._orders
+
+    # — writes —
+
+    def recover(self):
+        """Load the last snapshot and replay the log after it; returns self."""
+        if not self.wal_path:
+            return self
+        snapshot_path = f"{self.wal_path}.snapshot"
+        with self._lock:
+            if os.path.exists(snapshot_path):
+                with open(snapshot_path, "r") as f:
+                    state = json.load(f)
+                self._orders, self._parents, self._positions = state["orders"], state["parents"], state["positions"]
+
+            replayed = 0
+            if os.path.exists(self.wal_path):
+                with open(self.wal_path, "r") as f:
+                    for line in f:
+                        try:
+                            update = json.loads(line)
+                        except ValueError:
+                            logger.warning(f"Skipping torn order ledger entry in {self.wal_path}")
+                            continue
+                        self._apply(update)
+                        replayed += 1
+            self._wal_entries = replayed
+        logger.info(f"Order ledger recovered: {len(self._orders)} orders, {replayed} log entries replayed")
+        return self
+
+    def apply(self, update):
+        """
+        Log and apply one trade update. Returns the parent order id when the
+        update is the fill of a bracket's exit leg (the trade just closed).
+        """
+        if not (update.get("order") or {}).get("id"):
+            return None
+        with self._lock:
+            self._log(update)
+            closed = self._apply(update)
+            if self.wal_path and self._wal_entries >= self.checkpoint_every:
+                self._checkpoint()
+        return closed
+
+    def _apply(self, update):
+        order = update["order"]
+        record = self._orders.setdefault(order["id"], {"legs": []})
+        record.update({field: order[field] for field in ORDER_FIELDS if field in order})
+
+        for leg in order.get("legs") or []:
+            self._parents[leg["id"]] = order["id"]
+            if leg["id"] not in record["legs"]:
+                record["legs"].append(leg["id"])
+            leg_record = self._orders.setdefault(leg["id"], {"legs": []})
+            leg_record.update({field: leg[field] for field in ORDER_FIELDS if field in leg})
+
+        event = update.get("event")
+        if event in ("fill", "partial_fill") and update.get("position_qty") is not None:
+            qty = float(update["position_qty"])
+            if qty:
+                self._positions[order["symbol"]] = qty
+            else:
+                self._positions.pop(order["symbol"], None)
+
+        parent = self._parents.get(order["id"])
+        return parent if event == "fill" and parent is not None else None
+
+    def _log(self, update):
+        if not self.wal_path:
+            return
+        if self._wal is None:
+            os.makedirs(os.path.dirname(self.wal_path) or ".", exist_ok=True)
+            self._wal = open(self.wal_path, "a")
+        self._wal.write(json.dumps(update) + "\n")
+        self._wal.flush()
+        if self.fsync:
+            os.fsync(self._wal.fileno())
+        self._wal_entries += 1
+
+    def _checkpoint(self):
+        snapshot_path = f"{self.wal_path}.snapshot"
+        with open(f"{snapshot_path}.tmp", "w") as f:
+            json.dump({"orders": self._orders, "parents": self._parents, "positions": self._positions}, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(f"{snapshot_path}.tmp", snapshot_path)
+        # A crash before this truncate only means the log is replayed over a snapshot that already has it
+        if self._wal is not None:
+            self._wal.close()
+        self._wal = open(self.wal_path, "w")
+        self._wal_entries = 0
+
+    def close(self):
+        with self._lock:
+            if self._wal is not None:
+                self._wal.close()
+                self._wal = None
+
+    # — reads —
+
+    def order(self, order_id):
+        """The order's latest state (a copy), or None if the ledger hasn't seen it."""
+        with self._lock:
+            record = self._orders.get(order_id)
+            return dict(record, legs=list(record["legs"])) if record else None
+
+    def exit_fill(self, order_id):
+        """
+        The filled exit leg of the bracket entered by `order_id`, as
+        {"order_id", "symbol", "price", "qty", "filled_at"}; None while it's open.
+        """
+        with self._lock:
+            record = self._orders.get(order_id)
+            for leg_id in (record or {}).get("legs", []):
+                leg = self._orders[leg_id]
+                if leg.get("status") == "filled" and leg.get("filled_avg_price") is not None:
+                    return {
+                        "order_id": leg_id,
+                        "symbol": leg.get("symbol"),
+                        "price": float(leg["filled_avg_price"]),
+                        "qty": float(leg.get("filled_qty") or 0),
+                        "filled_at": leg.get("filled_at"),
+                    }
+        return None
+
+    def position(self, symbol):
+        with self._lock:
+            return self._positions.get(symbol, 0.0)
+
+    def positions(self):
+        with self._lock:
+            return dict(self._positions)
+
+# ------------------------------
+# Trade updates stream
+# ------------------------------
+
+class TradeUpdateStream:
+    """
+    Feeds the account's trade updates stream into an OrderLedger.
+    `on_close(parent_order_id)` is called when a bracket's exit leg fills,
+    on a single worker thread so journal writes never hold up the stream.
+    """
+
+    def __init__(self, ledger, on_close=None, base_url=None):
+        from alpaca_trade_api.stream import Stream  # only the live listener needs the websocket stack
+
+        self.ledger = ledger
+        self.on_close = on_close
+        secrets = load_secrets()
+        self.stream = Stream(
+            secrets["alpaca_api_key"],
+            secrets["alpaca_secret_key"],
+            base_url=base_url or secrets["alpaca_base_url"],
+            raw_data=True,
+        )
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="trade-updates")
+        self.updates_received = 0
+
+    async def on_update(self, message):
+        self.updates_received += 1
+        try:
+            closed = self.ledger.apply(message["data"])
+        except Exception as e:
+            logger.exception(f"Failed to apply trade update: {e}")
+            return
+        if closed is not None and self.on_close is not None:
+            self.executor.submit(self._handle_close, closed)
+
+    def _handle_close(self, order_id):
+        try:
+            self.on_close(order_id)
+        except Exception as e:
+            logger.exception(f"Error handling close of order {order_id}: {e}")
+
+    def run(self):
+        """Blocks until `stop()` is called (from another thread) or the process is interrupted."""
+        self.stream.subscribe_trade_updates(self.on_update)
+        logger.info("Listening for trade updates...")
+        try:
+            self.stream.run()
+        finally:
+            self.executor.shutdown(wait=True)
+
+    def stop(self):
+        self.stream.stop()
@@ -0,0 +1,237 @@
+import time
+import queue
+import logging
+import threading
+from core.broker_interface import settings
+from core.execution_engine import prepare_orders, submit_prepared_order, journal_order
+from core.metrics import queue_wait_seconds, pipeline_dropped_total
+
+logger = logging.getLogger(__name__)
+
+# Backpressure policies for a full queue
+BLOCK = "block"              # producer waits for room
+DROP_OLDEST = "drop_oldest"  # evict the stalest queued item to make room
+DROP_NEWEST = "drop_newest"  # refuse the new item
+
+_STOP = object()
+
+# ------------------------------
+# Stage
+# ------------------------------
+
+class Stage:
+    """
+    A bounded queue drained by `workers` threads running `handler(item)`.
+    With a `batch_size` a worker instead takes whatever is queued (up to
+    `batch_size` items) and calls `handler(items)`, which returns one result
+    per item.
+
+    A non-None result is passed to `downstream`. Every item that leaves the
+    stage without a result (handled to None, raised, or dropped by the
+    backpressure policy) is reported to `on_done` so the pipeline can stop
+    tracking it.
+    """
+
+    def __init__(self, name, handler, workers=1, maxsize=100, policy=BLOCK, downstream=None, on_done=None,
+                 batch_size=None):
+        self.name = name
+        self.handler = handler
+        self.workers = workers
+        self.batch_size = batch_size
+        self.policy = policy
+        self.downstream = downstream
+        self.on_done = on_done or (lambda item: None)
+        self.queue = queue.Queue(maxsize=maxsize)
+        self._threads = []
+
+    def start(self):
+        for i in range(self.workers):
+            thread = threading.Thread(target=self._work, name=f"pipeline-{self.name}-{i}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def put(self, item):
+        """Queue an item according to the stage's policy; False if it was refused."""
+        entry = (time.perf_counter(), item)
+        if self.policy == BLOCK:
+            self.queue.put(entry)
+            return True
+
+        while True:
+            try:
+                self.queue.put_nowait(entry)
+                return True
+            except queue.Full:
+                if self.policy == DROP_NEWEST:
+                    self._dropped(item)
+                    return False
+            # DROP_OLDEST: evict one and retry
+            try:
+                _, evicted = self.queue.get_nowait()
+            except queue.Empty:
+                continue
+            self._dropped(evicted)
+
+    def _dropped(self, item):
+        pipeline_dropped_total.inc(stage=self.name)
+        logger.warning(f"{self.name} queue full ({self.policy}): dropped {_describe(item)}")
+        self.on_done(item)
+
+    def stop(self, timeout=None):
+        for _ in self._threads:
+            self.queue.put((time.perf_counter(), _STOP))
+        for thread in self._threads:
+            thread.join(timeout)
+        self._threads = []
+
+    def _work(self):
+        while True:
+            entries = [self.queue.get()]
+            while len(entries) < (self.batch_size or 1) and entries[-1][1] is not _STOP:
+                try:
+                    entries.append(self.queue.get_nowait())
+                except queue.Empty:
+                    break
+            stopping = entries[-1][1] is _STOP
+            if stopping:
+                entries.pop()
+            if entries:
+                self._handle(entries)
+            if stopping:
+                return
+
+    def _handle(self, entries):
+        now = time.perf_counter()
+        items = [item for _, item in entries]
+        for enqueued_at, _ in entries:
+            queue_wait_seconds.observe(now - enqueued_at, stage=self.name)
+        try:
+            results = self.handler(items) if self.batch_size else [self.handler(items[0])]
+        except Exception as e:
+            logger.exception(f"{self.name} stage failed for {', '.join(map(_describe, items))}: {e}")
+            results = [None] * len(items)
+        for item, result in zip(items, results):
+            if result is not None and self.downstream is not None:
+                self.downstream.put(result)
+            else:
+                self.on_done(item)
+
+
+def _describe(item):
+    if isinstance(item, tuple):
+        item = item[0]
+    return item.get("symbol", "?") if isinstance(item, dict) else repr(item)
+
+# ------------------------------
+# Signal pipeline
+# ------------------------------
+
+class SignalPipeline:
+    """
+    Scanner → risk/sizing → order submission → journal, each stage on its own
+    threads behind a bounded queue.
+
+    `submit` never blocks the scanner: when the risk queue is full the signal
+    policy decides what gets dropped (by default the oldest queued signal, the
+    one whose price is most stale). Approved orders and fills are never dropped;
+    the order and journal queues block their producers instead. A symbol with a
+    signal anywhere in the pipeline is skipped until that signal finishes, so
+    concurrent workers can't open the same position twice.
+
+    The risk stage evaluates whatever signals are queued (up to `risk_batch`)
+    in one pass against one portfolio snapshot. Approved tickets stay reserved
+    (symbol -> notional) until they are submitted, so the next batch counts
+    them against the exposure limits before they show up as broker orders.
+    """
+
+    def __init__(self, risk_workers=2, order_workers=2, queue_size=100, signal_policy=DROP_OLDEST,
+                 risk_batch=50):
+        self._in_flight = set()
+        self._cond = threading.Condition()
+        self._reserved = {}
+        # Batches are evaluated one at a time, each seeing the reservations of the last
+        self._risk_lock = threading.Lock()
+
+        self.journal = Stage("journal", self._journal, workers=1, maxsize=queue_size,
+                             policy=BLOCK, on_done=self._release)
+        self.orders = Stage("order", self._submit, workers=order_workers, maxsize=queue_size,
+                            policy=BLOCK, downstream=self.journal, on_done=self._release)
+        self.risk = Stage("risk", self._prepare, workers=risk_workers, maxsize=queue_size,
+                          policy=signal_policy, downstream=self.orders, on_done=self._release,
+                          batch_size=risk_batch)
+        self.stages = [self.risk, self.orders, self.journal]
+
+    def start(self):
+        for stage in self.stages:
+            stage.start()
+        return self
+
+    def submit(self, signal):
+        """Hand a signal to the risk stage; False if it was skipped or dropped."""
+        symbol = signal["symbol"]
+        with self._cond:
+            if symbol in self._in_flight:
+                logger.info(f"Skipping {symbol}: previous signal still in the pipeline",
+                            extra={"sample": "in_flight"})
+                return False
+            self._in_flight.add(symbol)
+        return self.risk.put(signal)
+
+    def in_flight(self):
+        with self._cond:
+            return set(self._in_flight)
+
+    def drain(self, timeout=None):
+        """Wait until every submitted signal has finished; True if the pipeline is empty."""
+        with self._cond:
+            return self._cond.wait_for(lambda: not self._in_flight, timeout)
+
+    def stop(self, timeout=10.0):
+        """Finish what's queued, then stop the workers (upstream first)."""
+        self.drain(timeout)
+        for stage in self.stages:
+            stage.stop(timeout)
+
+    # — stage handlers —
+
+    def _prepare(self, signals):
+        with self._risk_lock:
+            with self._cond:
+                pending = dict(self._reserved)
+            tickets = prepare_orders(signals, pending)
+            with self._cond:
+                for ticket in tickets:
+                    if ticket is not None:
+                        self._reserved[ticket["symbol"]] = ticket["qty"] * ticket["entry_price"]
+        return tickets
+
+    def _submit(self, ticket):
+        try:
+            order = submit_prepared_order(ticket)
+        finally:
+            # Submitted (or failed): from here on the broker's open orders and positions account for it
+            with self._cond:
+                self._reserved.pop(ticket["symbol"], None)
+        return (ticket, order) if order else None
+
+    @staticmethod
+    def _journal(item):
+        ticket, order = item
+        journal_order(ticket, order)
+        return None
+
+    def _release(self, item):
+        with self._cond:
+            self._reserved.pop(_describe(item), None)
+            self._in_flight.discard(_describe(item))
+            self._cond.notify_all()
+
+
+def pipeline_from_settings():
+    return SignalPipeline(
+        risk_workers=int(settings.get("pipeline_risk_workers", 2)),
+        order_workers=int(settings.get("pipeline_order_workers", 2)),
+        queue_size=int(settings.get("pipeline_queue_size", 100)),
+        signal_policy=settings.get("pipeline_signal_policy", DROP_OLDEST),
+        risk_batch=int(settings.get("pipeline_risk_batch", 50)),
+    )
@@ -0,0 +1,184 @@
+import time
+import heapq
+import logging
+import itertools
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from core.metrics import record_api_call, api_retries_total
+from core.error_handler import CircuitBreaker, CircuitOpenError, is_transient, backoff_delay
+
+logger = logging.getLogger(__name__)
+
+# Priority classes: lower runs first
+PRIORITY_ORDER = 0     # order submission and cancels
+PRIORITY_ACCOUNT = 1   # reads on the order path: account, positions, entry price
+PRIORITY_DATA = 2      # market data scans, asset lists, history
+
+# ------------------------------
+# Token bucket
+# ------------------------------
+
+class TokenBucket:
+    """Refills at `rate` tokens per second up to `capacity`. Not thread-safe on its own."""
+
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, needed):
+        """Seconds until `needed` tokens are available (0 if they already are)."""
+        self._refill()
+        if self.tokens >= needed:
+            return 0.0
+        return (needed - self.tokens) / self.rate
+
+    def take(self, n=1):
+        self._refill()
+        self.tokens -= n
+
+# ------------------------------
+# Scheduler
+# ------------------------------
+
+class RequestScheduler:
+    """
+    Runs broker calls concurrently while staying under the account's request budget.
+
+    Calls are queued by priority class and released one token at a time from a
+    bucket sized to the API limit. `reserve` tokens are held back for order
+    traffic, so a burst of market-data requests can drain the bucket only down
+    to that reserve; orders also run on their own worker threads, so slow data
+    calls never occupy the slot an order needs.
+
+    Each endpoint (the called function's name) has a circuit breaker: once it
+    trips, queued and new calls to that endpoint fail with CircuitOpenError
+    without spending a token, until a probe call gets through again.
+    """
+
+    def __init__(self, rate_per_minute=200, workers=8, order_workers=2, reserve=None,
+                 failure_threshold=5, reset_timeout=30.0, retry_base=0.5, retry_cap=30.0):
+        self.bucket = TokenBucket(rate_per_minute / 60.0, capacity=max(1.0, rate_per_minute / 10.0))
+        self.reserve = reserve if reserve is not None else max(1.0, self.bucket.capacity * 0.1)
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.retry_base = retry_base
+        self.retry_cap = retry_cap
+        self._breakers = {}  # endpoint -> CircuitBreaker
+        self._heap = []
+        self._delayed = []   # (ready at, seq, call): retries waiting out their backoff
+        self._seq = itertools.count()
+        self._cond = threading.Condition()
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="broker")
+        self._order_pool = ThreadPoolExecutor(max_workers=order_workers, thread_name_prefix="broker-order")
+        self._dispatcher = None  # started by the first submit, so importing the broker starts no threads
+
+    def submit(self, fn, *args, priority=PRIORITY_DATA, retries=0, **kwargs):
+        """
+        Queue `fn(*args, **kwargs)` and return a Future for its result. A call
+        that fails transiently (see `is_transient`) is queued again up to
+        `retries` times after a jittered backoff; no worker waits it out.
+        Only pass `retries` for calls that are safe to repeat.
+        """
+        future = Future()
+        with self._cond:
+            if self._dispatcher is None:
+                self._dispatcher = threading.Thread(target=self._dispatch, name="broker-dispatch", daemon=True)
+                self._dispatcher.start()
+            heapq.heappush(self._heap, (priority, next(self._seq), future, fn, args, kwargs, retries, 1))
+            self._cond.notify()
+        return future
+
+    def call(self, fn, *args, priority=PRIORITY_DATA, retries=0, **kwargs):
+        """Queue `fn` and block for its result (exceptions are re-raised here)."""
+        return self.submit(fn, *args, priority=priority, retries=retries, **kwargs).result()
+
+    def pending(self):
+        with self._cond:
+            return len(self._heap) + len(self._delayed)
+
+    def breaker(self, endpoint):
+        with self._cond:
+            if endpoint not in self._breakers:
+                self._breakers[endpoint] = CircuitBreaker(endpoint, self.failure_threshold, self.reset_timeout)
+            return self._breakers[endpoint]
+
+    def _dispatch(self):
+        while True:
+            rejected = None
+            with self._cond:
+                now = time.monotonic()
+                while self._delayed and self._delayed[0][0] <= now:
+                    heapq.heappush(self._heap, heapq.heappop(self._delayed)[2])
+                next_retry = self._delayed[0][0] - now if self._delayed else None
+                if not self._heap:
+                    self._cond.wait(timeout=next_retry)
+                    continue
+                call = self._heap[0]
+                priority, breaker = call[0], self.breaker(_endpoint(call[3]))
+                if breaker.is_open():
+                    rejected = heapq.heappop(self._heap)
+                else:
+                    needed = 1 if priority == PRIORITY_ORDER else 1 + self.reserve
+                    wait = self.bucket.wait_time(needed)
+                    if wait > 0:
+                        # woken early if something more urgent is queued meanwhile
+                        self._cond.wait(timeout=wait if next_retry is None else min(wait, next_retry))
+                        continue
+                    heapq.heappop(self._heap)
+                    if breaker.allow():
+                        self.bucket.take(1)
+                    else:
+                        rejected = call
+
+            if rejected is not None:
+                future = rejected[2]
+                if rejected[7] > 1 or future.set_running_or_notify_cancel():
+                    future.set_exception(CircuitOpenError(breaker.endpoint, breaker.retry_after()))
+                continue
+            pool = self._order_pool if priority == PRIORITY_ORDER else self._pool
+            pool.submit(self._run, call)
+
+    def _run(self, call):
+        priority, _, future, fn, args, kwargs, retries, attempt = call
+        # a retry's future is already running
+        if attempt == 1 and not future.set_running_or_notify_cancel():
+            return
+        endpoint = _endpoint(fn)
+        breaker = self.breaker(endpoint)
+        start = time.perf_counter()
+        try:
+            result = fn(*args, **kwargs)
+        except BaseException as e:
+            record_api_call(endpoint, time.perf_counter() - start, failed=True)
+            if not is_transient(e):
+                # the endpoint answered (e.g. "position does not exist"), so it's up
+                breaker.record_success()
+                future.set_exception(e)
+                return
+            breaker.record_failure()
+            if attempt > retries:
+                future.set_exception(e)
+                return
+            delay = backoff_delay(attempt, self.retry_base, self.retry_cap)
+            api_retries_total.inc(endpoint=endpoint)
+            logger.warning(f"{endpoint} failed ({e}); retry {attempt}/{retries} in {delay:.1f}s",
+                           extra={"sample": f"retry_{endpoint}"})
+            with self._cond:
+                retry = (priority, next(self._seq), future, fn, args, kwargs, retries, attempt + 1)
+                heapq.heappush(self._delayed, (time.monotonic() + delay, next(self._seq), retry))
+                self._cond.notify()
+        else:
+            record_api_call(endpoint, time.perf_counter() - start, failed=False)
+            breaker.record_success()
+            future.set_result(result)
+
+
+def _endpoint(fn):
+    return getattr(fn, "__name__", "call")
@@ -1,49 +1,218 @@
-import yaml
 import logging
-from core.broker_interface import get_account, get_position
+import numpy as np
+import yaml
+from core.config import load_settings, resolve_path
+from core.broker_interface import get_cached_portfolio
 
 # Load config
-with open("config/settings.yaml", "r") as f:
-    settings = yaml.safe_load(f)
+settings = load_settings()
 
 # Logging
 logger = logging.getLogger(__name__)
-logging.basicConfig(level=logging.INFO)
 
 # ----------------------------
-# Main trade gatekeeper
+# Trade rules
+# ----------------------------
+
+def _allowed_symbols():
+    """The allowed_symbols setting as a set; None (everything allowed) when it's missing or empty."""
+    allowed = settings.get("allowed_symbols")
+    return set(allowed) if allowed else None
+
+# ----------------------------
+# Portfolio snapshot
 # ----------------------------
 
-def is_trade_allowed(symbol, side):
-    account = get_account()
-    if account is None:
-        logger.error("Risk check failed: couldn't fetch account")
-        return False
+_sectors = None
+
+def sector_map():
+    """symbol -> sector from the optional `sectors_file` (YAML), read once."""
+    global _sectors
+    if _sectors is None:
+        path = settings.get("sectors_file")
+        if path:
+            with open(resolve_path(path), "r") as f:
+                _sectors = yaml.safe_load(f) or {}
+        else:
+            _sectors = {}
+    return _sectors
+
+def portfolio_snapshot(pending=None):
+    """
+    Everything a batch of risk decisions needs, read once: equity, today's
+    P&L, open positions as symbol -> (qty, market value) and the notional of
+    entries not yet filled (open orders on symbols we don't hold, plus any
+    `pending` symbol -> notional the caller has approved but not submitted).
+    None if the account, positions or open orders can't be fetched.
+    """
+    portfolio = get_cached_portfolio()
+    if portfolio is None:
+        logger.error("Risk check failed: couldn't fetch account, positions or open orders")
+        return None
+    account, positions, open_orders = portfolio
+
+    held = {
+        symbol: (abs(int(float(p.qty))), abs(float(getattr(p, "market_value", None) or 0.0)))
+        for symbol, p in positions.items()
+    }
+    waiting = {}
+    for order in open_orders:
+        # Orders on held symbols are exits (bracket legs); the rest are entries waiting to fill
+        if order.symbol in held:
+            continue
+        price = float(order.limit_price or order.stop_price or 0.0)
+        unfilled = float(order.qty) - float(order.filled_qty or 0)
+        waiting[order.symbol] = waiting.get(order.symbol, 0.0) + abs(unfilled) * price
+    for symbol, notional in (pending or {}).items():
+        waiting[symbol] = waiting.get(symbol, 0.0) + notional
 
-    # --- Daily Loss Check ---
     equity = float(account.equity)
-    last_equity = float(account.last_equity)
-    pnl_today = equity - last_equity
+    return {
+        "equity": equity,
+        "pnl_today": equity - float(account.last_equity),
+        "positions": held,
+        "pending": waiting,
+    }
+
+# ----------------------------
+# Batch evaluation
+# ----------------------------
+
+def _cumsum_before(values, groups):
+    """For each element, the sum of earlier `values` in the same group (input order is priority order)."""
+    order = np.argsort(groups, kind="stable")
+    v = values[order]
+    running = np.cumsum(v) - v
+    g = groups[order]
+    starts = np.r_[True, g[1:] != g[:-1]]
+    # `running` never decreases, so the running max of group-start values is each group's offset
+    offset = np.maximum.accumulate(np.where(starts, running, 0.0))
+    out = np.empty_like(values)
+    out[order] = running - offset
+    return out
+
+def evaluate_signals(signals, snapshot, prices, risk_pct=0.01, max_position_pct=0.03):
+    """
+    Approve and size a batch of signals against one portfolio snapshot.
+
+    Per signal, blocked when: today's P&L is below -`max_daily_loss`; the
+    symbol isn't in `allowed_symbols` (if set); there's no price, or the
+    stop is at the price, or above it for a buy; or the position already
+    holds `max_position_size` shares. Otherwise qty is the smallest of the risk-based size
+    (equity * risk_pct / stop distance), the exposure cap (equity *
+    max_position_pct / price) and the room left under `max_position_size`,
+    rounded down; a qty of 0 is blocked. A symbol signalled twice in a
+    batch keeps only its highest-confidence signal.
+
+    Across the batch, in descending confidence: new positions stop at
+    `max_open_positions`, then each trade is clipped to what is left of its
+    sector's budget (`max_sector_exposure_pct` of equity; symbols missing from
+    the sector map count as their own sector) and of the gross budget
+    (`max_gross_exposure_pct`). Existing positions and pending entries count
+    against every limit.
+
+    Returns one decision per signal, in input order:
+    {"symbol", "approved", "qty", "price", "reason"}.
+    """
+    n = len(signals)
+    if n == 0:
+        return []
+
+    equity = snapshot["equity"]
+    held, waiting = snapshot["positions"], snapshot["pending"]
+    sectors = sector_map()
+
+    symbols = np.array([s["symbol"] for s in signals], dtype=object)
+    price = np.array([prices.get(s) or np.nan for s in symbols], dtype=float)
+    stop = np.array([float(s["stop_loss"]) for s in signals])
+    confidence = np.array([float(s.get("confidence") or 0.0) for s in signals])
+    held_qty = np.array([held.get(s, (0, 0.0))[0] for s in symbols], dtype=float)
+    reason = np.full(n, "", dtype=object)
+
+    def block(mask, why):
+        reason[(reason == "") & mask] = why
+
+    # --- per-signal checks ---
     max_loss = float(settings.get("max_daily_loss", 500))
+    if snapshot["pnl_today"] < -max_loss:
+        block(np.ones(n, dtype=bool), f"daily loss {snapshot['pnl_today']:.2f} > max allowed {max_loss}")
+
+    allowed = _allowed_symbols()
+    if allowed is not None:
+        block(np.array([s not in allowed for s in symbols]), "not in allowed symbols list")
+
+    block(~(price > 0), "no price")
+
+    # Highest confidence first; ties keep input order
+    rank = np.argsort(-confidence, kind="stable")
+    _, first = np.unique(symbols[rank].astype(str), return_index=True)
+    duplicate = np.ones(n, dtype=bool)
+    duplicate[rank[first]] = False
+    block(duplicate, "duplicate signal in batch")
+
+    distance = np.abs(price - stop)
+    block(~(distance > 0), "zero stop distance")
+    # signals come from outside (webhooks), so a buy's stop isn't trusted to be below the price
+    block(np.array([s.get("side") == "buy" for s in signals]) & (stop >= price), "stop above entry")
+
+    room = int(settings.get("max_position_size", 1000)) - held_qty
+    block(room <= 0, "position at max size")
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        qty_by_risk = np.floor(equity * risk_pct / distance)
+        qty_by_exposure = np.floor(equity * max_position_pct / price)
+    qty = np.fmin(np.fmin(qty_by_risk, qty_by_exposure), room)
+    qty = np.where(reason == "", np.nan_to_num(qty), 0.0)
+    block(qty <= 0, "size 0")
+
+    # --- portfolio limits, in confidence order ---
+    live = (reason == "")[rank]
+    ordered = symbols[rank]
+
+    occupied = set(held) | set(waiting)
+    is_new = np.array([s not in occupied for s in ordered]) & live
+    slots = int(settings.get("max_open_positions", 10)) - len(occupied)
+    over = np.zeros(n, dtype=bool)
+    over[rank] = is_new & (np.cumsum(is_new) > slots)
+    block(over, "max open positions")
+
+    live = (reason == "")[rank]
+    notional = np.where(live, qty[rank] * price[rank], 0.0)
 
-    if pnl_today < -max_loss:
-        logger.warning(f"Risk block: daily loss {pnl_today} > max allowed {max_loss}")
-        return False
+    exposure = {}
+    for symbol, value in [(s, v) for s, (_, v) in held.items()] + list(waiting.items()):
+        key = sectors.get(symbol, symbol)
+        exposure[key] = exposure.get(key, 0.0) + value
 
-    # --- Position Size Check ---
-    position = get_position(symbol)
-    current_qty = int(position.qty) if position else 0
-    max_qty = int(settings.get("max_position_size", 1000))
+    sector = np.array([sectors.get(s, s) for s in ordered], dtype=object).astype(str)
+    sector_budget = float(settings.get("max_sector_exposure_pct", 0.25)) * equity \
+        - np.array([exposure.get(s, 0.0) for s in sector])
+    fits_sector = np.clip(sector_budget - _cumsum_before(notional, sector), 0.0, notional)
 
-    if current_qty >= max_qty:
-        logger.warning(f"Risk block: {symbol} position {current_qty} exceeds max {max_qty}")
-        return False
+    gross_budget = float(settings.get("max_gross_exposure_pct", 1.0)) * equity - sum(exposure.values())
+    before = np.cumsum(fits_sector) - fits_sector
+    fits = np.clip(gross_budget - before, 0.0, fits_sector)
 
-    # --- Allowed Symbols ---
-    allowed_symbols = settings.get("allowed_symbols", [])
-    if symbol not in allowed_symbols:
-        logger.warning(f"Risk block: {symbol} not in allowed symbols list.")
-        return False
+    per_share = price[rank].clip(min=1e-9)
+    capped, sector_capped = np.zeros(n), np.zeros(n)
+    capped[rank] = np.floor(fits / per_share)
+    sector_capped[rank] = np.floor(fits_sector / per_share)
+    block(sector_capped <= 0, "sector exposure limit")
+    block(capped <= 0, "gross exposure limit")
+    qty = np.where(reason == "", np.minimum(qty, capped), 0.0)
 
-    logger.info(f"Risk manager approved: {symbol} | side: {side}")
-    return True
\ No newline at end of file
+    decisions = []
+    for i, symbol in enumerate(symbols):
+        approved = reason[i] == ""
+        if approved:
+            logger.info(f"Risk manager approved: {symbol} | side: {signals[i]['side']} | qty: {int(qty[i])}")
+        else:
+            logger.warning(f"Risk block: {symbol} {reason[i]}")
+        decisions.append({
+            "symbol": symbol,
+            "approved": approved,
+            "qty": int(qty[i]),
+            "price": float(price[i]) if price[i] > 0 else None,
+            "reason": reason[i] or None,
+        })
+    return decisions
@@ -0,0 +1,147 @@
+import time
+import queue
+import logging
+import multiprocessing
+from multiprocessing import shared_memory
+import numpy as np
+from core.vwap_signal_generator import PANEL_COLUMNS, fill_arrays
+from scanner_hooks.strategies import StrategyEngine, bar_stamps
+from core.metrics import timed, stage_seconds, signals_total
+
+logger = logging.getLogger(__name__)
+
+# ------------------------------
+# Shard worker (runs in its own process)
+# ------------------------------
+
+def _shard_worker(shm_name, shape, lo, hi, symbols, strategies, tasks, results):
+    """
+    Run the strategies over rows [lo, hi) of the shared panel each time a
+    (cycle, bar stamps) task arrives; None stops the worker.
+    """
+    shm = shared_memory.SharedMemory(name=shm_name)
+    try:
+        panel = np.ndarray(shape, dtype=np.float64, buffer=shm.buf)
+        arrays = {col: panel[i, lo:hi] for i, col in enumerate(PANEL_COLUMNS)}
+        engine = StrategyEngine(strategies)  # each worker memoizes indicators for its own rows
+        while True:
+            task = tasks.get()
+            if task is None:
+                return
+            cycle, stamps = task
+            start = time.perf_counter()
+            try:
+                signals = engine.scan_arrays(symbols, arrays, stamps)
+            except Exception as e:
+                logger.exception(f"Shard {lo}-{hi} failed to scan: {e}")
+                signals = []
+            results.put((cycle, lo, signals, time.perf_counter() - start))
+    finally:
+        # views into the block must go before it can be closed
+        panel = arrays = None
+        shm.close()
+
+# ------------------------------
+# Sharded scanner
+# ------------------------------
+
+class ShardedScanner:
+    """
+    The strategy engine's scan split across worker processes.
+
+    The universe is cut into one contiguous block of symbols per process.
+    Each cycle the calling process (the single fetcher) writes the whole bar
+    panel into one shared-memory symbols x bars block, tells every worker to
+    scan its rows, and gathers their signals in symbol order. Workers only
+    read the block and send signals back, so orders are still submitted
+    from the calling process alone.
+
+    A shard that hasn't answered within `timeout` seconds is skipped for the
+    cycle, and a worker that died is restarted before the next one.
+    """
+
+    def __init__(self, symbols, processes, strategies=None, timeout=30.0):
+        self.symbols = list(symbols)
+        self.processes = max(1, min(int(processes), len(self.symbols)))
+        engine = StrategyEngine(strategies)
+        self.strategies = [strategy["name"] for strategy in engine.strategies]
+        self.limit = engine.limit
+        self.timeout = timeout
+        self._ctx = multiprocessing.get_context("spawn")
+        self._shm = None
+        self._arrays = None
+        self._results = None
+        self._workers = []
+        self._cycle = 0
+
+    def start(self):
+        shape = (len(PANEL_COLUMNS), len(self.symbols), self.limit)
+        self._shm = shared_memory.SharedMemory(create=True, size=max(int(np.prod(shape)) * 8, 8))
+        panel = np.ndarray(shape, dtype=np.float64, buffer=self._shm.buf)
+        self._arrays = {col: panel[i] for i, col in enumerate(PANEL_COLUMNS)}
+        self._results = self._ctx.Queue()
+
+        bounds = np.linspace(0, len(self.symbols), self.processes + 1).astype(int)
+        for lo, hi in zip(bounds[:-1], bounds[1:]):
+            self._workers.append({"lo": int(lo), "hi": int(hi), "process": None, "tasks": None})
+        for shard in self._workers:
+            self._spawn(shard)
+        logger.info(f"Sharded scanner: {len(self.symbols)} symbols across {len(self._workers)} processes")
+        return self
+
+    def _spawn(self, shard):
+        shape = (len(PANEL_COLUMNS), len(self.symbols), self.limit)
+        lo, hi = shard["lo"], shard["hi"]
+        shard["tasks"] = self._ctx.Queue()
+        shard["process"] = self._ctx.Process(
+            target=_shard_worker, name=f"scan-shard-{lo}",
+            args=(self._shm.name, shape, lo, hi, self.symbols[lo:hi], self.strategies, shard["tasks"], self._results),
+            daemon=True,
+        )
+        shard["process"].start()
+
+    def scan(self, panel):
+        """Scan a `get_bars_batch` panel; returns the signals, ordered as `symbols`."""
+        self._cycle += 1
+        with timed("panel_stack"):
+            fill_arrays(panel, self.symbols, self._arrays)
+        stamps = bar_stamps(panel, self.symbols)
+
+        for shard in self._workers:
+            if not shard["process"].is_alive():
+                logger.error(f"Scan shard {shard['lo']}-{shard['hi']} died; restarting it")
+                self._spawn(shard)
+            shard["tasks"].put((self._cycle, stamps[shard["lo"]:shard["hi"]]))
+
+        found = {}
+        deadline = time.monotonic() + self.timeout
+        while len(found) < len(self._workers):
+            try:
+                cycle, lo, signals, seconds = self._results.get(timeout=max(deadline - time.monotonic(), 0.0))
+            except queue.Empty:
+                missing = [f"{s['lo']}-{s['hi']}" for s in self._workers if s["lo"] not in found]
+                logger.error(f"Scan shards {', '.join(missing)} didn't answer within {self.timeout}s; skipped")
+                break
+            if cycle != self._cycle:
+                continue  # a late answer to a cycle that already timed out
+            found[lo] = signals
+            stage_seconds.observe(seconds, stage="shard_scan")
+
+        signals = [signal for lo in sorted(found) for signal in found[lo]]
+        for signal in signals:
+            signals_total.inc(setup_tag=signal["setup_tag"])
+        return signals
+
+    def stop(self, timeout=5.0):
+        for shard in self._workers:
+            shard["tasks"].put(None)
+        for shard in self._workers:
+            shard["process"].join(timeout)
+            if shard["process"].is_alive():
+                shard["process"].terminate()
+        self._workers = []
+        if self._shm is not None:
+            self._arrays = None
+            self._shm.close()
+            self._shm.unlink()
+            self._shm = None
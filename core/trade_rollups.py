@@ -0,0 +1,302 @@
+import sys
+import math
+import logging
+import argparse
+from datetime import date
+
+logger = logging.getLogger(__name__)
+
+# Rollups are maintained by the journal writer in the same transaction as the
+# trades they summarize (see JournalWriter._write), so reports read a few rows
+# per day instead of scanning the trades table.
+
+CONFIDENCE_STEP = 0.1
+R_STEP = 0.5
+R_RANGE = (-3.0, 5.0)     # realized R outside this lands in the end buckets
+UNKNOWN_CONFIDENCE = -1.0  # bucket for trades logged without a confidence score
+
+# table -> (key columns, summed columns)
+ROLLUP_TABLES = {
+    "rollup_opened": (("day", "setup_tag", "confidence_bucket"),
+                      ("opened", "position_size", "risk_amount")),
+    "rollup_closed": (("day", "setup_tag", "confidence_bucket", "r_bucket"),
+                      ("closed", "wins", "net_pnl", "r_sum")),
+}
+
+_COLUMN_TYPES = {
+    "day": "DATE", "setup_tag": "TEXT", "confidence_bucket": "NUMERIC", "r_bucket": "NUMERIC",
+    "opened": "INTEGER", "closed": "INTEGER", "wins": "INTEGER",
+}
+
+# Columns of a journal row the rollups read (the writer's UPDATE returns these for each trade it closes)
+CLOSED_COLUMNS = ("date", "setup_tag", "confidence_score", "risk_amount", "sell_date", "net_pnl")
+
+# ------------------------------
+# Buckets and deltas
+# ------------------------------
+
+def confidence_bucket(score):
+    """Lower edge of the score's 0.1-wide bucket (1.0 is its own bucket)."""
+    if score is None:
+        return UNKNOWN_CONFIDENCE
+    # round first so 0.3 / 0.1 = 2.9999... still lands in 0.3
+    return round(math.floor(round(float(score) / CONFIDENCE_STEP, 9)) * CONFIDENCE_STEP, 2)
+
+def r_bucket(r):
+    lo, hi = R_RANGE
+    return min(max(math.floor(round(r / R_STEP, 9)) * R_STEP, lo), hi)
+
+def realized_r(net_pnl, risk_amount):
+    risk = float(risk_amount or 0)
+    return float(net_pnl or 0) / risk if risk > 0 else 0.0
+
+def _add(totals, key, values):
+    current = totals.get(key)
+    totals[key] = values if current is None else tuple(a + b for a, b in zip(current, values))
+
+def opened_deltas(trades):
+    """Journal rows just inserted (dicts of INSERT_COLUMNS) -> {rollup_opened key: summed values}."""
+    totals = {}
+    for t in trades:
+        key = (str(t["date"]), t.get("setup_tag") or "", confidence_bucket(t.get("confidence_score")))
+        _add(totals, key, (1, float(t.get("position_size") or 0), float(t.get("risk_amount") or 0)))
+    return totals
+
+def closed_deltas(trades):
+    """Journal rows just closed (dicts of CLOSED_COLUMNS) -> {rollup_closed key: summed values}."""
+    totals = {}
+    for t in trades:
+        pnl = float(t.get("net_pnl") or 0)
+        r = realized_r(pnl, t.get("risk_amount"))
+        key = (str(t["sell_date"]), t.get("setup_tag") or "", confidence_bucket(t.get("confidence_score")),
+               r_bucket(r))
+        _add(totals, key, (1, int(pnl > 0), pnl, r))
+    return totals
+
+# ------------------------------
+# SQL
+# ------------------------------
+
+def create_sql(table):
+    keys, values = ROLLUP_TABLES[table]
+    columns = ", ".join(f"{c} {_COLUMN_TYPES.get(c, 'NUMERIC')} NOT NULL DEFAULT 0"
+                        if c in values else f"{c} {_COLUMN_TYPES[c]} NOT NULL" for c in keys + values)
+    return f"CREATE TABLE IF NOT EXISTS {table} ({columns}, PRIMARY KEY ({', '.join(keys)}))"
+
+def upsert_sql(table):
+    """INSERT ... VALUES %s (for execute_values) that adds onto existing rollup rows."""
+    keys, values = ROLLUP_TABLES[table]
+    added = ", ".join(f"{c} = {table}.{c} + excluded.{c}" for c in values)
+    return (f"INSERT INTO {table} ({', '.join(keys + values)}) VALUES %s "
+            f"ON CONFLICT ({', '.join(keys)}) DO UPDATE SET {added}")
+
+def rollup_rows(opened, closed):
+    """(table, upsert SQL, rows) for each rollup touched by a batch of inserted and closed trades."""
+    for table, totals in (("rollup_opened", opened_deltas(opened)), ("rollup_closed", closed_deltas(closed))):
+        if totals:
+            yield table, upsert_sql(table), [key + values for key, values in totals.items()]
+
+
+def ensure_rollups(conn):
+    """Create the rollup tables; a journal that predates them is summarized once from the trades table."""
+    with conn.cursor() as cur:
+        cur.execute("SELECT to_regclass('rollup_opened') IS NOT NULL AND to_regclass('rollup_closed') IS NOT NULL")
+        existed = cur.fetchone()[0]
+        for table in ROLLUP_TABLES:
+            cur.execute(create_sql(table))
+    conn.commit()
+    if not existed:
+        rebuild_rollups(conn)
+
+
+def rebuild_rollups(conn=None, chunk_rows=10_000):
+    """Recompute every rollup from the trades table in one transaction (a full scan; for migrations and repairs)."""
+    import core.journal_logger as journal_logger
+
+    if conn is None:
+        journal_logger.flush_journal()
+        with journal_logger._connection() as conn:
+            return rebuild_rollups(conn, chunk_rows)
+
+    columns = ("position_size",) + CLOSED_COLUMNS
+    trades = 0
+    try:
+        with conn.cursor() as cur:
+            cur.execute(f"TRUNCATE {', '.join(ROLLUP_TABLES)}")
+        with conn.cursor(name="rollup_rebuild") as source, conn.cursor() as cur:
+            source.execute(f"SELECT {', '.join(columns)} FROM trades")
+            while True:
+                rows = [dict(zip(columns, row)) for row in source.fetchmany(chunk_rows)]
+                if not rows:
+                    break
+                trades += len(rows)
+                closed = [t for t in rows if t["sell_date"] is not None]
+                for table, sql, values in rollup_rows(rows, closed):
+                    journal_logger.execute_values(cur, sql, values, page_size=1000)
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    logger.info(f"📊 Rollups rebuilt from {trades} journal rows.")
+    return trades
+
+# ------------------------------
+# Queries
+# ------------------------------
+
+def _fetch(table, start=None, end=None, setup_tag=None):
+    """Rollup rows for days in [start, end] as dicts (flushes queued journal writes first)."""
+    import core.journal_logger as journal_logger
+
+    journal_logger.flush_journal()
+    keys, values = ROLLUP_TABLES[table]
+    columns = keys + values
+    with journal_logger._connection() as conn:
+        with conn.cursor() as cur:
+            cur.execute(f"SELECT {', '.join(columns)} FROM {table} WHERE day >= %s AND day <= %s",
+                        ((start or date.min).isoformat(), (end or date.max).isoformat()))
+            rows = cur.fetchall()
+        conn.commit()
+    rows = [dict(zip(columns, row)) for row in rows]
+    if setup_tag is not None:
+        rows = [r for r in rows if r["setup_tag"] == setup_tag]
+    return rows
+
+def _ratio(a, b):
+    return a / b if b else None
+
+def pnl_by_setup(start=None, end=None):
+    """
+    {setup_tag: {"opened", "closed", "wins", "win_rate", "net_pnl", "avg_pnl", "avg_r"}}
+    for trades opened / closed between `start` and `end` (dates, inclusive).
+    """
+    summary = {}
+
+    def entry(tag):
+        return summary.setdefault(tag, {"opened": 0, "closed": 0, "wins": 0, "net_pnl": 0.0, "r_sum": 0.0})
+
+    for row in _fetch("rollup_opened", start, end):
+        entry(row["setup_tag"])["opened"] += int(row["opened"])
+    for row in _fetch("rollup_closed", start, end):
+        e = entry(row["setup_tag"])
+        e["closed"] += int(row["closed"])
+        e["wins"] += int(row["wins"])
+        e["net_pnl"] += float(row["net_pnl"])
+        e["r_sum"] += float(row["r_sum"])
+
+    for e in summary.values():
+        r_sum = e.pop("r_sum")
+        e.update(win_rate=_ratio(e["wins"], e["closed"]), avg_pnl=_ratio(e["net_pnl"], e["closed"]),
+                 avg_r=_ratio(r_sum, e["closed"]))
+    return summary
+
+def win_rate_by_confidence(start=None, end=None, setup_tag=None):
+    """{confidence bucket lower edge (-1 = unscored): {"closed", "wins", "win_rate", "avg_r"}}, closed trades only."""
+    buckets = {}
+    for row in _fetch("rollup_closed", start, end, setup_tag):
+        b = buckets.setdefault(float(row["confidence_bucket"]), {"closed": 0, "wins": 0, "r_sum": 0.0})
+        b["closed"] += int(row["closed"])
+        b["wins"] += int(row["wins"])
+        b["r_sum"] += float(row["r_sum"])
+    for b in buckets.values():
+        r_sum = b.pop("r_sum")
+        b.update(win_rate=_ratio(b["wins"], b["closed"]), avg_r=_ratio(r_sum, b["closed"]))
+    return dict(sorted(buckets.items()))
+
+def r_distribution(start=None, end=None, setup_tag=None):
+    """{realized R bucket lower edge: closed trades}, in R_STEP buckets clipped to R_RANGE."""
+    counts = {}
+    for row in _fetch("rollup_closed", start, end, setup_tag):
+        bucket = float(row["r_bucket"])
+        counts[bucket] = counts.get(bucket, 0) + int(row["closed"])
+    return dict(sorted(counts.items()))
+
+# ------------------------------
+# Columnar export
+# ------------------------------
+
+_EXPORT_TYPES = {
+    "ref": "int64", "date": "date32", "num_shares": "int64", "sell_date": "date32",
+    "buy_price": "float64", "position_size": "float64", "sell_price": "float64", "net_pnl": "float64",
+    "net_roi": "float64", "risk_amount": "float64", "r_multiple": "float64", "confidence_score": "float64",
+}
+
+def _coerce(value, kind):
+    if value is None:
+        return None
+    if kind == "date32":
+        return date.fromisoformat(value) if isinstance(value, str) else value
+    if kind == "float64":
+        return float(value)
+    if kind == "int64":
+        return int(value)
+    return str(value)
+
+def export_trades(path, start=None, end=None, chunk_rows=50_000):
+    """
+    Write journal rows with a trade date in [start, end] to a Parquet file,
+    one row group per `chunk_rows`, reading through a server-side cursor so
+    the whole table is never held in memory. Needs pyarrow. Returns the
+    number of rows written.
+    """
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    import core.journal_logger as journal_logger
+
+    columns = ("ref",) + journal_logger.INSERT_COLUMNS
+    kinds = [_EXPORT_TYPES.get(c, "string") for c in columns]
+    schema = pa.schema([(c, getattr(pa, k)()) for c, k in zip(columns, kinds)])
+
+    journal_logger.flush_journal()
+    written = 0
+    with journal_logger._connection() as conn, pq.ParquetWriter(path, schema) as writer:
+        with conn.cursor(name="trades_export") as cur:
+            cur.execute(f"SELECT {', '.join(columns)} FROM trades WHERE date >= %s AND date <= %s ORDER BY ref",
+                        ((start or date.min).isoformat(), (end or date.max).isoformat()))
+            while True:
+                rows = cur.fetchmany(chunk_rows)
+                if not rows:
+                    break
+                arrays = [pa.array([_coerce(row[i], kind) for row in rows], type=schema.field(i).type)
+                          for i, kind in enumerate(kinds)]
+                writer.write_table(pa.Table.from_arrays(arrays, schema=schema))
+                written += len(rows)
+        conn.commit()
+    logger.info(f"📦 Exported {written} journal rows to {path}")
+    return written
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Trade journal reports from the rollup tables, and Parquet export.")
+    parser.add_argument("command", choices=["report", "export", "rebuild"])
+    parser.add_argument("path", nargs="?", help="output file for export")
+    parser.add_argument("--start", type=date.fromisoformat, default=None)
+    parser.add_argument("--end", type=date.fromisoformat, default=None)
+    args = parser.parse_args()
+
+    if args.command == "rebuild":
+        rebuild_rollups()
+        return 0
+    if args.command == "export":
+        if not args.path:
+            parser.error("export needs an output path")
+        export_trades(args.path, args.start, args.end)
+        return 0
+
+    print(f"{'setup_tag':<20}{'opened':>8}{'closed':>8}{'win %':>8}{'net P&L':>12}{'avg R':>8}")
+    for tag, s in sorted(pnl_by_setup(args.start, args.end).items()):
+        win = f"{s['win_rate']:.0%}" if s["win_rate"] is not None else "-"
+        avg_r = f"{s['avg_r']:.2f}" if s["avg_r"] is not None else "-"
+        print(f"{tag or '(none)':<20}{s['opened']:>8}{s['closed']:>8}{win:>8}{s['net_pnl']:>12.2f}{avg_r:>8}")
+    print()
+    print(f"{'confidence':<20}{'closed':>8}{'win %':>8}{'avg R':>8}")
+    for bucket, b in win_rate_by_confidence(args.start, args.end).items():
+        label = "unscored" if bucket == UNKNOWN_CONFIDENCE else f"{bucket:.1f}-{bucket + CONFIDENCE_STEP:.1f}"
+        print(f"{label:<20}{b['closed']:>8}{b['win_rate']:>8.0%}{b['avg_r']:>8.2f}")
+    print()
+    print("R distribution: " + ", ".join(f"{r:+.1f}R {n}" for r, n in r_distribution(args.start, args.end).items()))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,153 @@
+import os
+import json
+import logging
+import pandas as pd
+from core.bar_store import MARKET_TZ, market_today
+from core.config import resolve_path
+from core.broker_interface import settings, get_tradable_symbols, get_daily_bars_batch
+
+logger = logging.getLogger(__name__)
+
+UNIVERSE_DIR = resolve_path(settings.get("universe_cache_dir", "data/universe"))
+LOOKBACK_DAYS = int(settings.get("universe_lookback_days", 20))
+MIN_PRICE = float(settings.get("universe_min_price", 5))
+MAX_PRICE = float(settings.get("universe_max_price", 500))
+MIN_AVG_VOLUME = float(settings.get("universe_min_avg_volume", 20000))
+MAX_SYMBOLS = settings.get("universe_max_symbols", 1000)
+
+LIQUIDITY_COLUMNS = ["symbol", "days", "avg_volume", "avg_dollar_volume", "last_close"]
+
+# ------------------------------
+# Daily universe cache
+# ------------------------------
+
+class UniverseCache:
+    """
+    Tradable assets and a liquidity index, refreshed once per trading day.
+
+        <root>/assets-<YYYY-MM-DD>.json      tradable symbols
+        <root>/liquidity-<YYYY-MM-DD>.csv    average daily volume / dollar volume and
+                                             last close over the last `lookback_days` sessions
+
+    The first call on a new day rebuilds both files from the API and removes
+    older ones; every other call just reads the files. If a refresh fails, the
+    most recent older file is used instead.
+    """
+
+    def __init__(self, root, lookback_days=LOOKBACK_DAYS):
+        self.root = root
+        self.lookback_days = lookback_days
+
+    def _path(self, kind, day):
+        ext = "json" if kind == "assets" else "csv"
+        return os.path.join(self.root, f"{kind}-{day.isoformat()}.{ext}")
+
+    def _latest(self, kind):
+        """Path of the newest cached file of this kind, or None."""
+        if not os.path.isdir(self.root):
+            return None
+        files = sorted(f for f in os.listdir(self.root) if f.startswith(f"{kind}-"))
+        return os.path.join(self.root, files[-1]) if files else None
+
+    def _replace(self, kind, day):
+        """Drop cached files of this kind from earlier days."""
+        keep = os.path.basename(self._path(kind, day))
+        for f in os.listdir(self.root):
+            if f.startswith(f"{kind}-") and f != keep:
+                os.remove(os.path.join(self.root, f))
+
+    # --- assets ---
+
+    def assets(self, day=None):
+        day = day or market_today()
+        path = self._path("assets", day)
+        if os.path.exists(path):
+            with open(path, "r") as f:
+                return json.load(f)
+
+        symbols = get_tradable_symbols()
+        if not symbols:
+            stale = self._latest("assets")
+            if stale is None:
+                return []
+            logger.warning(f"Asset refresh failed, using {os.path.basename(stale)}")
+            with open(stale, "r") as f:
+                return json.load(f)
+
+        os.makedirs(self.root, exist_ok=True)
+        with open(path, "w") as f:
+            json.dump(symbols, f)
+        self._replace("assets", day)
+        return symbols
+
+    # --- liquidity index ---
+
+    def liquidity(self, day=None):
+        day = day or market_today()
+        path = self._path("liquidity", day)
+        if os.path.exists(path):
+            return pd.read_csv(path, index_col="symbol")
+
+        symbols = self.assets(day)
+        index = build_liquidity_index(
+            # calendar days: enough to cover `lookback_days` sessions plus weekends and holidays
+            get_daily_bars_batch(symbols, days=int(self.lookback_days * 1.5) + 7),
+            before=day,
+            sessions=self.lookback_days,
+        )
+        if index.empty:
+            stale = self._latest("liquidity")
+            if stale is None:
+                return index
+            logger.warning(f"Liquidity refresh failed, using {os.path.basename(stale)}")
+            return pd.read_csv(stale, index_col="symbol")
+
+        os.makedirs(self.root, exist_ok=True)
+        index.to_csv(path)
+        self._replace("liquidity", day)
+        logger.info(f"Built liquidity index for {len(index)} symbols.")
+        return index
+
+    def candidates(self, min_price=MIN_PRICE, max_price=MAX_PRICE,
+                   min_avg_volume=MIN_AVG_VOLUME, max_symbols=MAX_SYMBOLS, day=None):
+        """Symbols in the price band and above the volume floor, most liquid first."""
+        index = self.liquidity(day)
+        if index.empty:
+            return []
+        liquid = index[
+            (index["last_close"] >= min_price)
+            & (index["last_close"] <= max_price)
+            & (index["avg_volume"] >= min_avg_volume)
+        ].sort_values("avg_dollar_volume", ascending=False)
+        if max_symbols:
+            liquid = liquid.head(int(max_symbols))
+        logger.info(f"Universe: {len(liquid)}/{len(index)} symbols pass the liquidity filter.")
+        return list(liquid.index)
+
+
+def build_liquidity_index(daily_panel, before, sessions=LOOKBACK_DAYS):
+    """
+    Average volume, average dollar volume and last close per symbol over its
+    last `sessions` completed daily bars (bars dated `before` or later are ignored).
+    """
+    rows = []
+    for symbol, frame in daily_panel.items():
+        dates = frame.index.tz_convert(MARKET_TZ).date
+        frame = frame[dates < before].tail(sessions)
+        if frame.empty:
+            continue
+        rows.append((
+            symbol,
+            len(frame),
+            float(frame["volume"].mean()),
+            float((frame["close"] * frame["volume"]).mean()),
+            float(frame["close"].iloc[-1]),
+        ))
+    return pd.DataFrame(rows, columns=LIQUIDITY_COLUMNS).set_index("symbol")
+
+
+universe_cache = UniverseCache(UNIVERSE_DIR)
+
+def liquid_universe():
+    """Today's pre-filtered scanning universe (see the universe_* settings)."""
+    return universe_cache.candidates()
@@ -1,16 +1,66 @@
-import pandas as pd
-from ta.momentum import RSIIndicator
-from ta.volume import VolumeWeightedAveragePrice
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+# ta (and pandas with it) is only needed by these reference versions, so it's imported on first use
 
 def calculate_rsi(close_series, period=14):
+    from ta.momentum import RSIIndicator
     rsi_indicator = RSIIndicator(close=close_series, window=period)
     return rsi_indicator.rsi().iloc[-1]
 
-def calculate_vwap(bars: pd.DataFrame):
+def calculate_vwap(bars):
+    from ta.volume import VolumeWeightedAveragePrice
     vwap = VolumeWeightedAveragePrice(
         high=bars['high'],
         low=bars['low'],
         close=bars['close'],
         volume=bars['volume']
     )
-    return vwap.vwap.iloc[-1]
\ No newline at end of file
+    return vwap.vwap.iloc[-1]
+
+# ----------------------------
+# Vectorized (symbols x bars) versions
+# ----------------------------
+# Arrays are 2-D with one row per symbol and one column per bar, oldest first.
+# Rows shorter than the panel are left-padded with NaN.
+
+def _rolling_sum(values, window):
+    out = np.full(values.shape, np.nan)
+    if values.shape[1] >= window:
+        out[:, window - 1:] = sliding_window_view(values, window, axis=1).sum(axis=-1)
+    return out
+
+def rolling_mean_matrix(values, window):
+    return _rolling_sum(values, window) / window
+
+def vwap_matrix(high, low, close, volume, window=14):
+    """Same values as `calculate_vwap` for every bar of every row."""
+    typical_price = (high + low + close) / 3.0
+    return _rolling_sum(typical_price * volume, window) / _rolling_sum(volume, window)
+
+def rsi_matrix(close, period=14):
+    """Same values as `calculate_rsi` for every bar of every row."""
+    n_rows, n_bars = close.shape
+    alpha = 1.0 / period
+    rsi = np.full(close.shape, np.nan)
+    ema_up = np.zeros(n_rows)
+    ema_dn = np.zeros(n_rows)
+    count = np.zeros(n_rows, dtype=int)
+    prev = np.full(n_rows, np.nan)
+
+    # Wilder smoothing is recursive in time, so loop over bars and vectorize across rows
+    with np.errstate(invalid="ignore", divide="ignore"):
+        for t in range(n_bars):
+            c = close[:, t]
+            valid = ~np.isnan(c)
+            diff = c - prev
+            up = np.where(diff > 0, diff, 0.0)
+            dn = np.where(diff < 0, -diff, 0.0)
+            first = valid & (count == 0)
+            ema_up = np.where(first, up, np.where(valid, (1 - alpha) * ema_up + alpha * up, ema_up))
+            ema_dn = np.where(first, dn, np.where(valid, (1 - alpha) * ema_dn + alpha * dn, ema_dn))
+            count += valid
+            prev = np.where(valid, c, prev)
+            value = np.where(ema_dn == 0, 100.0, 100.0 - 100.0 / (1.0 + ema_up / ema_dn))
+            rsi[:, t] = np.where(valid & (count >= period), value, np.nan)
+    return rsi
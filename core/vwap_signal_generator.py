@@ -1,10 +1,12 @@
-import time
 import datetime
 import pytz
 import logging
-from alpaca_trade_api.rest import REST, TimeFrame
-from core.utils import calculate_vwap, calculate_rsi
-from core.broker_interface import api
+import numpy as np
+from core.indicators import IndicatorEngine
+from core.utils import vwap_matrix, rsi_matrix, rolling_mean_matrix
+from core.broker_interface import api, scheduler
+from core.request_scheduler import PRIORITY_DATA
+from core.metrics import timed, signals_total
 
 logger = logging.getLogger(__name__)
 
@@ -12,59 +14,196 @@ MARKET_TZ = pytz.timezone("America/New_York")
 START_TIME = datetime.time(hour=9, minute=45)
 END_TIME = datetime.time(hour=11, minute=30)
 
+# Running indicators per symbol, so each pass only folds in bars it hasn't seen
+indicator_engine = IndicatorEngine()
+
 def is_market_open_now():
     now = datetime.datetime.now(MARKET_TZ).time()
     return START_TIME <= now <= END_TIME
 
-def generate_vwap_bounce_signal(symbol: str, max_retries: int = 3):
+def is_in_vwap_window(timestamp):
+    """Same window check as `is_market_open_now`, for a bar's own (tz-aware) timestamp."""
+    return START_TIME <= timestamp.astimezone(MARKET_TZ).time() <= END_TIME
+
+def evaluate_vwap_bounce(symbol: str, bars):
+    """Apply the VWAP bounce rule to a timestamp-indexed bar DataFrame."""
+    if bars is None or bars.empty:
+        logger.warning(f"No bar data for {symbol}", extra={"sample": "no_bars"})
+        return None
+
+    state = indicator_engine.update_frame(symbol, bars)
+    return evaluate_vwap_bounce_state(symbol, state)
+
+def evaluate_vwap_bounce_state(symbol: str, state):
+    """Apply the VWAP bounce rule to a symbol's running IndicatorState."""
+    if not state.ready or state.prev_low is None:
+        return None
+
+    price = state.close
+    vwap = state.vwap
+    rsi = state.rsi
+    volume = state.volume
+    avg_volume = state.avg_volume
+
+    if price > vwap and state.prev_low < vwap < state.close:
+        if rsi < 45 and volume > avg_volume:
+            signal = build_vwap_bounce_signal(symbol, price, vwap)
+            logger.info(f"Generated VWAP bounce signal: {signal}")
+            return signal
+
+    return None  # No signal condition met
+
+def build_vwap_bounce_signal(symbol, price, vwap):
+    stop_loss = round(float(vwap) * 0.995, 2)
+    risk_per_share = abs(float(price) - stop_loss)
+    take_profit = round(float(price) + (1.5 * risk_per_share), 2)
+
+    return {
+        "symbol": symbol,
+        "side": "buy",
+        "stop_loss": stop_loss,
+        "take_profit": take_profit,
+        "confidence": 0.85,
+        "setup_tag": "VWAP Bounce"
+    }
+
+# ------------------------------
+# Vectorized evaluation across the universe
+# ------------------------------
+
+PANEL_COLUMNS = ("high", "low", "close", "volume")
+
+@timed("panel_stack")
+def panel_to_arrays(panel, limit=50):
+    """
+    Stack a {symbol: bars DataFrame} panel into symbols x bars arrays.
+
+    Each row holds a symbol's last `limit` bars, right-aligned so column -1 is
+    its latest bar; shorter histories are left-padded with NaN.
+    Returns (symbols, {"high": ..., "low": ..., "close": ..., "volume": ...}).
+    """
+    symbols = [symbol for symbol, bars in panel.items() if bars is not None and not bars.empty]
+    arrays = {col: np.empty((len(symbols), limit)) for col in PANEL_COLUMNS}
+    fill_arrays(panel, symbols, arrays)
+    return symbols, arrays
+
+def fill_arrays(panel, symbols, arrays):
+    """
+    Write the panel into existing symbols x bars `arrays` (row i is
+    symbols[i], laid out as in `panel_to_arrays`). Rows of symbols missing
+    from the panel are all NaN, so they never fire.
+    """
+    limit = arrays["close"].shape[1]
+    for array in arrays.values():
+        array.fill(np.nan)
+    for row, symbol in enumerate(symbols):
+        bars = panel.get(symbol)
+        if bars is None or bars.empty:
+            continue
+        bars = bars.tail(limit)
+        n = len(bars)
+        for col, array in arrays.items():
+            array[row, limit - n:] = bars[col].to_numpy(dtype=float)
+
+def scan_vwap_bounce(symbols, high, low, close, volume):
+    """
+    Evaluate the VWAP bounce rule for every row of symbols x bars arrays in
+    one pass and return the list of signal dicts.
+    """
+    if len(symbols) == 0 or close.shape[1] < 2:
+        return []
+
+    with timed("indicators"):
+        vwap, rsi, avg_volume = vwap_bounce_indicators(high, low, close, volume)
+
+    signals = vwap_bounce_signals(symbols, low, close, volume, vwap, rsi, avg_volume)
+    for signal in signals:
+        signals_total.inc(setup_tag=signal["setup_tag"])
+    return signals
+
+def vwap_bounce_indicators(high, low, close, volume):
+    """Each row's latest VWAP, RSI and 10-bar average volume, as the rule reads them."""
+    return (
+        vwap_matrix(high, low, close, volume)[:, -1],
+        rsi_matrix(close)[:, -1],
+        rolling_mean_matrix(volume, 10)[:, -1],
+    )
+
+def vwap_bounce_hits(low, close, volume, vwap, rsi, avg_volume):
+    """Which rows of symbols x bars arrays fire the VWAP bounce rule on their latest bar."""
+    price = close[:, -1]
+
+    # NaN (not enough history) compares False, so those rows never fire
+    with np.errstate(invalid="ignore"):
+        return (
+            (price > vwap)
+            & (low[:, -2] < vwap)
+            & (vwap < close[:, -1])
+            & (rsi < 45)
+            & (volume[:, -1] > avg_volume)
+        )
+
+def vwap_bounce_signals(symbols, low, close, volume, vwap, rsi, avg_volume):
+    """
+    The VWAP bounce rule over symbols x bars arrays, given each row's
+    latest `vwap`, `rsi` and `avg_volume` (1-D, one value per row).
+    """
+    price = close[:, -1]
+    with timed("signal_rule"):
+        hits = vwap_bounce_hits(low, close, volume, vwap, rsi, avg_volume)
+
+    signals = []
+    for row in np.flatnonzero(hits):
+        signal = build_vwap_bounce_signal(symbols[row], price[row], vwap[row])
+        logger.info(f"Generated VWAP bounce signal: {signal}")
+        signals.append(signal)
+    return signals
+
+def scan_vwap_bounce_panel(panel, limit=50):
+    """Vectorized VWAP bounce scan over a `get_bars_batch` panel."""
+    symbols, arrays = panel_to_arrays(panel, limit)
+    return scan_vwap_bounce(symbols, **arrays)
+
+def generate_vwap_bounce_signal(symbol: str, bars=None):
+    """
+    Evaluate the VWAP bounce setup for one symbol.
+
+    Pass `bars` (e.g. a frame from `get_bars_batch`) to evaluate without any
+    API call; otherwise the bars are fetched for this symbol alone, in one
+    attempt: a failed fetch returns None rather than sleeping to retry (the
+    polling scanner retries failed symbols on a later pass, see run_scanner.py).
+    """
     if not is_market_open_now():
         logger.info("Outside preferred VWAP bounce window")
         return None
 
-    for attempt in range(1, max_retries + 1):
+    if bars is not None:
         try:
-            bars = api.get_bars(symbol, TimeFrame.Minute, limit=50, feed='iex').df
-            if bars.empty:
-                logger.warning(f"No bar data for {symbol}")
-                return None
-
-            # Fix: Reset index to expose 'timestamp' as a column
-            bars.reset_index(inplace=True)
-            bars.set_index('timestamp', inplace=True)
-            bars.sort_index(inplace=True)
-
-            price = bars['close'].iloc[-1]
-            vwap = calculate_vwap(bars)
-            rsi = calculate_rsi(bars['close'])
-            volume = bars['volume'].iloc[-1]
-            avg_volume = bars['volume'].rolling(10).mean().iloc[-1]
-
-            if price > vwap and bars['low'].iloc[-2] < vwap < bars['close'].iloc[-1]:
-                if rsi < 45 and volume > avg_volume:
-                    stop_loss = round(vwap * 0.995, 2)
-                    risk_per_share = abs(price - stop_loss)
-                    take_profit = round(price + (1.5 * risk_per_share), 2)
-
-                    signal = {
-                        "symbol": symbol,
-                        "side": "buy",
-                        "stop_loss": stop_loss,
-                        "take_profit": take_profit,
-                        "confidence": 0.85,
-                        "setup_tag": "VWAP Bounce"
-                    }
-                    logger.info(f"Generated VWAP bounce signal: {signal}")
-                    return signal
-
-            return None  # No signal condition met
-
+            return evaluate_vwap_bounce(symbol, bars)
         except Exception as e:
-            logger.warning(f"[Attempt {attempt}] Error for {symbol}: {e}")
-            if attempt < max_retries:
-                wait_time = attempt * 2
-                logger.info(f"Retrying {symbol} in {wait_time}s...")
-                time.sleep(wait_time)
-            else:
-                logger.error(f"Failed all {max_retries} attempts for {symbol}")
-
-    return None
\ No newline at end of file
+            logger.error(f"Error evaluating {symbol}: {e}")
+            return None
+
+    from alpaca_trade_api.rest import TimeFrame
+
+    try:
+        bars = scheduler.call(api.get_bars, symbol, TimeFrame.Minute, limit=50, feed='iex',
+                              priority=PRIORITY_DATA).df
+    except Exception as e:
+        logger.error(f"Error fetching bars for {symbol}: {e}")
+        return None
+
+    if bars.empty:
+        logger.warning(f"No bar data for {symbol}", extra={"sample": "no_bars"})
+        return None
+
+    # Fix: Reset index to expose 'timestamp' as a column
+    bars.reset_index(inplace=True)
+    bars.set_index('timestamp', inplace=True)
+    bars.sort_index(inplace=True)
+
+    try:
+        return evaluate_vwap_bounce(symbol, bars)
+    except Exception as e:
+        logger.error(f"Error evaluating {symbol}: {e}")
+        return None
@@ -1,5 +1,10 @@
 from core.broker_interface import connect, get_account
 from core.execution_engine import process_signal
+from core.journal_logger import recover_journal
+from core.logging_setup import setup_logging
+
+setup_logging()
+recover_journal()
 
 if connect():
     account = get_account()
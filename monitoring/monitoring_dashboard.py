@@ -0,0 +1,177 @@
+import re
+import sys
+import time
+import argparse
+import urllib.request
+from core.config import load_settings
+
+# Reads the scanner's /metrics endpoint (see core/metrics.py) and prints where
+# each scan cycle's time goes. Run from the repo root:
+#
+#     python -m monitoring.monitoring_dashboard [--url URL] [--interval 5] [--once]
+
+settings = load_settings()
+
+DEFAULT_URL = f"http://127.0.0.1:{settings.get('metrics_port') or 9108}/metrics"
+
+STAGE_ORDER = [
+    "bar_fetch", "panel_stack", "shard_scan", "indicators", "signal_rule", "risk_check",
+    "price_fetch", "sizing", "bracket_submit", "journal_enqueue", "journal_write",
+]
+
+_LINE = re.compile(r'^([a-zA-Z_:][a-zA-Z0-9_:]*)(?:\{(.*)\})?\s+(\S+)$')
+_LABEL = re.compile(r'(\w+)="([^"]*)"')
+
+# ------------------------------
+# Parsing
+# ------------------------------
+
+def fetch(url):
+    with urllib.request.urlopen(url, timeout=5) as response:
+        return response.read().decode()
+
+def parse_metrics(text):
+    """Prometheus text format -> {(name, ((label, value), ...)): float}."""
+    samples = {}
+    for line in text.splitlines():
+        match = _LINE.match(line)
+        if not match or line.startswith("#"):
+            continue
+        name, labels, value = match.groups()
+        key = tuple(sorted(_LABEL.findall(labels or "")))
+        samples[(name, key)] = float(value)
+    return samples
+
+def diff(current, previous):
+    """Per-sample change since the previous scrape (counters and histograms only grow)."""
+    if not previous:
+        return current
+    return {key: value - previous.get(key, 0.0) for key, value in current.items()}
+
+def histograms(samples, name, label):
+    """{label value: {"buckets": [(le, cumulative)], "sum": s, "count": n}} for one histogram."""
+    result = {}
+    for (sample, labels), value in samples.items():
+        labels = dict(labels)
+        group = result.setdefault(labels.get(label, ""), {"buckets": [], "sum": 0.0, "count": 0.0})
+        if sample == f"{name}_bucket":
+            group["buckets"].append((float(labels["le"]), value))
+        elif sample == f"{name}_sum":
+            group["sum"] = value
+        elif sample == f"{name}_count":
+            group["count"] = value
+    for group in result.values():
+        group["buckets"].sort()
+    return {k: v for k, v in result.items() if v["count"] > 0}
+
+def quantile(buckets, q):
+    """Estimate a quantile from cumulative buckets (linear within a bucket, like histogram_quantile)."""
+    total = buckets[-1][1] if buckets else 0
+    if total == 0:
+        return float("nan")
+    rank = q * total
+    lower, seen = 0.0, 0.0
+    for le, cumulative in buckets:
+        if cumulative >= rank:
+            if le == float("inf"):
+                return lower
+            in_bucket = cumulative - seen
+            return lower + (le - lower) * ((rank - seen) / in_bucket if in_bucket else 1.0)
+        lower, seen = le, cumulative
+    return lower
+
+# ------------------------------
+# Rendering
+# ------------------------------
+
+def _ms(seconds):
+    return f"{seconds * 1000:9.2f}"
+
+def render(samples):
+    lines = []
+
+    cycles = histograms(samples, "bot_scan_cycle_seconds", "")
+    if cycles:
+        c = cycles[""]
+        lines.append(f"Scan cycles: {int(c['count'])}   mean {_ms(c['sum'] / c['count']).strip()} ms"
+                     f"   p95 {_ms(quantile(c['buckets'], 0.95)).strip()} ms")
+        lines.append("")
+
+    stages = histograms(samples, "bot_stage_seconds", "stage")
+    cycle_time = sum(g["sum"] for g in stages.values()) or 1.0
+    lines.append(f"{'stage':<16}{'count':>8}{'mean ms':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'share':>8}")
+    ordered = [s for s in STAGE_ORDER if s in stages] + sorted(set(stages) - set(STAGE_ORDER))
+    for stage in ordered:
+        g = stages[stage]
+        lines.append(
+            f"{stage:<16}{int(g['count']):>8}{_ms(g['sum'] / g['count']):>10}"
+            f"{_ms(quantile(g['buckets'], 0.5)):>10}{_ms(quantile(g['buckets'], 0.95)):>10}"
+            f"{_ms(quantile(g['buckets'], 0.99)):>10}{g['sum'] / cycle_time:>8.1%}"
+        )
+
+    lines.append("")
+    lines.append(f"{'endpoint':<16}{'calls':>8}{'errors':>8}{'err %':>8}{'mean ms':>10}{'p95 ms':>10}")
+    latency = histograms(samples, "bot_api_request_seconds", "endpoint")
+    for endpoint in sorted(latency):
+        g = latency[endpoint]
+        calls = samples.get(("bot_api_requests_total", (("endpoint", endpoint),)), g["count"])
+        errors = samples.get(("bot_api_errors_total", (("endpoint", endpoint),)), 0.0)
+        lines.append(
+            f"{endpoint:<16}{int(calls):>8}{int(errors):>8}{(errors / calls if calls else 0):>8.1%}"
+            f"{_ms(g['sum'] / g['count']):>10}{_ms(quantile(g['buckets'], 0.95)):>10}"
+        )
+
+    waits = histograms(samples, "bot_queue_wait_seconds", "stage")
+    if waits:
+        lines.append("")
+        lines.append(f"{'queue':<16}{'items':>8}{'dropped':>8}{'mean ms':>10}{'p95 ms':>10}")
+        for stage in ("risk", "order", "journal"):
+            if stage not in waits:
+                continue
+            g = waits[stage]
+            dropped = samples.get(("bot_pipeline_dropped_total", (("stage", stage),)), 0.0)
+            lines.append(f"{stage:<16}{int(g['count']):>8}{int(dropped):>8}"
+                         f"{_ms(g['sum'] / g['count']):>10}{_ms(quantile(g['buckets'], 0.95)):>10}")
+
+    signals = {dict(labels).get("setup_tag"): value for (name, labels), value in samples.items()
+               if name == "bot_signals_total"}
+    if signals:
+        lines.append("")
+        lines.append("Signals: " + ", ".join(f"{tag} {int(n)}" for tag, n in sorted(signals.items())))
+
+    return "\n".join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Live latency breakdown from the scanner's metrics endpoint.")
+    parser.add_argument("--url", default=DEFAULT_URL)
+    parser.add_argument("--interval", type=float, default=5.0, help="seconds between refreshes")
+    parser.add_argument("--once", action="store_true", help="print totals since start and exit")
+    args = parser.parse_args()
+
+    previous = None
+    while True:
+        try:
+            current = parse_metrics(fetch(args.url))
+        except Exception as e:
+            print(f"Couldn’t read {args.url}: {e}", file=sys.stderr)
+            if args.once:
+                return 1
+            time.sleep(args.interval)
+            continue
+
+        if args.once:
+            print(render(current))
+            return 0
+
+        # After the first scrape, show only what happened during the last interval
+        window = "since start" if previous is None else f"last {args.interval:g}s"
+        print("\033[2J\033[H", end="")
+        print(f"VWAP bot metrics ({window}) — {time.strftime('%H:%M:%S')}\n")
+        print(render(diff(current, previous)))
+        previous = current
+        time.sleep(args.interval)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,12 +1,17 @@
 import time
 import logging
-from core.vwap_signal_generator import generate_vwap_bounce_signal
-from core.execution_engine import process_signal
-from core.broker_interface import get_tradable_symbols
+from core.vwap_signal_generator import is_market_open_now
+from core.pipeline import pipeline_from_settings
+from core.sharded_scanner import ShardedScanner
+from scanner_hooks.strategies import StrategyEngine
+from core.broker_interface import get_bars_batch, settings
+from core.universe import liquid_universe
+from core.metrics import scan_cycle_seconds, start_metrics_server
+from core.logging_setup import setup_logging
+from core.journal_logger import recover_journal
+from core.error_handler import DeferredRetries
 
-# Setup logging
 logger = logging.getLogger(__name__)
-logging.basicConfig(level=logging.INFO)
 
 # ------------------------
 # STEP 1: Define symbols
@@ -14,52 +19,188 @@ logging.basicConfig(level=logging.INFO)
 
 USE_ALL_SYMBOLS = False
 
-# Either use all tradable symbols, or a curated top 100
-if USE_ALL_SYMBOLS:
-    symbols = get_tradable_symbols()
-else:
-    symbols = [
-        "AAPL", "MSFT", "NVDA", "AMZN", "META", "GOOGL", "GOOG", "TSLA", "BRK.B", "UNH",
-        "LLY", "V", "JPM", "XOM", "MA", "AVGO", "JNJ", "PG", "HD", "MRK",
-        "COST", "ABBV", "PEP", "ADBE", "KO", "CVX", "CRM", "WMT", "ACN", "MCD",
-        "BAC", "TMO", "AMD", "LIN", "ABT", "NFLX", "INTC", "CSCO", "DHR", "CMCSA",
-        "PFE", "NKE", "TXN", "VZ", "NEE", "PM", "ORCL", "WFC", "AMGN", "IBM",
-        "RTX", "MS", "HON", "BA", "QCOM", "UNP", "MDT", "LOW", "INTU", "SPGI",
-        "SCHW", "CAT", "GS", "PLD", "GE", "ISRG", "LMT", "T", "NOW", "AMT",
-        "ADI", "GILD", "ELV", "BLK", "ZTS", "SYK", "MO", "MMC", "C", "MDLZ",
-        "DE", "ADP", "CI", "CB", "REGN", "USB", "SO", "CL", "VRTX", "PGR",
-        "TGT", "AXP", "APD", "BSX", "TJX", "DUK", "BDX", "ETN", "FIS", "PNC",
-        "GIS", "HUM", "ICE", "ILMN", "INFO", "ITW", "JKHY", "KLAC", "KMB", "KMI",
-        "KSS", "LHX", "LRCX", "LVS", "MAR", "MCHP", "MET", "MGM", "MSCI", "MTB",
-        "MU", "MCO", "NAP", "NEM", "NI", "NOC", "NTRS", "ODFL", "OKE", "ORLY",
-        "PAYX", "PNR", "PPG", "PSA", "PTON", "PXD", "QRVO", "RHI", "RJF", "ROL",
-        "ROP", "RSG", "SBUX", "SIVB", "SNPS", "STT", "SWKS", "SYY", "TRV", "TROW",
-        "TT", "TYL", "UDR", "VMC", "WAB", "WBA", "WDC", "WELL", "WMB", "WRB",
-        "WU", "WY", "XLNX", "XRAY", "YUM", "ZBRA", "ZBH", "ZION", "AEP", "AES",
-        "APTV", "BBY", "BLL", "CAH", "CHD", "CLX", "CMI", "CNP", "CNC", "COTY",
-        "CPRT", "CXO", "D", "DAL", "DD", "DFS", "DTE", "ECL", "EMR", "ETR",
-        "EW", "EXC", "EXR", "FAST", "FE", "FDX", "FLIR", "GLW", "GWW", "HAL",
-        "HCA", "HES", "HLT", "HOLX", "HPE"
-    ]
+# Either use all tradable symbols (pruned to liquid names by the daily universe cache), or a curated top 100
+SYMBOLS = [
+    "AAPL", "MSFT", "NVDA", "AMZN", "META", "GOOGL", "GOOG", "TSLA", "BRK.B", "UNH",
+    "LLY", "V", "JPM", "XOM", "MA", "AVGO", "JNJ", "PG", "HD", "MRK",
+    "COST", "ABBV", "PEP", "ADBE", "KO", "CVX", "CRM", "WMT", "ACN", "MCD",
+    "BAC", "TMO", "AMD", "LIN", "ABT", "NFLX", "INTC", "CSCO", "DHR", "CMCSA",
+    "PFE", "NKE", "TXN", "VZ", "NEE", "PM", "ORCL", "WFC", "AMGN", "IBM",
+    "RTX", "MS", "HON", "BA", "QCOM", "UNP", "MDT", "LOW", "INTU", "SPGI",
+    "SCHW", "CAT", "GS", "PLD", "GE", "ISRG", "LMT", "T", "NOW", "AMT",
+    "ADI", "GILD", "ELV", "BLK", "ZTS", "SYK", "MO", "MMC", "C", "MDLZ",
+    "DE", "ADP", "CI", "CB", "REGN", "USB", "SO", "CL", "VRTX", "PGR",
+    "TGT", "AXP", "APD", "BSX", "TJX", "DUK", "BDX", "ETN", "FIS", "PNC",
+    "GIS", "HUM", "ICE", "ILMN", "INFO", "ITW", "JKHY", "KLAC", "KMB", "KMI",
+    "KSS", "LHX", "LRCX", "LVS", "MAR", "MCHP", "MET", "MGM", "MSCI", "MTB",
+    "MU", "MCO", "NAP", "NEM", "NI", "NOC", "NTRS", "ODFL", "OKE", "ORLY",
+    "PAYX", "PNR", "PPG", "PSA", "PTON", "PXD", "QRVO", "RHI", "RJF", "ROL",
+    "ROP", "RSG", "SBUX", "SIVB", "SNPS", "STT", "SWKS", "SYY", "TRV", "TROW",
+    "TT", "TYL", "UDR", "VMC", "WAB", "WBA", "WDC", "WELL", "WMB", "WRB",
+    "WU", "WY", "XLNX", "XRAY", "YUM", "ZBRA", "ZBH", "ZION", "AEP", "AES",
+    "APTV", "BBY", "BLL", "CAH", "CHD", "CLX", "CMI", "CNP", "CNC", "COTY",
+    "CPRT", "CXO", "D", "DAL", "DD", "DFS", "DTE", "ECL", "EMR", "ETR",
+    "EW", "EXC", "EXR", "FAST", "FE", "FDX", "FLIR", "GLW", "GWW", "HAL",
+    "HCA", "HES", "HLT", "HOLX", "HPE"
+]
 
 # -----------------------------
-# STEP 2: Scanning loop
+# STEP 2: Bar-close schedule
 # -----------------------------
 
-SCAN_INTERVAL = 5  # seconds (adjust for frequency)
-logger.info("Starting VWAP bounce scanner...")
-
-try:
-    while True:
-        for symbol in symbols:
-            logger.info(f"Scanning symbol: {symbol}")
-            signal = generate_vwap_bounce_signal(symbol)
-            if signal:
-                process_signal(signal)
-        logger.info(f"Sleeping for {SCAN_INTERVAL} seconds...")
-        time.sleep(SCAN_INTERVAL)
-
-except KeyboardInterrupt:
-    logger.info("Scanner manually stopped.")
-except Exception as e:
-    logger.exception(f"Unexpected error in scanner: {e}")
\ No newline at end of file
+# Stream minute bars and evaluate each symbol as its bar closes, instead of polling REST
+STREAM_MODE = False
+
+# Polling mode: more than 1 splits the scan across that many worker processes
+SCAN_PROCESSES = int(settings.get("scanner_processes", 1))
+
+# Polling mode: each minute's scan starts SCAN_SETTLE seconds after the bar close (once
+# the bars are published), split into SCAN_SLICES groups spread over SCAN_SPREAD seconds
+SCAN_SETTLE = float(settings.get("scan_settle_seconds", 3))
+SCAN_SLICES = int(settings.get("scan_slices", 1))
+SCAN_SPREAD = float(settings.get("scan_spread_seconds", 30))
+
+# Polling mode: symbols whose bar request failed get an extra pass of their own after a
+# jittered backoff (from SCAN_RETRY_BASE seconds), up to SCAN_RETRY_ATTEMPTS times in a row
+SCAN_RETRY_BASE = float(settings.get("scan_retry_base_seconds", 2))
+SCAN_RETRY_ATTEMPTS = int(settings.get("scan_retry_attempts", 3))
+
+
+class BarCloseSchedule:
+    """
+    When to scan which symbols, aligned to minute bar closes.
+
+    The universe is cut into `slices` groups. Group i is due every minute at
+    `settle + i * spread / slices` seconds past the bar close, so fetches are
+    spread over the minute instead of landing together. `fresh` keeps only
+    symbols whose latest bar is newer than the one they were last evaluated
+    on, and `dedup` drops a signal already sent for the same symbol, setup
+    and bar.
+    """
+
+    def __init__(self, symbols, slices=1, settle=3.0, spread=30.0):
+        symbols = list(symbols)
+        count = max(1, min(slices, len(symbols)))
+        size = -(-len(symbols) // count)
+        self.slices = [symbols[i:i + size] for i in range(0, len(symbols), size)] or [[]]
+        self.settle = settle
+        self.spread = spread
+        self._evaluated = {}  # symbol -> timestamp of the last bar it was evaluated on
+        self._signaled = {}   # (symbol, setup_tag) -> timestamp of the bar it last signaled on
+
+    def next_slot(self, now):
+        """(epoch seconds, symbols) of the first slice due at or after `now`."""
+        minute = now - now % 60
+        offsets = [self.settle + i * self.spread / len(self.slices) for i in range(len(self.slices))]
+        for start in (minute, minute + 60):
+            for offset, symbols in zip(offsets, self.slices):
+                if start + offset >= now:
+                    return start + offset, symbols
+        return minute + 60 + offsets[0], self.slices[0]
+
+    def fresh(self, panel):
+        """The part of a `get_bars_batch` panel with a bar not yet evaluated (and mark those evaluated)."""
+        fresh = {}
+        for symbol, bars in panel.items():
+            if bars is None or bars.empty:
+                continue
+            last = bars.index[-1]
+            if self._evaluated.get(symbol) is None or last > self._evaluated[symbol]:
+                self._evaluated[symbol] = last
+                fresh[symbol] = bars
+        return fresh
+
+    def dedup(self, signals, panel):
+        """Signals not already sent for their symbol, setup and latest bar."""
+        kept = []
+        for signal in signals:
+            key = (signal["symbol"], signal.get("setup_tag"))
+            bar = panel[signal["symbol"]].index[-1]
+            if self._signaled.get(key) == bar:
+                logger.info(f"Skipping repeat {key[1]} signal for {key[0]} on the {bar} bar",
+                            extra={"sample": "repeat_signal"})
+                continue
+            self._signaled[key] = bar
+            kept.append(signal)
+        return kept
+
+
+def main():
+    # Handlers run on a background thread, so logging never holds up a scan
+    setup_logging()
+    # Journal writes a previous run spooled but never committed
+    recover_journal()
+    symbols = liquid_universe() if USE_ALL_SYMBOLS else SYMBOLS
+
+    logger.info("Starting VWAP bounce scanner...")
+
+    # Prometheus-format metrics for monitoring/monitoring_dashboard.py (metrics_port: null disables)
+    if settings.get("metrics_port"):
+        start_metrics_server(int(settings["metrics_port"]))
+
+    # Risk checks, orders and journaling run on their own workers so signals never stall the scan
+    pipeline = pipeline_from_settings().start()
+    sharded = None
+
+    try:
+        if STREAM_MODE:
+            from core.bar_stream import BarStreamScanner  # only streaming needs the websocket stack
+            scanner = BarStreamScanner(symbols, pipeline.submit)
+            scanner.warm_up(get_bars_batch(symbols))
+            scanner.run()
+        else:
+            # The enabled strategies (settings: strategies) share one bar fetch and indicator cache per cycle
+            engine = StrategyEngine()
+            if SCAN_PROCESSES > 1:
+                # This process fetches and submits orders; the workers only scan their slice of the panel
+                sharded = ShardedScanner(symbols, SCAN_PROCESSES).start()
+            schedule = BarCloseSchedule(symbols, SCAN_SLICES, SCAN_SETTLE, SCAN_SPREAD)
+            retries = DeferredRetries(base=SCAN_RETRY_BASE, max_attempts=SCAN_RETRY_ATTEMPTS)
+            after = time.time()
+            while True:
+                # If a scan overran later slots, carry on from the next one still ahead
+                run_at, due = schedule.next_slot(max(after, time.time()))
+                # Failed symbols whose backoff ends before that slot get a pass of their own
+                retry_at = retries.next_due()
+                if retry_at is not None and retry_at < run_at:
+                    run_at, due = retry_at, []
+                time.sleep(max(run_at - time.time(), 0))
+                after = max(after, run_at + 0.001)
+                if not is_market_open_now():
+                    logger.info("Outside preferred VWAP bounce window")
+                    continue
+                listed = set(due)
+                due = list(due) + [symbol for symbol in retries.pop_due() if symbol not in listed]
+                if not due:
+                    continue
+
+                # One batched fetch per slice, then one vectorized pass per strategy over the symbols with a new bar
+                with scan_cycle_seconds.time():
+                    failed = []
+                    panel = get_bars_batch(due, limit=engine.limit, failed=failed)
+                    # Failed chunks don't hold up the rest of the slice; they're retried on a later pass
+                    retries.clear(set(due) - set(failed))
+                    if failed:
+                        dropped = retries.defer(failed)
+                        logger.warning(f"Deferred {len(failed) - len(dropped)} symbol(s) to a retry pass"
+                                       + (f", gave up on {len(dropped)} until their next slot" if dropped else ""))
+                    fresh = schedule.fresh(panel)
+                    logger.info(f"Scanning {len(fresh)} of {len(due)} symbols with a new bar...")
+                    if fresh:
+                        signals = sharded.scan(fresh) if sharded else engine.scan(fresh)
+                        for signal in schedule.dedup(signals, fresh):
+                            pipeline.submit(signal)
+
+    except KeyboardInterrupt:
+        logger.info("Scanner manually stopped.")
+    except Exception as e:
+        logger.exception(f"Unexpected error in scanner: {e}")
+    finally:
+        if sharded is not None:
+            sharded.stop()
+        pipeline.stop()
+
+
+# Worker processes are spawned and re-import this file, so the scanner only starts when run directly
+if __name__ == "__main__":
+    main()
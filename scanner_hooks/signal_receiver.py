@@ -0,0 +1,268 @@
+import math
+import time
+import asyncio
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from aiohttp import web
+from core.broker_interface import settings
+from core.metrics import receiver_signals_total
+from core.logging_setup import setup_logging
+
+logger = logging.getLogger(__name__)
+
+# prepare_orders only builds long brackets (take profit above the entry), so sells are refused
+SIDES = ("buy",)
+DEFAULT_SETUP_TAG = "External"
+
+_STOP = object()
+
+# ------------------------------
+# Signal validation
+# ------------------------------
+
+def _number(value):
+    return isinstance(value, (int, float)) and not isinstance(value, bool) and math.isfinite(value)
+
+def validate_signal(payload):
+    """
+    Check an incoming signal against what `process_signal` expects.
+    Returns (signal, None) with only the known fields kept, or (None, reason).
+    """
+    if not isinstance(payload, dict):
+        return None, "signal must be a JSON object"
+
+    symbol = payload.get("symbol")
+    if not isinstance(symbol, str) or not symbol.strip():
+        return None, "symbol must be a non-empty string"
+    side = payload.get("side")
+    if side not in SIDES:
+        return None, f"side must be {' or '.join(SIDES)}"
+    stop_loss = payload.get("stop_loss")
+    if not _number(stop_loss) or stop_loss <= 0:
+        return None, "stop_loss must be a positive number"
+
+    signal = {"symbol": symbol.strip().upper(), "side": side, "stop_loss": float(stop_loss)}
+
+    if "confidence" in payload:
+        confidence = payload["confidence"]
+        if not _number(confidence) or not 0 <= confidence <= 1:
+            return None, "confidence must be a number between 0 and 1"
+        signal["confidence"] = float(confidence)
+    setup_tag = payload.get("setup_tag", DEFAULT_SETUP_TAG)
+    if not isinstance(setup_tag, str) or not setup_tag:
+        return None, "setup_tag must be a non-empty string"
+    signal["setup_tag"] = setup_tag
+    return signal, None
+
+# ------------------------------
+# HTTP receiver
+# ------------------------------
+
+class SignalReceiver:
+    """
+    Webhook endpoint for signals from outside scanners.
+
+        POST /signals   one signal object, or a JSON array of them
+        GET  /health    queue depth
+
+    Each signal is validated, dropped as a duplicate if its symbol was
+    accepted less than `dedup_seconds` ago, and put on a bounded queue. A
+    single consumer drains the queue in batches of up to `batch_size` and
+    hands each batch to `on_signals(signals)` on its own thread, so a slow
+    execution path never stalls the event loop.
+
+    When the queue is full new signals are shed rather than waited on: the
+    response counts them under "shed", and a request whose signals were all
+    shed gets a 503 with Retry-After. With a `token`, requests must send
+    "Authorization: Bearer <token>".
+    """
+
+    def __init__(self, on_signals, host="127.0.0.1", port=0, queue_size=10000, batch_size=200,
+                 dedup_seconds=60.0, token=None, max_body_bytes=4 * 1024 * 1024):
+        self.on_signals = on_signals
+        self.host = host
+        self.port = port
+        self.queue_size = queue_size
+        self.batch_size = batch_size
+        self.dedup_seconds = dedup_seconds
+        self.token = token
+        self.max_body_bytes = max_body_bytes
+        self._seen = {}  # symbol -> monotonic time its last signal was accepted
+        self._pruned_at = time.monotonic()
+        self._queue = None
+        self._loop = None
+        self._stopping = None
+        self._thread = None
+        self._started = threading.Event()
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="signal-receiver")
+
+    @property
+    def url(self):
+        return f"http://{self.host}:{self.port}"
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="signal-receiver", daemon=True)
+        self._thread.start()
+        self._started.wait()
+        return self
+
+    def wait(self):
+        """Block until the receiver stops."""
+        while self._thread.is_alive():
+            self._thread.join(timeout=1.0)
+
+    def stop(self, timeout=10.0):
+        """Stop accepting requests, hand over what's already queued, then shut down."""
+        if self._loop and self._stopping:
+            self._loop.call_soon_threadsafe(self._stopping.set)
+        if self._thread:
+            self._thread.join(timeout)
+        self._executor.shutdown(wait=True)
+
+    def _run(self):
+        self._loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self._loop)
+        try:
+            self._loop.run_until_complete(self._serve())
+        finally:
+            self._loop.close()
+
+    async def _serve(self):
+        self._queue = asyncio.Queue(maxsize=self.queue_size)
+        self._stopping = asyncio.Event()
+
+        app = web.Application(client_max_size=self.max_body_bytes)
+        app.router.add_post("/signals", self._handle_signals)
+        app.router.add_get("/health", self._handle_health)
+        runner = web.AppRunner(app, access_log=None)
+        await runner.setup()
+        site = web.TCPSite(runner, self.host, self.port)
+        await site.start()
+        self.port = runner.addresses[0][1]
+
+        consumer = asyncio.create_task(self._consume())
+        logger.info(f"📥 Receiving signals at {self.url}/signals")
+        self._started.set()
+
+        await self._stopping.wait()
+        await runner.cleanup()
+        await self._queue.put(_STOP)
+        await consumer
+
+    # — request handlers —
+
+    async def _handle_signals(self, request):
+        if self.token and request.headers.get("Authorization") != f"Bearer {self.token}":
+            return web.json_response({"error": "unauthorized"}, status=401)
+        try:
+            payload = await request.json()
+        except ValueError:
+            return web.json_response({"error": "body must be JSON"}, status=400)
+
+        items = payload if isinstance(payload, list) else [payload]
+        result = {"accepted": 0, "duplicate": 0, "shed": 0, "invalid": []}
+        now = time.monotonic()
+        for index, item in enumerate(items):
+            signal, error = validate_signal(item)
+            if error:
+                result["invalid"].append({"index": index, "error": error})
+                continue
+            symbol = signal["symbol"]
+            seen = self._seen.get(symbol)
+            if seen is not None and now - seen < self.dedup_seconds:
+                result["duplicate"] += 1
+                continue
+            try:
+                self._queue.put_nowait(signal)
+            except asyncio.QueueFull:
+                result["shed"] += 1
+                continue
+            self._seen[symbol] = now
+            result["accepted"] += 1
+        self._prune(now)
+
+        for outcome in ("accepted", "duplicate", "shed"):
+            if result[outcome]:
+                receiver_signals_total.inc(result[outcome], result=outcome)
+        if result["invalid"]:
+            receiver_signals_total.inc(len(result["invalid"]), result="invalid")
+        if result["shed"]:
+            logger.warning(f"Signal queue full: shed {result['shed']} of {len(items)} signal(s)")
+
+        if items and len(result["invalid"]) == len(items):
+            return web.json_response(result, status=400)
+        if result["shed"] and not result["accepted"]:
+            return web.json_response(result, status=503, headers={"Retry-After": "1"})
+        return web.json_response(result, status=202)
+
+    async def _handle_health(self, request):
+        return web.json_response({"queued": self._queue.qsize(), "queue_size": self.queue_size})
+
+    def _prune(self, now):
+        """Forget symbols outside the dedup window, at most once per window."""
+        if now - self._pruned_at < self.dedup_seconds:
+            return
+        self._pruned_at = now
+        self._seen = {symbol: seen for symbol, seen in self._seen.items() if now - seen < self.dedup_seconds}
+
+    # — consumer —
+
+    async def _consume(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            item = await self._queue.get()
+            stopping = item is _STOP
+            batch = [] if stopping else [item]
+            while len(batch) < self.batch_size and not self._queue.empty():
+                item = self._queue.get_nowait()
+                if item is _STOP:
+                    stopping = True
+                    break
+                batch.append(item)
+            if batch:
+                try:
+                    await loop.run_in_executor(self._executor, self.on_signals, batch)
+                except Exception as e:
+                    logger.exception(f"Failed to hand over {len(batch)} signal(s): {e}")
+            if stopping:
+                return
+
+
+def receiver_from_settings(on_signals):
+    return SignalReceiver(
+        on_signals,
+        host=settings.get("receiver_host", "127.0.0.1"),
+        port=int(settings.get("receiver_port", 9110)),
+        queue_size=int(settings.get("receiver_queue_size", 10000)),
+        batch_size=int(settings.get("receiver_batch_size", 200)),
+        dedup_seconds=float(settings.get("receiver_dedup_seconds", 60)),
+        token=settings.get("receiver_token"),
+    )
+
+
+def main():
+    from core.pipeline import pipeline_from_settings
+    from core.journal_logger import recover_journal
+
+    setup_logging()
+    recover_journal()
+    pipeline = pipeline_from_settings().start()
+
+    def submit_batch(signals):
+        # Runs on the receiver's hand-off thread, so even the block policy never stalls the event loop
+        for signal in signals:
+            pipeline.submit(signal)
+
+    receiver = receiver_from_settings(submit_batch).start()
+    try:
+        receiver.wait()
+    except KeyboardInterrupt:
+        logger.info("Signal receiver manually stopped.")
+    finally:
+        receiver.stop()
+        pipeline.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,200 @@
+import logging
+from collections import OrderedDict
+import numpy as np
+from core.broker_interface import settings
+from core.utils import vwap_matrix, rsi_matrix, rolling_mean_matrix
+from core.vwap_signal_generator import panel_to_arrays, vwap_bounce_signals
+from core.metrics import timed, signals_total, indicator_cache_total
+
+logger = logging.getLogger(__name__)
+
+# ------------------------------
+# Registries
+# ------------------------------
+
+# name -> fn(bars, **params) returning a symbols x bars matrix, where `bars`
+# holds the panel's "high", "low", "close" and "volume" arrays
+INDICATORS = {}
+
+# name -> {"name", "scan", "setup_tag", "bars", "indicators"}
+STRATEGIES = {}
+
+def register_indicator(name):
+    """Decorator adding a vectorized indicator under `name`."""
+    def decorator(fn):
+        INDICATORS[name] = fn
+        return fn
+    return decorator
+
+def register_strategy(name, setup_tag, bars=50, indicators=None):
+    """
+    Decorator adding a strategy under `name`.
+
+    The strategy is called as fn(symbols, bars, indicators) once per cycle,
+    with symbols x bars arrays covering at least `bars` minutes and
+    `indicators` mapping each alias to its computed matrix. `indicators`
+    declares those as {alias: (indicator name, {param: value})}. It returns
+    signal dicts in the `process_signal` format; any without a `setup_tag`
+    get this strategy's.
+    """
+    def decorator(fn):
+        STRATEGIES[name] = {
+            "name": name,
+            "scan": fn,
+            "setup_tag": setup_tag,
+            "bars": int(bars),
+            "indicators": dict(indicators or {}),
+        }
+        return fn
+    return decorator
+
+# ------------------------------
+# Memoized indicator rows
+# ------------------------------
+
+def bar_stamps(panel, symbols):
+    """
+    Per-symbol stamp of the latest bar in a `get_bars_batch` panel (None where
+    the symbol has no bars). The volume is part of it because the latest
+    minute can still be forming and come back revised under the same timestamp.
+    """
+    stamps = []
+    for symbol in symbols:
+        bars = panel.get(symbol)
+        if bars is None or bars.empty:
+            stamps.append(None)
+        else:
+            stamps.append((bars.index[-1], float(bars["volume"].iloc[-1])))
+    return stamps
+
+class IndicatorCache:
+    """
+    Indicator rows memoized by (symbol, indicator, params, latest bar stamp),
+    evicting the least recently used past `maxsize` rows.
+
+    Each `compute` only runs the indicator over the rows it hasn't seen, so
+    strategies sharing an indicator compute it once per new bar, and a
+    symbol whose bars haven't moved since the last cycle isn't recomputed.
+    """
+
+    def __init__(self, maxsize=20000):
+        self.maxsize = maxsize
+        self._rows = OrderedDict()
+
+    def __len__(self):
+        return len(self._rows)
+
+    def compute(self, name, params, symbols, bars, stamps=None):
+        width = bars["close"].shape[1]
+        params_key = tuple(sorted(params.items()))
+        stamps = stamps if stamps is not None else [None] * len(symbols)
+        out = np.empty(bars["close"].shape)
+
+        keys, missing = [], []
+        for row, (symbol, stamp) in enumerate(zip(symbols, stamps)):
+            # rows without a stamp (no bars) are never cached
+            key = (symbol, name, params_key, width, stamp) if stamp is not None else None
+            cached = self._rows.get(key) if key is not None else None
+            if cached is None:
+                missing.append(row)
+            else:
+                self._rows.move_to_end(key)
+                out[row] = cached
+            keys.append(key)
+
+        indicator_cache_total.inc(len(symbols) - len(missing), result="hit")
+        indicator_cache_total.inc(len(missing), result="miss")
+        if not missing:
+            return out
+
+        rows = np.asarray(missing)
+        values = INDICATORS[name]({col: array[rows] for col, array in bars.items()}, **params)
+        out[rows] = values
+        for row, value in zip(missing, values):
+            if keys[row] is not None:
+                self._rows[keys[row]] = value.copy()
+        while len(self._rows) > self.maxsize:
+            self._rows.popitem(last=False)
+        return out
+
+    def clear(self):
+        self._rows.clear()
+
+# ------------------------------
+# Strategy engine
+# ------------------------------
+
+class StrategyEngine:
+    """
+    Runs the enabled strategies over one bar panel per cycle.
+
+    The panel covers the longest history any strategy declares, so a cycle
+    needs a single `get_bars_batch(symbols, limit=engine.limit)` call, and
+    every declared indicator goes through one shared IndicatorCache.
+    """
+
+    def __init__(self, strategies=None, cache=None):
+        names = strategies or settings.get("strategies") or ["vwap_bounce"]
+        unknown = [name for name in names if name not in STRATEGIES]
+        if unknown:
+            raise ValueError(f"Unknown strategies {unknown}; registered: {sorted(STRATEGIES)}")
+        self.strategies = [STRATEGIES[name] for name in names]
+        self.limit = max(strategy["bars"] for strategy in self.strategies)
+        self.cache = cache if cache is not None else IndicatorCache(int(settings.get("indicator_cache_size", 20000)))
+
+    def scan(self, panel):
+        """Scan a `get_bars_batch` panel; returns every strategy's signals."""
+        symbols, bars = panel_to_arrays(panel, self.limit)
+        signals = self.scan_arrays(symbols, bars, bar_stamps(panel, symbols))
+        for signal in signals:
+            signals_total.inc(setup_tag=signal["setup_tag"])
+        return signals
+
+    def scan_arrays(self, symbols, bars, stamps=None):
+        """Run the strategies over symbols x bars arrays (as from `panel_to_arrays`)."""
+        if len(symbols) == 0 or bars["close"].shape[1] < 2:
+            return []
+
+        signals = []
+        for strategy in self.strategies:
+            try:
+                with timed("indicators"):
+                    indicators = {
+                        alias: self.cache.compute(name, params, symbols, bars, stamps)
+                        for alias, (name, params) in strategy["indicators"].items()
+                    }
+                found = strategy["scan"](symbols, bars, indicators)
+            except Exception as e:
+                logger.exception(f"Strategy {strategy['name']} failed: {e}")
+                continue
+            for signal in found:
+                signal.setdefault("setup_tag", strategy["setup_tag"])
+                signals.append(signal)
+        return signals
+
+# ------------------------------
+# Built-in indicators and strategies
+# ------------------------------
+
+@register_indicator("vwap")
+def _vwap(bars, window=14):
+    return vwap_matrix(bars["high"], bars["low"], bars["close"], bars["volume"], window)
+
+@register_indicator("rsi")
+def _rsi(bars, period=14, column="close"):
+    return rsi_matrix(bars[column], period)
+
+@register_indicator("rolling_mean")
+def _rolling_mean(bars, window, column="close"):
+    return rolling_mean_matrix(bars[column], window)
+
+@register_strategy("vwap_bounce", setup_tag="VWAP Bounce", bars=50, indicators={
+    "vwap": ("vwap", {"window": 14}),
+    "rsi": ("rsi", {"period": 14}),
+    "avg_volume": ("rolling_mean", {"column": "volume", "window": 10}),
+})
+def vwap_bounce(symbols, bars, indicators):
+    return vwap_bounce_signals(
+        symbols, bars["low"], bars["close"], bars["volume"],
+        indicators["vwap"][:, -1], indicators["rsi"][:, -1], indicators["avg_volume"][:, -1],
+    )
@@ -0,0 +1,192 @@
+import argparse
+import datetime
+import logging
+import numpy as np
+import pandas as pd
+from numpy.lib.stride_tricks import sliding_window_view
+from core.bar_store import BAR_DTYPE
+from core.vwap_signal_generator import (START_TIME, END_TIME, PANEL_COLUMNS, build_vwap_bounce_signal,
+                                        vwap_bounce_indicators, vwap_bounce_hits)
+from scanner_hooks.strategies import STRATEGIES
+from sim.simulated_broker import SimulatedBroker
+
+logger = logging.getLogger(__name__)
+
+# The live scanner evaluates each symbol on (at most) its last LIVE_BARS bars of the day
+LIVE_BARS = STRATEGIES["vwap_bounce"]["bars"]
+
+# ------------------------------
+# Loading recorded bars
+# ------------------------------
+
+def load_bars(store, symbols=None, start=None, end=None):
+    """Concatenate a BarStore's daily files into one record array per symbol."""
+    days = [d for d in store.days() if (start is None or d >= start) and (end is None or d <= end)]
+    chunks = {}
+    for day in days:
+        for symbol in (symbols or store.symbols(day)):
+            records = store.read(symbol, day)
+            if len(records):
+                chunks.setdefault(symbol, []).append(records)
+    return {symbol: np.concatenate(parts) for symbol, parts in chunks.items()}
+
+def bars_from_panel(panel):
+    """Convert a {symbol: DataFrame} panel into the record arrays the backtest uses."""
+    bars = {}
+    for symbol, frame in panel.items():
+        records = np.empty(len(frame), dtype=BAR_DTYPE)
+        records["t"] = frame.index.tz_convert("UTC").as_unit("ns").asi8
+        for name in BAR_DTYPE.names[1:]:
+            records[name] = frame[name].to_numpy(dtype=float)
+        bars[symbol] = records
+    return bars
+
+# ------------------------------
+# Vectorized signal detection
+# ------------------------------
+
+def session_rows(bars):
+    """
+    Split each symbol's bars into trading days. Returns ({day: [(symbol, lo, hi)]},
+    {symbol: minute of the day (New York) of each bar}).
+    """
+    by_day = {}
+    minutes = {}
+    for symbol, records in bars.items():
+        local = pd.DatetimeIndex(pd.to_datetime(records["t"], unit="ns", utc=True)).tz_convert("America/New_York")
+        minutes[symbol] = (local.hour * 60 + local.minute).to_numpy()
+        day_codes = local.normalize().asi8
+        bounds = np.flatnonzero(np.diff(day_codes)) + 1
+        for lo, hi in zip(np.r_[0, bounds], np.r_[bounds, len(records)]):
+            by_day.setdefault(day_codes[lo], []).append((symbol, lo, hi))
+    return by_day, minutes
+
+def stack_rows(bars, rows, minutes):
+    """One symbols x bars array per column (plus "minute") with a row per (symbol, lo, hi) slice, NaN-padded."""
+    width = max(hi - lo for _, lo, hi in rows)
+    arrays = {name: np.full((len(rows), width), np.nan) for name in ("high", "low", "close", "volume", "minute")}
+    for r, (symbol, lo, hi) in enumerate(rows):
+        records = bars[symbol][lo:hi]
+        for name in ("high", "low", "close", "volume"):
+            arrays[name][r, :hi - lo] = records[name]
+        arrays["minute"][r, :hi - lo] = minutes[symbol][lo:hi]
+    return arrays
+
+def trailing_windows(arrays, mask, limit=LIVE_BARS):
+    """
+    For each True cell of `mask` (rows x bars), the `limit` bars of its row
+    ending there, left-padded with NaN where the day is shorter, as
+    `panel_to_arrays` lays out a live panel. Returns (row index, column index,
+    {column: cells x limit array}).
+    """
+    r_idx, c_idx = np.nonzero(mask)
+    windows = {}
+    for name in PANEL_COLUMNS:
+        values = arrays[name]
+        padded = np.concatenate([np.full((values.shape[0], limit - 1), np.nan), values], axis=1)
+        windows[name] = sliding_window_view(padded, limit, axis=1)[r_idx, c_idx]
+    return r_idx, c_idx, windows
+
+def find_signal_bars(bars):
+    """
+    Evaluate the VWAP bounce rule at every bar of every symbol, as the live
+    scanner would have at that bar's close.
+
+    Bars are grouped by trading day and each day is stacked into one
+    symbols x bars array. Every bar in the trading window is then evaluated
+    by the live indicators and rule on the day's last LIVE_BARS bars up to
+    it (the window the scanner fetches), all cells at once. Returns
+    candidate signals sorted by time as (timestamp_ns, symbol, price, vwap)
+    tuples.
+    """
+    by_day, minutes = session_rows(bars)
+    window_start = START_TIME.hour * 60 + START_TIME.minute
+    window_end = END_TIME.hour * 60 + END_TIME.minute
+    candidates = []
+
+    for day in sorted(by_day):
+        rows = by_day[day]
+        arrays = stack_rows(bars, rows, minutes)
+        with np.errstate(invalid="ignore"):
+            due = (arrays["minute"] >= window_start) & (arrays["minute"] <= window_end)
+        r_idx, c_idx, windows = trailing_windows(arrays, due)
+        if len(r_idx) == 0:
+            continue
+
+        high, low, close, volume = (windows[name] for name in PANEL_COLUMNS)
+        vwap, rsi, avg_volume = vwap_bounce_indicators(high, low, close, volume)
+        hits = vwap_bounce_hits(low, close, volume, vwap, rsi, avg_volume)
+
+        for k in np.flatnonzero(hits):
+            symbol, lo, _ = rows[r_idx[k]]
+            candidates.append((int(bars[symbol]["t"][lo + c_idx[k]]), symbol, float(close[k, -1]), float(vwap[k])))
+
+    candidates.sort()
+    return candidates
+
+# ------------------------------
+# Replay through the real execution path
+# ------------------------------
+
+def run_backtest(bars, starting_equity=100_000.0, extra_settings=None):
+    """
+    Replay recorded bars through `process_signal` against a SimulatedBroker.
+
+    Signals are found with the live rule on the live bar window (see
+    `find_signal_bars`) and built by `build_vwap_bounce_signal`; each one is then sent through
+    the real risk checks, sizing and bracket submission at its bar's time.
+    Returns (trades DataFrame, P&L summary by setup_tag).
+    """
+    from core.execution_engine import process_signal
+
+    candidates = find_signal_bars(bars)
+    logger.info(f"Replaying {len(candidates)} candidate signals over {len(bars)} symbols...")
+
+    broker = SimulatedBroker(bars, starting_equity)
+    with broker.installed(extra_settings):
+        for timestamp, symbol, price, vwap in candidates:
+            broker.set_clock(timestamp)
+            process_signal(build_vwap_bounce_signal(symbol, price, vwap))
+
+    trades = pd.DataFrame(broker.trades)
+    return trades, pnl_by_setup(trades)
+
+def pnl_by_setup(trades):
+    columns = ["trades", "unfilled", "wins", "win_rate", "total_pnl", "avg_pnl", "avg_r"]
+    if trades.empty:
+        return pd.DataFrame(columns=columns)
+
+    trades = trades.assign(
+        filled=trades["entry_time"].notna(),
+        win=trades["pnl"] > 0,
+        r=trades["pnl"] / trades["risk_amount"].astype(float),
+    )
+    filled = trades[trades["filled"]]
+    grouped = filled.groupby("setup_tag")
+    summary = pd.DataFrame({
+        "trades": grouped.size(),
+        "unfilled": trades[~trades["filled"]].groupby("setup_tag").size(),
+        "wins": grouped["win"].sum(),
+        "total_pnl": grouped["pnl"].sum(),
+        "avg_pnl": grouped["pnl"].mean(),
+        "avg_r": grouped["r"].mean(),
+    }).fillna({"trades": 0, "unfilled": 0, "wins": 0})
+    summary["win_rate"] = summary["wins"] / summary["trades"].where(summary["trades"] > 0)
+    return summary[columns]
+
+
+if __name__ == "__main__":
+    from core.broker_interface import bar_store
+    from core.logging_setup import setup_logging
+
+    setup_logging()
+    parser = argparse.ArgumentParser(description="Replay stored minute bars through the VWAP bounce strategy.")
+    parser.add_argument("--start", type=datetime.date.fromisoformat)
+    parser.add_argument("--end", type=datetime.date.fromisoformat)
+    parser.add_argument("--symbols", nargs="*")
+    parser.add_argument("--equity", type=float, default=100_000.0)
+    args = parser.parse_args()
+
+    bars = load_bars(bar_store, args.symbols, args.start, args.end)
+    trades, summary = run_backtest(bars, args.equity)
+    print(summary.to_string())
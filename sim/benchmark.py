@@ -0,0 +1,249 @@
+import os
+import sys
+import json
+import time
+import datetime
+import logging
+import argparse
+import tempfile
+import subprocess
+from contextlib import contextmanager
+import numpy as np
+from sim.fake_alpaca import FakeAlpacaServer, fake_symbols, seeded_trade
+from sim.fake_journal import FakeJournalDB
+
+logger = logging.getLogger(__name__)
+
+SIZES = (100, 500, 2000, 8000)
+BASELINE_PATH = os.path.join(os.path.dirname(__file__), "benchmark_baselines.json")
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# What each entry point imports before doing any work, and how long that may take (seconds)
+ENTRY_POINTS = {
+    "close_checker": "import close_checker",
+    "run_scanner":   "import run_scanner",
+    "backtest":      "import sim.backtest",
+    "dashboard":     "import monitoring.monitoring_dashboard",
+}
+STARTUP_BUDGETS = {
+    "close_checker": 0.25,
+    "run_scanner":   0.75,
+    "backtest":      0.75,
+    "dashboard":     0.15,
+}
+
+# ------------------------------
+# Offline wiring
+# ------------------------------
+
+@contextmanager
+def offline_backends(server, journal, rate_per_minute=None):
+    """
+    Run the real broker, risk, execution and journal code against `server`
+    and `journal`, with a throwaway bar store. Without `rate_per_minute`
+    the request scheduler is effectively unthrottled, so results measure our
+    code and the simulated latency rather than the account's rate limit.
+    """
+    import core.broker_interface as broker_interface
+    import core.risk_manager as risk_manager
+    from core.bar_store import BarStore
+    from core.request_scheduler import RequestScheduler
+
+    previous = (broker_interface.scheduler, broker_interface.bar_store, risk_manager.settings)
+    broker_interface.scheduler = RequestScheduler(rate_per_minute=rate_per_minute or 10**7,
+                                                  workers=int(broker_interface.settings.get("api_workers", 8)))
+    broker_interface.bar_store = BarStore(tempfile.mkdtemp(prefix="bench-bars-"))
+    # Every benchmark signal should reach the broker, not stop at the portfolio limits
+    risk_manager.settings = dict(risk_manager.settings, max_open_positions=len(server.symbols),
+                                 max_gross_exposure_pct=float(len(server.symbols)))
+    try:
+        with server.installed(), journal.installed():
+            yield
+    finally:
+        broker_interface.scheduler, broker_interface.bar_store, risk_manager.settings = previous
+
+# ------------------------------
+# Benchmarks
+# ------------------------------
+
+def bench_scan_cycle(symbols):
+    """One cold cycle (empty bar store) and one warm cycle of fetch + vectorized scan."""
+    from core.broker_interface import get_bars_batch
+    from core.vwap_signal_generator import scan_vwap_bounce_panel
+
+    results = {}
+    for label in ("scan_cycle_cold", "scan_cycle_warm"):
+        start = time.perf_counter()
+        panel = get_bars_batch(symbols)
+        scan_vwap_bounce_panel(panel)
+        results[label] = time.perf_counter() - start
+        if len(panel) != len(symbols):
+            logger.warning(f"{label}: bars for only {len(panel)}/{len(symbols)} symbols")
+    return results
+
+def bench_signal_to_order(symbols, signals=50):
+    """Signal in → bracket order accepted (risk check, price, sizing, submission); p50 and p95."""
+    from core.broker_interface import get_price
+    from core.execution_engine import prepare_order, submit_prepared_order
+
+    latencies = []
+    for symbol in symbols[:signals]:
+        price = get_price(symbol)
+        signal = {"symbol": symbol, "side": "buy", "stop_loss": round(price * 0.97, 2),
+                  "confidence": 0.85, "setup_tag": "Benchmark"}
+        start = time.perf_counter()
+        ticket = prepare_order(signal)
+        order = submit_prepared_order(ticket) if ticket else None
+        latencies.append(time.perf_counter() - start)
+        if order is None:
+            logger.warning(f"signal_to_order: no order for {symbol}")
+    return {
+        "signal_to_order_p50": float(np.percentile(latencies, 50)),
+        "signal_to_order_p95": float(np.percentile(latencies, 95)),
+    }
+
+def bench_close_check(symbols, journal, trades):
+    """
+    One reconciliation pass over `trades` open journal rows whose brackets
+    have all exited, up to its close-outs being written.
+    """
+    import close_checker
+    from core.journal_logger import INSERT_COLUMNS, flush_journal
+
+    for i in range(trades):
+        order_id, symbol, qty, buy, _ = seeded_trade(i, symbols)
+        row = dict.fromkeys(INSERT_COLUMNS)
+        row.update(date=datetime.date.today().isoformat(), symbol=symbol, num_shares=qty, buy_price=buy,
+                   sell_price=0.0, order_id=order_id)
+        journal.insert(INSERT_COLUMNS, [row[c] for c in INSERT_COLUMNS])
+
+    # journal writes still queued from earlier benchmarks aren't part of this pass
+    flush_journal()
+    start = time.perf_counter()
+    close_checker.check_for_closed_trades()
+    elapsed = time.perf_counter() - start
+
+    still_open = len(journal.open_trades())
+    if still_open:
+        logger.warning(f"close_check: {still_open}/{trades} trades left open")
+    return {"close_check": elapsed}
+
+
+def bench_startup(entry_points=ENTRY_POINTS, runs=3):
+    """
+    Import time of each entry point in a fresh interpreter, started outside the
+    repo root (best of `runs`, so disk cache warm-up doesn't count).
+    """
+    results = {}
+    cwd = tempfile.mkdtemp(prefix="bench-startup-")
+    env = dict(os.environ, PYTHONPATH=ROOT)
+    for name, statement in entry_points.items():
+        code = f"import time; t = time.perf_counter(); {statement}; print(time.perf_counter() - t)"
+        timings = []
+        for _ in range(runs):
+            out = subprocess.run([sys.executable, "-c", code], cwd=cwd, env=env,
+                                 capture_output=True, text=True, check=True)
+            timings.append(float(out.stdout.strip().splitlines()[-1]))
+        results[f"startup[{name}]"] = min(timings)
+    return results
+
+def over_budget(results, budgets=STARTUP_BUDGETS):
+    """Entry points whose startup exceeds their budget, as {name: (seconds, budget)}."""
+    over = {}
+    for name, budget in budgets.items():
+        seconds = results.get(f"startup[{name}]")
+        if seconds is not None and seconds > budget:
+            over[name] = (seconds, budget)
+    return over
+
+
+def run_benchmarks(sizes=SIZES, latency=0.005, journal_latency=0.002, rate_per_minute=None, signals=50):
+    """Run every benchmark at each universe size; returns {"<name>[<size>]": seconds}."""
+    results = {}
+    for size in sizes:
+        symbols = fake_symbols(size)
+        trades = max(size // 10, 1)
+        server = FakeAlpacaServer(symbols, closed_orders=trades, latency=latency).start()
+        journal = FakeJournalDB(latency=journal_latency)
+        try:
+            with offline_backends(server, journal, rate_per_minute):
+                measured = {}
+                measured.update(bench_scan_cycle(symbols))
+                measured.update(bench_signal_to_order(symbols, signals))
+                measured.update(bench_close_check(symbols, journal, trades))
+        finally:
+            server.stop()
+        for name, seconds in measured.items():
+            results[f"{name}[{size}]"] = seconds
+        logger.info(f"Finished {size} symbols")
+    return results
+
+# ------------------------------
+# Baselines
+# ------------------------------
+
+def compare(results, baseline, tolerance=0.25):
+    """Rows of (name, seconds, baseline seconds or None, relative change, regressed?)."""
+    rows = []
+    for name, seconds in results.items():
+        base = baseline.get(name)
+        change = (seconds - base) / base if base else None
+        rows.append((name, seconds, base, change, change is not None and change > tolerance))
+    return rows
+
+def load_baseline(path=BASELINE_PATH):
+    if not os.path.exists(path):
+        return {}, {}
+    with open(path, "r") as f:
+        data = json.load(f)
+    return data.get("results", {}), data.get("config", {})
+
+def save_baseline(results, config, path=BASELINE_PATH):
+    with open(path, "w") as f:
+        json.dump({"config": config, "results": results}, f, indent=2, sort_keys=True)
+        f.write("\n")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline benchmarks against a local fake Alpaca and journal.")
+    parser.add_argument("--sizes", type=int, nargs="*", default=list(SIZES))
+    parser.add_argument("--latency", type=float, default=0.005, help="fake API latency per request (s)")
+    parser.add_argument("--journal-latency", type=float, default=0.002, help="fake DB latency per round trip (s)")
+    parser.add_argument("--rate-limit", type=int, default=None, help="requests/min for the scheduler (default: unthrottled)")
+    parser.add_argument("--signals", type=int, default=50)
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed slowdown vs baseline")
+    parser.add_argument("--baseline", default=BASELINE_PATH)
+    parser.add_argument("--save-baseline", action="store_true")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING)
+    logger.setLevel(logging.INFO)
+    config = {"latency": args.latency, "journal_latency": args.journal_latency,
+              "rate_limit": args.rate_limit, "signals": args.signals}
+
+    results = bench_startup()
+    results.update(run_benchmarks(args.sizes, args.latency, args.journal_latency, args.rate_limit, args.signals))
+    baseline, baseline_config = load_baseline(args.baseline)
+    if baseline and baseline_config != config:
+        print(f"Note: baseline was recorded with {baseline_config}, this run used {config}")
+
+    regressions = 0
+    print(f"{'benchmark':<30}{'seconds':>10}{'baseline':>10}{'change':>9}")
+    for name, seconds, base, change, regressed in compare(results, baseline, args.tolerance):
+        regressions += regressed
+        print(f"{name:<30}{seconds:>10.4f}{(f'{base:.4f}' if base else '-'):>10}"
+              f"{(f'{change:+.0%}' if change is not None else '-'):>9}{'  REGRESSION' if regressed else ''}")
+
+    for name, (seconds, budget) in over_budget(results).items():
+        regressions += 1
+        print(f"OVER BUDGET: {name} starts in {seconds:.3f}s (budget {budget:.2f}s)")
+
+    if args.save_baseline:
+        save_baseline(dict(baseline, **results), config, args.baseline)
+        print(f"Baseline saved to {args.baseline}")
+        return 0
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
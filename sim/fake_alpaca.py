@@ -0,0 +1,342 @@
+import json
+import time
+import uuid
+import zlib
+import datetime
+import logging
+import threading
+import multiprocessing
+from contextlib import contextmanager
+from urllib.parse import urlparse, parse_qs
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PAGE_LIMIT = 1000   # what the data API returns when no limit is sent
+MAX_PAGE_LIMIT = 10000
+MAX_ORDER_LIMIT = 500
+
+# ------------------------------
+# Deterministic market
+# ------------------------------
+
+def fake_symbols(n):
+    """`n` distinct ticker-like symbols."""
+    letters = "ABCDEFGHIJKLMNOPQRSTUVWXYZ"
+    symbols = []
+    for i in range(n):
+        name, k = "", i
+        for _ in range(4):
+            name = letters[k % 26] + name
+            k //= 26
+        symbols.append(name)
+    return symbols
+
+def _params(symbol):
+    h = zlib.crc32(symbol.encode())
+    base = 10 + (h % 39000) / 100.0          # 10 .. 400
+    volume = 2000 + (h >> 8) % 20000
+    return base, volume, (h % 628) / 100.0
+
+def _bars(symbol, minutes):
+    """Closed-form OHLCV for epoch-minute numbers: same input, same bars, no state to keep."""
+    base, volume, phase = _params(symbol)
+    m = np.asarray(minutes, dtype=float)
+    close = base * (1 + 0.01 * np.sin(m / 37 + phase) + 0.003 * np.sin(m / 5.3 + 2 * phase))
+    open_ = base * (1 + 0.01 * np.sin((m - 1) / 37 + phase) + 0.003 * np.sin((m - 1) / 5.3 + 2 * phase))
+    spread = base * 0.001 * (1.5 + np.sin(m / 3.1 + phase))
+    vol = np.round(volume * (1 + 0.6 * np.sin(m / 11 + phase)) ** 2) + 100
+    return open_, np.maximum(open_, close) + spread, np.minimum(open_, close) - spread, close, vol
+
+def _iso(epoch_seconds):
+    return datetime.datetime.fromtimestamp(epoch_seconds, datetime.timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
+
+def _parse_time(value):
+    if not value:
+        return None
+    return datetime.datetime.fromisoformat(value.replace("Z", "+00:00")).timestamp()
+
+def seeded_trade(i, symbols):
+    """The i-th pre-filled bracket in the server's order history: (order_id, symbol, qty, buy, sell)."""
+    symbol = symbols[i % len(symbols)]
+    base, _, _ = _params(symbol)
+    buy = round(base, 2)
+    return f"seed-{i:06d}", symbol, 10, buy, round(buy * 1.01, 2)
+
+# ------------------------------
+# Server state and handler
+# ------------------------------
+
+class _State:
+    def __init__(self, symbols, equity, closed_orders):
+        self.symbols = symbols
+        self.equity = equity
+        self.lock = threading.Lock()
+        self.orders = {}
+        self.positions = {}
+
+        # Brackets that already exited, newest last, an hour or so before startup
+        start = time.time() - 3600 - closed_orders
+        for i in range(closed_orders):
+            order_id, symbol, qty, buy, sell = seeded_trade(i, symbols)
+            at = start + i
+            self.orders[order_id] = self._order(order_id, symbol, qty, "buy", "limit", "filled", buy, at, legs=[
+                self._order(f"{order_id}-tp", symbol, qty, "sell", "limit", "filled", sell, at + 1),
+                self._order(f"{order_id}-sl", symbol, qty, "sell", "stop", "canceled", None, at + 1),
+            ])
+
+    @staticmethod
+    def _order(order_id, symbol, qty, side, type, status, fill_price, at, legs=None):
+        return {
+            "id": order_id, "client_order_id": order_id, "symbol": symbol, "qty": str(qty),
+            "side": side, "type": type, "status": status, "order_class": "bracket" if legs else "",
+            "submitted_at": _iso(at), "filled_at": _iso(at) if status == "filled" else None,
+            "filled_qty": str(qty) if status == "filled" else "0",
+            "filled_avg_price": str(fill_price) if status == "filled" else None,
+            "limit_price": str(fill_price) if fill_price else None,
+            "legs": legs,
+        }
+
+    def submit(self, body):
+        symbol, qty = body["symbol"], int(float(body["qty"]))
+        price = float(body.get("limit_price") or _bars(symbol, [time.time() // 60])[3][0])
+        now = time.time()
+        legs = None
+        if body.get("order_class") == "bracket":
+            legs = [
+                self._order(str(uuid.uuid4()), symbol, qty, "sell", "limit", "new",
+                            float(body["take_profit"]["limit_price"]), now),
+                self._order(str(uuid.uuid4()), symbol, qty, "sell", "stop", "held", None, now),
+            ]
+        order = self._order(str(uuid.uuid4()), symbol, qty, body["side"], body.get("type", "market"),
+                            "filled", round(price, 2), now, legs=legs)
+        with self.lock:
+            self.orders[order["id"]] = order
+            held = self.positions.get(symbol, 0) + (qty if body["side"] == "buy" else -qty)
+            if held:
+                self.positions[symbol] = held
+            else:
+                self.positions.pop(symbol, None)
+        return order
+
+    def list_orders(self, query):
+        closed = query.get("status", "open") == "closed"
+        after, until = _parse_time(query.get("after")), _parse_time(query.get("until"))
+        limit = min(int(query.get("limit") or 50), MAX_ORDER_LIMIT)
+        with self.lock:
+            orders = list(self.orders.values())
+        selected = []
+        for order in orders:
+            terminal = order["status"] in ("filled", "canceled", "expired", "rejected")
+            if terminal != closed:
+                continue
+            at = _parse_time(order["submitted_at"])
+            if (after and at <= after) or (until and at >= until):
+                continue
+            selected.append(order)
+        selected.sort(key=lambda o: o["submitted_at"], reverse=query.get("direction", "desc") == "desc")
+        if query.get("nested") not in ("true", "True"):
+            selected = [dict(o, legs=None) for o in selected]
+        return selected[:limit]
+
+    def latest_bars(self, symbols):
+        minute = int(time.time() // 60)
+        latest = {}
+        for symbol in symbols:
+            o, h, l, c, v = _bars(symbol, [minute])
+            latest[symbol] = {"t": _iso(minute * 60), "o": round(float(o[0]), 4), "h": round(float(h[0]), 4),
+                              "l": round(float(l[0]), 4), "c": round(float(c[0]), 4), "v": int(v[0]),
+                              "n": 1, "vw": round(float(c[0]), 4)}
+        return latest
+
+    def market_value(self, symbol, qty):
+        return str(round(qty * float(_bars(symbol, [time.time() // 60])[3][0]), 2))
+
+    def bars(self, symbols, query):
+        timeframe = query.get("timeframe", "1Min")
+        step = 1440 if timeframe.endswith("Day") else 1
+        now_minute = int(time.time() // 60)
+        end = int(_parse_time(query.get("end")) // 60) if query.get("end") else now_minute
+        limit = min(int(query.get("limit") or DEFAULT_PAGE_LIMIT), MAX_PAGE_LIMIT)
+
+        if query.get("start"):
+            start = -(-int(_parse_time(query["start"])) // 60)
+        else:
+            start = end - limit * step  # latest bars when only a limit is given
+        start, end = -(-start // step) * step, end // step * step
+
+        # Page through (symbol, minute) pairs in symbol order; the token is the offset
+        minutes = np.arange(start, end + 1, step)
+        offset = int(query.get("page_token") or 0)
+        per_symbol = len(minutes)
+        page, taken = {}, 0
+        first_symbol = offset // per_symbol if per_symbol else len(symbols)
+        for s in range(first_symbol, len(symbols)):
+            lo = offset - s * per_symbol if s == first_symbol else 0
+            hi = min(per_symbol, lo + (limit - taken))
+            if hi <= lo:
+                break
+            o, h, l, c, v = _bars(symbols[s], minutes[lo:hi])
+            page[symbols[s]] = [
+                {"t": _iso(int(m) * 60), "o": round(float(o[i]), 4), "h": round(float(h[i]), 4),
+                 "l": round(float(l[i]), 4), "c": round(float(c[i]), 4), "v": int(v[i]),
+                 "n": 1, "vw": round(float(c[i]), 4)}
+                for i, m in enumerate(minutes[lo:hi])
+            ]
+            taken += hi - lo
+            if taken >= limit:
+                break
+        consumed = offset + taken
+        token = str(consumed) if consumed < per_symbol * len(symbols) and taken else None
+        return page, token
+
+
+def _handler(state, latency):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+        disable_nagle_algorithm = True  # headers and body go out in separate writes on a kept-alive socket
+
+        def log_message(self, format, *args):
+            pass
+
+        def _send(self, status, payload):
+            body = json.dumps(payload).encode()
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def _route(self, method):
+            if latency:
+                time.sleep(latency)
+            url = urlparse(self.path)
+            query = {k: v[-1] for k, v in parse_qs(url.query).items()}
+            parts = url.path.strip("/").split("/")[1:]  # drop the API version
+
+            if parts == ["account"]:
+                return self._send(200, {
+                    "id": "fake", "account_number": "FAKE0001", "status": "ACTIVE", "currency": "USD",
+                    "equity": str(state.equity), "last_equity": str(state.equity),
+                    "cash": str(state.equity), "buying_power": str(state.equity * 2),
+                })
+            if parts == ["positions"]:
+                with state.lock:
+                    held = dict(state.positions)
+                return self._send(200, [{"symbol": s, "qty": str(q), "side": "long",
+                                         "market_value": state.market_value(s, q)} for s, q in held.items()])
+            if len(parts) == 2 and parts[0] == "positions":
+                with state.lock:
+                    qty = state.positions.get(parts[1])
+                if qty is None:
+                    return self._send(404, {"code": 40410000, "message": "position does not exist"})
+                return self._send(200, {"symbol": parts[1], "qty": str(qty), "side": "long",
+                                        "market_value": state.market_value(parts[1], qty)})
+            if parts == ["assets"]:
+                return self._send(200, [{"symbol": s, "tradable": True, "exchange": "NYSE", "status": "active",
+                                         "class": "us_equity"} for s in state.symbols])
+            if parts == ["orders"] and method == "POST":
+                body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))))
+                return self._send(200, state.submit(body))
+            if parts == ["orders"]:
+                return self._send(200, state.list_orders(query))
+            if len(parts) == 2 and parts[0] == "orders":
+                with state.lock:
+                    order = state.orders.get(parts[1])
+                    if order is not None and method == "DELETE" and order["status"] not in ("filled",):
+                        order["status"] = "canceled"
+                if order is None:
+                    return self._send(404, {"code": 40410000, "message": "order not found"})
+                if method == "DELETE":
+                    self.send_response(204)
+                    self.send_header("Content-Length", "0")
+                    return self.end_headers()
+                return self._send(200, order)
+            if parts == ["stocks", "bars", "latest"]:
+                return self._send(200, {"bars": state.latest_bars(query.get("symbols", "").split(","))})
+            if parts == ["stocks", "bars"]:
+                page, token = state.bars(query.get("symbols", "").split(","), query)
+                return self._send(200, {"bars": page, "next_page_token": token})
+            if len(parts) == 3 and parts[0] == "stocks" and parts[2] == "bars":
+                page, token = state.bars([parts[1]], query)
+                return self._send(200, {"bars": page.get(parts[1], []), "symbol": parts[1], "next_page_token": token})
+            return self._send(404, {"code": 40400000, "message": f"no route for {url.path}"})
+
+        def do_GET(self):
+            self._route("GET")
+
+        def do_POST(self):
+            self._route("POST")
+
+        def do_DELETE(self):
+            self._route("DELETE")
+
+    return Handler
+
+
+def _serve(ready, symbols, equity, closed_orders, latency):
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _handler(_State(symbols, equity, closed_orders), latency))
+    server.daemon_threads = True
+    ready.put(server.server_address[1])
+    server.serve_forever()
+
+# ------------------------------
+# Public wrapper
+# ------------------------------
+
+class FakeAlpacaServer:
+    """
+    Local stand-in for Alpaca's trading and market data REST APIs.
+
+    Serves account, positions, orders (bracket orders fill at their limit
+    immediately), assets, latest bars and paginated minute/daily bars for
+    `symbols`, with `latency` seconds added to every request.
+    `closed_orders` pre-filled brackets (see `seeded_trade`) make up the
+    closed-order history. Runs in its own process so serving JSON doesn't
+    compete with the code being measured for the GIL.
+    """
+
+    def __init__(self, symbols, equity=100_000.0, closed_orders=0, latency=0.0):
+        self.symbols = list(symbols)
+        self.args = (self.symbols, equity, closed_orders, latency)
+        self.url = None
+        self._process = None
+
+    def start(self):
+        ctx = multiprocessing.get_context("spawn")
+        ready = ctx.Queue()
+        self._process = ctx.Process(target=_serve, args=(ready,) + self.args, daemon=True)
+        self._process.start()
+        self.url = f"http://127.0.0.1:{ready.get(timeout=30)}"
+        return self
+
+    def stop(self):
+        if self._process is not None:
+            self._process.terminate()
+            self._process.join(5)
+            self._process = None
+
+    def client(self):
+        from alpaca_trade_api.rest import REST
+        return REST("fake-key", "fake-secret", base_url=self.url)
+
+    @contextmanager
+    def installed(self):
+        """Point `core.broker_interface` (trading and data calls) at this server."""
+        import os
+        import core.broker_interface as broker_interface
+
+        previous_api, previous_data_url = broker_interface.api, os.environ.get("APCA_API_DATA_URL")
+        os.environ["APCA_API_DATA_URL"] = self.url
+        broker_interface.api = self.client()
+        broker_interface.invalidate_account_cache()
+        try:
+            yield self
+        finally:
+            broker_interface.api = previous_api
+            broker_interface.invalidate_account_cache()
+            if previous_data_url is None:
+                os.environ.pop("APCA_API_DATA_URL", None)
+            else:
+                os.environ["APCA_API_DATA_URL"] = previous_data_url
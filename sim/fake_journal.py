@@ -0,0 +1,177 @@
+import time
+import datetime
+import tempfile
+import threading
+from contextlib import contextmanager
+from core.trade_rollups import ROLLUP_TABLES, CLOSED_COLUMNS
+
+# ------------------------------
+# In-memory trades table
+# ------------------------------
+
+class FakeJournalDB:
+    """
+    Stand-in for the Postgres trades table behind `core.journal_logger`.
+
+    Understands the statements the journal actually issues (the batched
+    INSERT/UPDATE and rollup upserts via execute_values, the open-trades,
+    rollup and export SELECTs, and schema changes) and applies them to
+    in-memory tables, sleeping `latency` seconds per round trip to stand in
+    for the network.
+    """
+
+    def __init__(self, latency=0.0):
+        self.latency = latency
+        self.rows = {}
+        self.rollups = {table: {} for table in ROLLUP_TABLES}
+        self.round_trips = 0
+        self._next_ref = 1
+        self._lock = threading.Lock()
+
+    def _round_trip(self):
+        self.round_trips += 1
+        if self.latency:
+            time.sleep(self.latency)
+
+    def insert(self, columns, values):
+        """Add a row and return its ref, or None if its order_id or journal_key is taken (as the unique indexes do)."""
+        with self._lock:
+            row = dict(zip(columns, values))
+            for key in ("order_id", "journal_key"):
+                if row.get(key) is not None and any(r.get(key) == row[key] for r in self.rows.values()):
+                    return None
+            ref = self._next_ref
+            self._next_ref += 1
+            self.rows[ref] = dict(row, ref=ref)
+            return ref
+
+    def open_trades(self):
+        with self._lock:
+            rows = [r for r in self.rows.values() if not r.get("sell_price") and r.get("sell_date") is None]
+        return [
+            (r["ref"], r["symbol"], r["num_shares"], r["buy_price"],
+             datetime.date.fromisoformat(r["date"]) if isinstance(r["date"], str) else r["date"], r.get("order_id"))
+            for r in rows
+        ]
+
+    # — psycopg2 surface —
+
+    def select(self, columns, start=None, end=None):
+        """Rows of the trades table as tuples of `columns`, in ref order (optionally by trade date)."""
+        with self._lock:
+            rows = sorted(self.rows.values(), key=lambda r: r["ref"])
+        if start is not None:
+            rows = [r for r in rows if start <= str(r["date"]) <= end]
+        return [tuple(r.get(c) for c in columns) for r in rows]
+
+    def rollup_rows(self, table, start, end):
+        with self._lock:
+            return [key + totals for key, totals in self.rollups[table].items() if start <= key[0] <= end]
+
+    # — psycopg2 surface —
+
+    def execute_values(self, cur, sql, rows, template=None, page_size=100, fetch=False):
+        from core.journal_logger import INSERT_COLUMNS
+        rows = list(rows)
+        for _ in range(0, max(len(rows), 1), page_size):
+            self._round_trip()
+        words = sql.split()
+        verb = words[0].upper()
+        if verb == "INSERT" and words[2] in ROLLUP_TABLES:
+            keys, _ = ROLLUP_TABLES[words[2]]
+            with self._lock:
+                table = self.rollups[words[2]]
+                for row in rows:
+                    key, added = tuple(row[:len(keys)]), tuple(row[len(keys):])
+                    current = table.get(key)
+                    table[key] = added if current is None else tuple(a + b for a, b in zip(current, added))
+            return [] if fetch else None
+        if verb == "INSERT":
+            inserted = [tuple(values) for values in rows if self.insert(INSERT_COLUMNS, values) is not None]
+            return inserted if fetch else None
+        if verb == "UPDATE":
+            closed = []
+            with self._lock:
+                for ref, sell_date, sell_price, net_pnl, net_roi in rows:
+                    row = self.rows.get(ref)
+                    if row is None or row.get("sell_date") is not None:
+                        continue
+                    row.update(sell_date=sell_date, sell_price=sell_price, net_pnl=net_pnl, net_roi=net_roi)
+                    closed.append(tuple(row.get(c) for c in CLOSED_COLUMNS))
+            return closed if fetch else None
+        raise ValueError(f"FakeJournalDB can't run: {sql[:40]}")
+
+    @contextmanager
+    def connection(self):
+        yield _FakeConnection(self)
+
+    @contextmanager
+    def installed(self, spool_dir=None):
+        """Route `core.journal_logger` to this table, with its own writer and spool file."""
+        import core.journal_logger as journal_logger
+
+        spool_dir = spool_dir or tempfile.mkdtemp(prefix="journal-spool-")
+        writer = journal_logger.JournalWriter(f"{spool_dir}/spool.jsonl", journal_logger.BATCH_SIZE,
+                                              journal_logger.FLUSH_INTERVAL)
+        previous = (journal_logger._connection, journal_logger.execute_values, journal_logger.journal_writer)
+        journal_logger._connection = self.connection
+        journal_logger.execute_values = self.execute_values
+        journal_logger.journal_writer = writer
+        try:
+            yield self
+        finally:
+            writer.flush(10)
+            journal_logger._connection, journal_logger.execute_values, journal_logger.journal_writer = previous
+
+
+class _FakeConnection:
+    def __init__(self, db):
+        self.db = db
+        self._result = []
+
+    def cursor(self, name=None):
+        return self
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def execute(self, sql, params=None):
+        self.db._round_trip()
+        statement = " ".join(sql.split()).upper()
+        if statement.startswith("SELECT") and " FROM ROLLUP_" in statement:
+            table = statement.split(" FROM ")[1].split()[0].lower()
+            self._result = self.db.rollup_rows(table, *params)
+        elif statement.startswith("SELECT") and "FROM TRADES" in statement and "SELL_PRICE = 0.0" in statement:
+            self._result = self.db.open_trades()
+        elif statement.startswith("SELECT") and "FROM TRADES" in statement:
+            columns = [c.strip().lower() for c in statement[len("SELECT"):statement.index(" FROM ")].split(",")]
+            self._result = self.db.select(columns, *(params or ()))
+        elif statement.startswith(("ALTER TABLE", "CREATE TABLE", "CREATE UNIQUE INDEX")):
+            self._result = []
+        elif statement.startswith("TRUNCATE"):
+            with self.db._lock:
+                for table in self.db.rollups.values():
+                    table.clear()
+            self._result = []
+        else:
+            raise ValueError(f"FakeJournalDB can't run: {sql[:40]}")
+
+    def fetchall(self):
+        result, self._result = self._result, []
+        return result
+
+    def fetchone(self):
+        return self._result.pop(0) if self._result else None
+
+    def fetchmany(self, size):
+        result, self._result = self._result[:size], self._result[size:]
+        return result
+
+    def commit(self):
+        pass
+
+    def rollback(self):
+        pass
@@ -0,0 +1,105 @@
+import asyncio
+import logging
+import threading
+import msgpack
+import websockets
+
+logger = logging.getLogger(__name__)
+
+# ------------------------------
+# Local stand-in for the Alpaca market data stream
+# ------------------------------
+
+class ReplayDataServer:
+    """
+    Replays recorded minute bars over the same websocket protocol as Alpaca's
+    market data stream (msgpack frames: connect, auth, subscribe, then "b"
+    bar messages), so `BarStreamScanner` and anything else built on
+    `alpaca_trade_api.stream.Stream` can run against it unchanged.
+
+    `panel` is a {symbol: bars DataFrame} dict as returned by `get_bars_batch`.
+    Bars are sent in timestamp order, one message per minute, `delay` seconds apart.
+
+        server = ReplayDataServer(panel).start()
+        scanner = BarStreamScanner(symbols, on_signal, data_stream_url=server.url)
+    """
+
+    def __init__(self, panel, host="127.0.0.1", port=0, delay=0.0):
+        self.host = host
+        self.port = port
+        self.delay = delay
+        self.minutes = _group_by_minute(panel)
+        self.bars_sent = 0
+        self.finished = threading.Event()
+        self._loop = None
+        self._server = None
+        self._thread = None
+        self._started = threading.Event()
+
+    @property
+    def url(self):
+        # Stream rewrites http -> ws and appends /v2/<feed>
+        return f"http://{self.host}:{self.port}"
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="replay-server", daemon=True)
+        self._thread.start()
+        self._started.wait()
+        return self
+
+    def stop(self):
+        if self._loop and self._server:
+            self._loop.call_soon_threadsafe(self._server.close)
+        if self._thread:
+            self._thread.join(timeout=5)
+
+    def _run(self):
+        self._loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self._loop)
+        self._server = self._loop.run_until_complete(websockets.serve(self._handle, self.host, self.port))
+        self.port = self._server.sockets[0].getsockname()[1]
+        self._started.set()
+        self._loop.run_until_complete(self._server.wait_closed())
+        self._loop.close()
+
+    async def _handle(self, ws, path=None):
+        try:
+            await ws.send(msgpack.packb([{"T": "success", "msg": "connected"}]))
+            msgpack.unpackb(await ws.recv())  # auth: any key is accepted
+            await ws.send(msgpack.packb([{"T": "success", "msg": "authenticated"}]))
+
+            request = msgpack.unpackb(await ws.recv())
+            symbols = set(request.get("bars", []))
+            await ws.send(msgpack.packb([{"T": "subscription", "bars": sorted(symbols)}]))
+
+            for messages in self.minutes:
+                batch = [m for m in messages if "*" in symbols or m["S"] in symbols]
+                if batch:
+                    await ws.send(msgpack.packb(batch))
+                    self.bars_sent += len(batch)
+                if self.delay:
+                    await asyncio.sleep(self.delay)
+
+            logger.info(f"Replay finished: {self.bars_sent} bars sent.")
+            self.finished.set()
+            await ws.wait_closed()
+        except websockets.ConnectionClosed:
+            pass
+
+
+def _group_by_minute(panel):
+    by_time = {}
+    for symbol, bars in panel.items():
+        for row in bars.itertuples():
+            ts = row.Index.value  # epoch nanoseconds
+            by_time.setdefault(ts, []).append({
+                "T": "b",
+                "S": symbol,
+                "o": float(row.open),
+                "h": float(row.high),
+                "l": float(row.low),
+                "c": float(row.close),
+                "v": float(row.volume),
+                "t": msgpack.Timestamp.from_unix_nano(ts),
+            })
+    return [by_time[ts] for ts in sorted(by_time)]
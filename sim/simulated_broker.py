@@ -0,0 +1,232 @@
+import heapq
+import logging
+import itertools
+from contextlib import contextmanager
+from types import SimpleNamespace
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+# ------------------------------
+# Simulated broker over recorded bars
+# ------------------------------
+
+class SimulatedBroker:
+    """
+    Stands in for the broker functions in core/broker_interface.py
+    (`get_price(s)`, `get_account`, `get_position(s)`, open orders,
+    `submit_bracket_order`) and
+    fills bracket orders against recorded minute bars.
+
+    `bars` maps symbol -> BAR_DTYPE record array (see core/bar_store.py), sorted
+    by time. The clock is moved with `set_clock`; prices and positions are
+    whatever was true at that bar.
+
+    Fill model (bars only, no order book):
+      - the limit entry fills on the first later bar that trades through it,
+        at the better of the limit and that bar's open
+      - from the fill bar on, the first bar touching the stop or target exits;
+        if one bar touches both, the stop is assumed to hit first
+      - brackets still open at the end of the data are marked at the last close
+    Account equity is the starting equity plus realized P&L.
+    """
+
+    def __init__(self, bars, starting_equity=100_000.0):
+        self.bars = bars
+        self.starting_equity = float(starting_equity)
+        self.now = None
+        self.trades = []
+        self._ids = itertools.count(1)
+        # Fills are known at submission, so pending entries/exits sit in heaps
+        # and are applied as the clock moves forward
+        self._pending = []
+        self._positions = {}
+        self._realized = 0.0
+        self._realized_at_day_start = 0.0
+        self._day_start = None
+
+    # --- clock ---
+
+    def set_clock(self, timestamp_ns):
+        """Advance the simulated time (it never moves backwards)."""
+        self.now = int(timestamp_ns)
+        day_start = pd.Timestamp(self.now, tz="UTC").tz_convert("America/New_York").normalize().value
+        if self._day_start is None or day_start > self._day_start:
+            self._apply_fills(day_start - 1)
+            self._day_start = day_start
+            self._realized_at_day_start = self._realized
+        self._apply_fills(self.now)
+
+    def _apply_fills(self, until):
+        while self._pending and self._pending[0][0] <= until:
+            _, _, kind, trade = heapq.heappop(self._pending)
+            signed = trade["qty"] if trade["side"] == "buy" else -trade["qty"]
+            if kind == "entry":
+                self._positions[trade["symbol"]] = self._positions.get(trade["symbol"], 0) + signed
+            else:
+                self._positions[trade["symbol"]] -= signed
+                self._realized += trade["pnl"]
+
+    def _index_now(self, symbol):
+        records = self.bars.get(symbol)
+        if records is None or len(records) == 0:
+            return None
+        i = int(np.searchsorted(records["t"], self.now, side="right")) - 1
+        return i if i >= 0 else None
+
+    # --- broker_interface surface ---
+
+    def get_price(self, symbol):
+        i = self._index_now(symbol)
+        return float(self.bars[symbol]["close"][i]) if i is not None else None
+
+    def get_prices(self, symbols):
+        prices = {symbol: self.get_price(symbol) for symbol in symbols if symbol in self.bars}
+        return {symbol: price for symbol, price in prices.items() if price is not None}
+
+    def get_account(self):
+        equity = self.starting_equity + self._realized
+        last_equity = self.starting_equity + self._realized_at_day_start
+        return SimpleNamespace(
+            account_number="SIMULATED",
+            equity=str(equity),
+            last_equity=str(last_equity),
+            buying_power=str(equity),
+        )
+
+    def get_position(self, symbol):
+        qty = self._positions.get(symbol, 0)
+        return SimpleNamespace(symbol=symbol, qty=str(qty)) if qty else None
+
+    def get_positions(self):
+        positions = {}
+        for symbol, qty in self._positions.items():
+            if qty:
+                price = self.get_price(symbol) or 0.0
+                positions[symbol] = SimpleNamespace(symbol=symbol, qty=str(qty), market_value=str(qty * price))
+        return positions
+
+    def get_open_orders(self):
+        """Entries submitted but not filled yet at the current clock."""
+        return [
+            SimpleNamespace(symbol=trade["symbol"], qty=str(trade["qty"]), filled_qty="0",
+                            limit_price=str(trade["limit_price"]), stop_price=None, side=trade["side"])
+            for _, _, kind, trade in self._pending if kind == "entry"
+        ]
+
+    def get_portfolio(self):
+        return self.get_account(), self.get_positions(), self.get_open_orders()
+
+    def submit_bracket_order(self, symbol, qty, side, entry_price, stop_loss, take_profit):
+        i = self._index_now(symbol)
+        if i is None:
+            return None
+
+        trade = {
+            "id": f"sim-{next(self._ids)}",
+            "symbol": symbol,
+            "side": side,
+            "qty": int(qty),
+            "signal_time": self.now,
+            "limit_price": float(entry_price),
+            "stop_loss": round(float(stop_loss), 2),
+            "take_profit": round(float(take_profit), 2),
+            "setup_tag": None,
+            "confidence_score": None,
+            "risk_amount": None,
+        }
+        trade.update(fill_bracket(self.bars[symbol], i, side, trade["limit_price"],
+                                  trade["stop_loss"], trade["take_profit"]))
+        trade["pnl"] = round(trade.pop("pnl_per_share", 0.0) * trade["qty"], 2)
+        self.trades.append(trade)
+        if trade["entry_time"] is not None:
+            seq = len(self.trades)
+            heapq.heappush(self._pending, (trade["entry_time"], seq, "entry", trade))
+            heapq.heappush(self._pending, (trade["exit_time"], seq, "exit", trade))
+        return SimpleNamespace(id=trade["id"], symbol=symbol, qty=qty, side=side)
+
+    def log_trade(self, trade_data):
+        """Stand-in for `journal_logger.log_trade`: tags the order just submitted."""
+        for trade in reversed(self.trades):
+            if trade["symbol"] == trade_data["symbol"]:
+                trade["setup_tag"] = trade_data.get("setup_tag")
+                trade["confidence_score"] = trade_data.get("confidence_score")
+                trade["risk_amount"] = trade_data.get("risk_amount")
+                return
+
+    # --- wiring ---
+
+    @contextmanager
+    def installed(self, extra_settings=None):
+        """
+        Point the real execution/risk code at this broker for the duration of
+        the block. `extra_settings` are merged into the risk manager's settings.
+        """
+        import core.execution_engine as execution_engine
+        import core.risk_manager as risk_manager
+
+        patches = [
+            (execution_engine, "get_prices", self.get_prices),
+            (execution_engine, "submit_bracket_order", self.submit_bracket_order),
+            (execution_engine, "log_trade", self.log_trade),
+            (risk_manager, "get_cached_portfolio", self.get_portfolio),
+        ]
+        if extra_settings:
+            patches.append((risk_manager, "settings", {**risk_manager.settings, **extra_settings}))
+
+        saved = [(module, name, getattr(module, name)) for module, name, _ in patches]
+        try:
+            for module, name, value in patches:
+                setattr(module, name, value)
+            yield self
+        finally:
+            for module, name, value in saved:
+                setattr(module, name, value)
+
+
+def fill_bracket(records, i, side, limit_price, stop_loss, take_profit):
+    """
+    Walk a symbol's bars after bar `i` to find the entry fill and the exit leg.
+    Each search is a single vectorized scan of the remaining bars.
+    """
+    result = {"entry_time": None, "entry_price": None, "exit_time": None,
+              "exit_price": None, "exit_reason": "unfilled"}
+    rest = records[i + 1:]
+    if len(rest) == 0:
+        return result
+
+    buy = side == "buy"
+    touched = rest["low"] <= limit_price if buy else rest["high"] >= limit_price
+    if not touched.any():
+        return result
+    j = int(np.argmax(touched))
+    open_ = rest["open"][j]
+    entry = min(open_, limit_price) if buy else max(open_, limit_price)
+
+    after = rest[j:]
+    stop_hit = after["low"] <= stop_loss if buy else after["high"] >= stop_loss
+    target_hit = after["high"] >= take_profit if buy else after["low"] <= take_profit
+    k_stop = int(np.argmax(stop_hit)) if stop_hit.any() else None
+    k_target = int(np.argmax(target_hit)) if target_hit.any() else None
+
+    if k_stop is not None and (k_target is None or k_stop <= k_target):
+        k, reason, level = k_stop, "stop_loss", stop_loss
+        # gapping through the stop fills at the open
+        price = level if k == 0 else (min(after["open"][k], level) if buy else max(after["open"][k], level))
+    elif k_target is not None:
+        k, reason, level = k_target, "take_profit", take_profit
+        price = level if k == 0 else (max(after["open"][k], level) if buy else min(after["open"][k], level))
+    else:
+        k, reason, price = len(after) - 1, "open", after["close"][-1]
+
+    direction = 1 if buy else -1
+    result.update({
+        "entry_time": int(after["t"][0]),
+        "entry_price": float(entry),
+        "exit_time": int(after["t"][k]),
+        "exit_price": float(price),
+        "exit_reason": reason,
+        "pnl_per_share": float(price - entry) * direction,
+    })
+    return result
@@ -0,0 +1,286 @@
+import argparse
+import datetime
+import itertools
+import logging
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import pandas as pd
+from core.utils import vwap_matrix, rsi_matrix, rolling_mean_matrix
+from sim.backtest import load_bars, session_rows, stack_rows, trailing_windows
+
+logger = logging.getLogger(__name__)
+
+# The live strategy's constants, each with the values to try. The live values are
+# RSI < 45, a stop at vwap * 0.995, a 1.5R target, a 10-bar volume average and 9:45-11:30.
+DEFAULT_GRID = {
+    "rsi_max":       (35, 40, 45, 50, 55),
+    "stop_pct":      (0.0025, 0.005, 0.0075, 0.01),
+    "reward_r":      (1.0, 1.5, 2.0, 2.5, 3.0),
+    "volume_window": (5, 10, 20),
+    "start":         ("09:35", "09:45", "10:00"),
+    "end":           ("11:00", "11:30", "12:00"),
+}
+
+# Axes that decide which bars fire, then the axes that only change the bracket
+SIGNAL_AXES = ("rsi_max", "volume_window", "start", "end")
+BRACKET_AXES = ("stop_pct", "reward_r")
+
+def _minute(value):
+    hours, minutes = str(value).split(":")
+    return int(hours) * 60 + int(minutes)
+
+def _grid(grid):
+    return {axis: tuple((grid or {}).get(axis, values)) for axis, values in DEFAULT_GRID.items()}
+
+# ------------------------------
+# Candidate bars and their bracket outcomes
+# ------------------------------
+
+def candidate_outcomes(bars, grid=None, horizon=390, chunk=2000):
+    """
+    Every bar that fires the VWAP bounce rule under at least one combination
+    in `grid`, with what each combination needs to decide if it fires there
+    and the R multiple its bracket would have made.
+
+    Returns a dict of arrays, one entry per candidate bar, sorted by time:
+    "t", "symbol", "price", "vwap", "rsi", "minute", "volume_ok"
+    (candidates x volume_window), "entered" and "r" (candidates x stop_pct
+    x reward_r, NaN where the entry never filled). Fills follow
+    `fill_bracket` in sim/simulated_broker.py, looking at most `horizon`
+    bars past the signal; brackets still open are marked at the last close.
+    """
+    grid = _grid(grid)
+    windows = grid["volume_window"]
+    first, last = min(map(_minute, grid["start"])), max(map(_minute, grid["end"]))
+    by_day, minutes = session_rows(bars)
+
+    # Candidate bars day by day, as in `find_signal_bars`. VWAP and the volume
+    # averages look back fewer bars than the live window, so the whole-day
+    # values match; RSI is recursive and is taken on each bar's live window.
+    columns = {key: [] for key in ("symbol", "index", "price", "vwap", "rsi", "minute", "volume_ok")}
+    for day in sorted(by_day):
+        rows = by_day[day]
+        arrays = stack_rows(bars, rows, minutes)
+        high, low, close, volume, minute = (arrays[k] for k in ("high", "low", "close", "volume", "minute"))
+        vwap = vwap_matrix(high, low, close, volume)
+        with np.errstate(invalid="ignore"):
+            due = (minute >= first) & (minute <= last)
+        r_due, c_due, live = trailing_windows(arrays, due)
+        rsi = np.full(close.shape, np.nan)
+        if len(r_due):
+            rsi[r_due, c_due] = rsi_matrix(live["close"])[:, -1]
+        prev_low = np.full(low.shape, np.nan)
+        prev_low[:, 1:] = low[:, :-1]
+
+        with np.errstate(invalid="ignore"):
+            volume_ok = np.stack([volume > rolling_mean_matrix(volume, w) for w in windows], axis=-1)
+            hits = (
+                due
+                & (close > vwap)
+                & (prev_low < vwap)
+                & (rsi < max(grid["rsi_max"]))
+                & volume_ok.any(axis=-1)
+            )
+        r_idx, c_idx = np.nonzero(hits)
+        columns["symbol"].append(np.array([rows[r][0] for r in r_idx], dtype=object))
+        columns["index"].append(np.array([rows[r][1] for r in r_idx], dtype=int) + c_idx)
+        columns["price"].append(close[r_idx, c_idx])
+        columns["vwap"].append(vwap[r_idx, c_idx])
+        columns["rsi"].append(rsi[r_idx, c_idx])
+        columns["minute"].append(minute[r_idx, c_idx].astype(int))
+        columns["volume_ok"].append(volume_ok[r_idx, c_idx])
+    if not any(len(part) for part in columns["symbol"]):
+        return _empty(grid)
+
+    found = {key: np.concatenate(parts) for key, parts in columns.items()}
+    symbols, index = found["symbol"], found.pop("index")
+    found["t"] = np.array([bars[s]["t"][i] for s, i in zip(symbols, index)], dtype=np.int64)
+
+    # Bars after each candidate, gathered from one flat copy of every symbol with `horizon` NaN bars after it
+    names = sorted(set(symbols))
+    offsets, parts, position = {}, [], 0
+    for name in names:
+        offsets[name] = position
+        padded = np.full(len(bars[name]) + horizon, np.nan, dtype=[(f, "<f8") for f in ("open", "high", "low", "close")])
+        for f in ("open", "high", "low", "close"):
+            padded[f][:len(bars[name])] = bars[name][f]
+        parts.append(padded)
+        position += len(padded)
+    flat = np.concatenate(parts) if parts else None
+
+    entered = np.zeros(len(symbols), dtype=bool)
+    r = np.full((len(symbols), len(grid["stop_pct"]), len(grid["reward_r"])), np.nan)
+    for lo in range(0, len(symbols), chunk):
+        sl = slice(lo, lo + chunk)
+        start = np.array([offsets[s] for s in symbols[sl]], dtype=int) + index[sl] + 1
+        ahead = flat[start[:, None] + np.arange(horizon)]
+        entered[sl], r[sl] = _bracket_outcomes(ahead, found["price"][sl], found["vwap"][sl], grid)
+    found.update(entered=entered, r=r)
+
+    return _by_time(found)
+
+def _by_time(found):
+    """Candidates in (time, symbol) order, as `find_signal_bars` returns them."""
+    order = sorted(range(len(found["t"])), key=lambda k: (found["t"][k], found["symbol"][k]))
+    return {key: value[order] for key, value in found.items()}
+
+def _bracket_outcomes(ahead, price, vwap, grid):
+    """Entry fill and R multiple of a buy bracket per candidate x stop_pct x reward_r."""
+    horizon = ahead.shape[1]
+    stop_pct = np.asarray(grid["stop_pct"], dtype=float)
+    reward_r = np.asarray(grid["reward_r"], dtype=float)
+    f_open, f_high, f_low, f_close = ahead["open"], ahead["high"], ahead["low"], ahead["close"]
+
+    with np.errstate(invalid="ignore"):
+        touched = f_low <= price[:, None]
+        entered = touched.any(axis=1)
+        j = np.argmax(touched, axis=1)
+        entry = np.minimum(f_open[np.arange(len(j)), j], price)
+        after = np.arange(horizon)[None, :] >= j[:, None]
+
+        # The signal's stop and the ticket's target, rounded as the order is
+        stops = np.round(vwap[:, None] * (1 - stop_pct[None, :]), 2)               # candidates x stops
+        risk = price[:, None] - stops
+        targets = np.round(price[:, None, None] + reward_r * risk[:, :, None], 2)  # ... x rewards
+
+        k_stop = _first(after[:, None, :] & (f_low[:, None, :] <= stops[:, :, None]), horizon)
+        k_target = _first(after[:, None, None, :] & (f_high[:, None, None, :] >= targets[..., None]), horizon)
+
+        # gapping through a level past the entry bar fills at the open
+        stop_open = np.take_along_axis(f_open, np.minimum(k_stop, horizon - 1), axis=1)
+        stop_price = np.where(k_stop == j[:, None], stops, np.minimum(stop_open, stops))
+        target_open = np.take_along_axis(f_open, np.minimum(k_target, horizon - 1).reshape(len(j), -1),
+                                         axis=1).reshape(k_target.shape)
+        target_price = np.where(k_target == j[:, None, None], targets, np.maximum(target_open, targets))
+        last_close = f_close[np.arange(len(j)), np.maximum((~np.isnan(f_close)).sum(axis=1) - 1, 0)]
+
+        stopped = (k_stop < horizon)[:, :, None] & (k_stop[:, :, None] <= k_target)
+        exit_price = np.where(stopped, stop_price[:, :, None],
+                              np.where(k_target < horizon, target_price, last_close[:, None, None]))
+        r = (exit_price - entry[:, None, None]) / risk[:, :, None]
+    return entered, np.where(entered[:, None, None], r, np.nan)
+
+def _first(mask, horizon):
+    """Index of the first True along the last axis, or `horizon` where there is none."""
+    return np.where(mask.any(axis=-1), np.argmax(mask, axis=-1), horizon)
+
+def _empty(grid):
+    return {
+        "t": np.empty(0, dtype=np.int64), "symbol": np.empty(0, dtype=object),
+        "price": np.empty(0), "vwap": np.empty(0), "rsi": np.empty(0), "minute": np.empty(0, dtype=int),
+        "volume_ok": np.empty((0, len(grid["volume_window"])), dtype=bool),
+        "entered": np.empty(0, dtype=bool), "r": np.empty((0, len(grid["stop_pct"]), len(grid["reward_r"]))),
+    }
+
+# ------------------------------
+# Scoring the grid
+# ------------------------------
+
+def score_grid(found, grid=None, max_cells=20_000_000):
+    """
+    Trades, win rate, expectancy (mean R), total R and max drawdown (in R,
+    trades taken in time order) for every combination in `grid`, from
+    `candidate_outcomes`. One row per combination, in grid order.
+    """
+    grid = _grid(grid)
+    n = len(found["t"])
+    with np.errstate(invalid="ignore"):
+        rsi_ok = found["rsi"][None, :] < np.asarray(grid["rsi_max"], dtype=float)[:, None]
+    start_ok = found["minute"][None, :] >= np.array([_minute(v) for v in grid["start"]])[:, None]
+    end_ok = found["minute"][None, :] <= np.array([_minute(v) for v in grid["end"]])[:, None]
+
+    # which candidates each signal combination takes: (rsi x volume x start x end) x candidates
+    takes = (
+        rsi_ok[:, None, None, None, :]
+        & found["volume_ok"].T[None, :, None, None, :]
+        & start_ok[None, None, :, None, :]
+        & end_ok[None, None, None, :, :]
+    ).reshape(-1, n) & found["entered"][None, :]
+
+    r = np.nan_to_num(found["r"].reshape(n, -1))  # candidates x (stop x reward)
+    weights = takes.astype(float)
+    trades = takes.sum(axis=1)[:, None]
+    total_r = weights @ r
+    wins = weights @ (r > 0)
+
+    drawdown = np.zeros(total_r.shape)
+    step = max(1, max_cells // max(n * r.shape[1], 1))
+    for lo in range(0, len(takes), step):
+        equity = np.cumsum(weights[lo:lo + step, :, None] * r[None], axis=1)
+        peak = np.maximum(np.maximum.accumulate(equity, axis=1), 0.0)
+        drawdown[lo:lo + step] = (peak - equity).max(axis=1, initial=0.0)
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        results = {
+            "trades": np.broadcast_to(trades, total_r.shape),
+            "win_rate": wins / trades,
+            "expectancy": total_r / trades,
+            "total_r": total_r,
+            "max_drawdown_r": drawdown,
+        }
+
+    combos = list(itertools.product(*(grid[axis] for axis in SIGNAL_AXES + BRACKET_AXES)))
+    frame = pd.DataFrame(combos, columns=list(SIGNAL_AXES + BRACKET_AXES))
+    for name, values in results.items():
+        frame[name] = values.reshape(-1)
+    frame["trades"] = frame["trades"].astype(int)
+    return frame
+
+def rank(scores, min_trades=20):
+    """Combinations with at least `min_trades`, best expectancy first, then smallest drawdown."""
+    ranked = scores[scores["trades"] >= min_trades]
+    ranked = ranked.sort_values(["expectancy", "max_drawdown_r"], ascending=[False, True]).reset_index(drop=True)
+    ranked.index += 1
+    ranked.index.name = "rank"
+    return ranked
+
+# ------------------------------
+# Sweep
+# ------------------------------
+
+def run_sweep(bars, grid=None, processes=1, horizon=390, min_trades=20):
+    """
+    Score every combination of `grid` (defaults to DEFAULT_GRID) over recorded
+    bars and return them ranked.
+
+    Symbols are split across `processes` worker processes to find candidate
+    bars and their bracket outcomes; the grid is then scored in one pass.
+    Each signal is counted as its own trade, so portfolio limits and
+    skipped repeat signals aren't modeled; confirm the leaders with
+    `run_backtest`.
+    """
+    grid = _grid(grid)
+    symbols = sorted(bars)
+    processes = max(1, min(int(processes), len(symbols) or 1))
+    if processes == 1:
+        found = candidate_outcomes(bars, grid, horizon)
+    else:
+        chunks = [symbols[i::processes * 4] for i in range(processes * 4)]
+        with ProcessPoolExecutor(processes, mp_context=multiprocessing.get_context("spawn")) as pool:
+            parts = list(pool.map(candidate_outcomes, [{s: bars[s] for s in chunk} for chunk in chunks if chunk],
+                                  itertools.repeat(grid), itertools.repeat(horizon)))
+        found = _by_time({key: np.concatenate([part[key] for part in parts]) for key in parts[0]})
+
+    combos = int(np.prod([len(values) for values in grid.values()]))
+    logger.info(f"Scoring {combos} combinations over {len(found['t'])} candidate bars...")
+    return rank(score_grid(found, grid), min_trades)
+
+
+if __name__ == "__main__":
+    from core.broker_interface import bar_store
+    from core.logging_setup import setup_logging
+
+    parser = argparse.ArgumentParser(description="Rank VWAP bounce parameter combinations over stored minute bars.")
+    parser.add_argument("--start", type=datetime.date.fromisoformat)
+    parser.add_argument("--end", type=datetime.date.fromisoformat)
+    parser.add_argument("--symbols", nargs="*")
+    parser.add_argument("--processes", type=int, default=multiprocessing.cpu_count())
+    parser.add_argument("--min-trades", type=int, default=20)
+    parser.add_argument("--top", type=int, default=25)
+    args = parser.parse_args()
+
+    setup_logging()
+    bars = load_bars(bar_store, args.symbols, args.start, args.end)
+    ranked = run_sweep(bars, processes=args.processes, min_trades=args.min_trades)
+    print(ranked.head(args.top).to_string())
@@ -0,0 +1,125 @@
+import json
+import asyncio
+import logging
+import threading
+import websockets
+
+logger = logging.getLogger(__name__)
+
+# ------------------------------
+# Local stand-in for the Alpaca trade updates stream
+# ------------------------------
+
+class TradeUpdateServer:
+    """
+    Speaks the trading stream protocol (JSON frames: authenticate, listen,
+    then "trade_updates" messages), so `TradeUpdateStream` and anything else
+    built on `alpaca_trade_api.stream.Stream` can run against it unchanged.
+
+        server = TradeUpdateServer().start()
+        listener = TradeUpdateStream(ledger, base_url=server.url)
+        server.publish(*bracket_updates("p1", "AAPL", 10, 100.0, 103.0))
+    """
+
+    def __init__(self, host="127.0.0.1", port=0):
+        self.host = host
+        self.port = port
+        self.updates_sent = 0
+        self.subscribed = threading.Event()
+        self._clients = set()
+        self._loop = None
+        self._server = None
+        self._thread = None
+        self._started = threading.Event()
+
+    @property
+    def url(self):
+        # Stream rewrites http -> ws and appends /stream
+        return f"http://{self.host}:{self.port}"
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="trade-update-server", daemon=True)
+        self._thread.start()
+        self._started.wait()
+        return self
+
+    def stop(self):
+        if self._loop and self._server:
+            self._loop.call_soon_threadsafe(self._server.close)
+        if self._thread:
+            self._thread.join(timeout=5)
+
+    def publish(self, *updates):
+        """Send trade updates (the message "data" payloads) to every listening client, in order."""
+        asyncio.run_coroutine_threadsafe(self._publish(updates), self._loop).result(timeout=5)
+
+    async def _publish(self, updates):
+        for update in updates:
+            message = json.dumps({"stream": "trade_updates", "data": update})
+            for ws in list(self._clients):
+                await ws.send(message)
+            self.updates_sent += 1
+
+    def _run(self):
+        self._loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self._loop)
+        self._server = self._loop.run_until_complete(websockets.serve(self._handle, self.host, self.port))
+        self.port = self._server.sockets[0].getsockname()[1]
+        self._started.set()
+        self._loop.run_until_complete(self._server.wait_closed())
+        self._loop.close()
+
+    async def _handle(self, ws, path=None):
+        try:
+            json.loads(await ws.recv())  # authenticate: any key is accepted
+            await ws.send(json.dumps({"stream": "authorization",
+                                      "data": {"action": "authenticate", "status": "authorized"}}))
+            request = json.loads(await ws.recv())
+            streams = request.get("data", {}).get("streams", [])
+            await ws.send(json.dumps({"stream": "listening", "data": {"streams": streams}}))
+            if "trade_updates" in streams:
+                self._clients.add(ws)
+                self.subscribed.set()
+            await ws.wait_closed()
+        except websockets.ConnectionClosed:
+            pass
+        finally:
+            self._clients.discard(ws)
+
+
+def bracket_updates(order_id, symbol, qty, entry_price, exit_price, exit_leg="take_profit",
+                    at="2024-03-04T15:40:00Z", exit_at="2024-03-04T16:00:00Z"):
+    """
+    The trade updates for one bracket buy from submission to close: new,
+    entry fill, then the `exit_leg` ("take_profit" or "stop_loss") filling
+    and the other leg being canceled.
+    """
+    legs = {
+        "take_profit": {"id": f"{order_id}-tp", "type": "limit"},
+        "stop_loss": {"id": f"{order_id}-sl", "type": "stop"},
+    }
+
+    def order(status, filled_qty=0, price=None, filled_at=None, leg_status=None):
+        return {
+            "id": order_id, "symbol": symbol, "side": "buy", "qty": str(qty), "type": "limit",
+            "order_class": "bracket", "status": status, "filled_qty": str(filled_qty),
+            "filled_avg_price": None if price is None else str(price), "filled_at": filled_at,
+            "legs": [leg_order(name, leg_status or "held") for name in legs],
+        }
+
+    def leg_order(name, status, price=None, filled_at=None):
+        return {
+            "id": legs[name]["id"], "symbol": symbol, "side": "sell", "qty": str(qty), "type": legs[name]["type"],
+            "order_class": "bracket", "status": status, "filled_qty": str(qty if status == "filled" else 0),
+            "filled_avg_price": None if price is None else str(price), "filled_at": filled_at, "legs": None,
+        }
+
+    other = "stop_loss" if exit_leg == "take_profit" else "take_profit"
+    return [
+        {"event": "new", "order": order("new")},
+        {"event": "fill", "order": order("filled", qty, entry_price, at, leg_status="new"),
+         "price": str(entry_price), "qty": str(qty), "position_qty": str(qty), "timestamp": at},
+        {"event": "fill", "order": leg_order(exit_leg, "filled", exit_price, exit_at),
+         "price": str(exit_price), "qty": str(qty), "position_qty": "0", "timestamp": exit_at},
+        {"event": "canceled", "order": leg_order(other, "canceled"), "timestamp": exit_at},
+    ]
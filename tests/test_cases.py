@@ -0,0 +1,1226 @@
+import math
+from datetime import date
+import numpy as np
+import pandas as pd
+import pytest
+
+from core.indicators import IndicatorEngine, IndicatorState
+from core.utils import calculate_rsi, calculate_vwap
+
+
+def make_bars(n=120, seed=7):
+    rng = np.random.default_rng(seed)
+    close = 100 + np.cumsum(rng.normal(0, 0.2, n))
+    high = close + rng.uniform(0, 0.3, n)
+    low = close - rng.uniform(0, 0.3, n)
+    volume = rng.integers(100, 5000, n).astype(float)
+    index = pd.date_range("2024-03-04 14:30", periods=n, freq="min", tz="UTC", name="timestamp")
+    return pd.DataFrame({"open": close, "high": high, "low": low, "close": close, "volume": volume}, index=index)
+
+
+def make_bounce_bars(n=50, seed=7):
+    """A steady decline with a last bar that dips and closes back up, so some seeds fire."""
+    rng = np.random.default_rng(seed)
+    bars = make_bars(n, seed)
+    close = 100 - np.linspace(0, 3, n) + rng.normal(0, 0.05, n)
+    close[-1] = close[-2] + rng.uniform(0, 1.0)
+    bars["close"], bars["high"], bars["low"] = close, close + 0.1, close - 0.1
+    bars.iloc[-1, bars.columns.get_loc("low")] = close[-2] - 0.2
+    bars.iloc[-1, bars.columns.get_loc("volume")] *= rng.uniform(0.5, 4)
+    return bars
+
+
+# ----------------------------
+# Indicator parity with ta
+# ----------------------------
+
+def test_incremental_indicators_match_ta():
+    bars = make_bars()
+    state = IndicatorState()
+
+    for i, row in enumerate(bars.itertuples()):
+        state.update(row.Index, row.high, row.low, row.close, row.volume)
+        window = bars.iloc[max(i + 1 - 50, 0):i + 1]  # the 50 bars the polling scan fetches
+        if i < 14:
+            continue
+        assert state.vwap == pytest.approx(calculate_vwap(window), rel=1e-9)
+        assert state.rsi == pytest.approx(calculate_rsi(window["close"]), rel=1e-9)
+        assert state.avg_volume == pytest.approx(window["volume"].rolling(10).mean().iloc[-1], rel=1e-9)
+
+
+def test_engine_skips_seen_bars_and_revises_last_bar():
+    bars = make_bars()
+    engine = IndicatorEngine()
+
+    engine.update_frame("AAPL", bars.iloc[:60])
+    engine.update_frame("AAPL", bars.iloc[10:61])
+    assert engine.get("AAPL").count == 61
+
+    # The last bar was still forming: a revised copy replaces it instead of being appended
+    revised = bars.iloc[:62].copy()
+    revised.iloc[-1, revised.columns.get_loc("close")] += 0.5
+    engine.update_frame("AAPL", bars.iloc[:62])
+    state = engine.update_frame("AAPL", revised)
+
+    assert state.count == 62
+    assert state.rsi == pytest.approx(calculate_rsi(revised["close"].iloc[-50:]), rel=1e-9)
+    assert state.vwap == pytest.approx(calculate_vwap(revised.iloc[-50:]), rel=1e-9)
+
+    # without a lookback, RSI runs over the whole history
+    full = IndicatorEngine(lookback=None).update_frame("AAPL", revised)
+    assert full.rsi == pytest.approx(calculate_rsi(revised["close"]), rel=1e-9)
+    assert full.rsi != pytest.approx(state.rsi, rel=1e-9)
+
+
+def test_indicators_are_nan_until_warmed_up():
+    state = IndicatorState()
+    for row in make_bars(5).itertuples():
+        state.update(row.Index, row.high, row.low, row.close, row.volume)
+    assert not state.ready
+    assert math.isnan(state.vwap) and math.isnan(state.rsi)
+
+
+# ----------------------------
+# Vectorized evaluator
+# ----------------------------
+
+def test_matrix_indicators_match_ta_with_padding():
+    from core.utils import rsi_matrix, vwap_matrix
+
+    long, short = make_bars(50, seed=1), make_bars(30, seed=2)
+    arrays = {}
+    for col in ("high", "low", "close", "volume"):
+        arrays[col] = np.full((2, 50), np.nan)
+        arrays[col][0] = long[col].to_numpy()
+        arrays[col][1, 20:] = short[col].to_numpy()
+
+    vwap = vwap_matrix(arrays["high"], arrays["low"], arrays["close"], arrays["volume"])
+    rsi = rsi_matrix(arrays["close"])
+
+    assert vwap[0, -1] == pytest.approx(calculate_vwap(long), rel=1e-9)
+    assert vwap[1, -1] == pytest.approx(calculate_vwap(short), rel=1e-9)
+    assert rsi[0, -1] == pytest.approx(calculate_rsi(long["close"]), rel=1e-9)
+    assert rsi[1, -1] == pytest.approx(calculate_rsi(short["close"]), rel=1e-9)
+
+
+def test_vectorized_scan_matches_per_symbol_rule():
+    vsg = pytest.importorskip("core.vwap_signal_generator")
+
+    panel = {f"S{i}": make_bounce_bars(50, seed=i) for i in range(200)}
+    panel.update({f"R{i}": make_bars(40, seed=i) for i in range(100)})
+    vectorized = vsg.scan_vwap_bounce_panel(panel)
+
+    per_symbol = []
+    for symbol, bars in panel.items():
+        vsg.indicator_engine.reset(symbol)
+        signal = vsg.evaluate_vwap_bounce(symbol, bars)
+        if signal:
+            per_symbol.append(signal)
+
+    assert vectorized
+    assert vectorized == per_symbol
+
+
+def test_sharded_scan_matches_single_process_scan():
+    vsg = pytest.importorskip("core.vwap_signal_generator")
+    from core.sharded_scanner import ShardedScanner
+
+    panel = {f"S{i}": make_bounce_bars(50, seed=i) for i in range(120)}
+    panel.update({f"R{i}": make_bars(40, seed=i) for i in range(40)})
+    symbols = list(panel) + ["MISSING"]  # in the universe, but no bars this cycle
+
+    expected = vsg.scan_vwap_bounce_panel(panel)
+
+    scanner = ShardedScanner(symbols, processes=3).start()
+    try:
+        first = scanner.scan(panel)
+        # the next cycle overwrites the shared panel in place
+        del panel["S0"], panel["S1"]
+        second = scanner.scan(panel)
+    finally:
+        scanner.stop()
+
+    assert first and first == expected
+    assert second == vsg.scan_vwap_bounce_panel(panel)
+
+
+def test_strategies_share_one_panel_and_memoized_indicators(monkeypatch):
+    vsg = pytest.importorskip("core.vwap_signal_generator")
+    strategies = pytest.importorskip("scanner_hooks.strategies")
+
+    calls = []
+    vwap = strategies.INDICATORS["vwap"]
+    monkeypatch.setitem(strategies.INDICATORS, "vwap", lambda bars, **p: calls.append(len(bars["close"])) or vwap(bars, **p))
+
+    @strategies.register_strategy("above_vwap", setup_tag="Above VWAP", bars=30,
+                                  indicators={"vwap": ("vwap", {"window": 14})})
+    def above_vwap(symbols, bars, indicators):
+        return [{"symbol": s, "side": "buy", "stop_loss": 1.0}
+                for s, c, v in zip(symbols, bars["close"][:, -1], indicators["vwap"][:, -1]) if c > v]
+
+    try:
+        panel = {f"S{i}": make_bounce_bars(50, seed=i) for i in range(60)}
+        engine = strategies.StrategyEngine(["vwap_bounce", "above_vwap"])
+        signals = engine.scan(panel)
+
+        assert engine.limit == 50
+        assert calls == [60]  # both strategies' vwap came from one computation
+        bounce = [s for s in signals if s["setup_tag"] == "VWAP Bounce"]
+        assert bounce and bounce == vsg.scan_vwap_bounce_panel(panel)
+        assert {s["setup_tag"] for s in signals} == {"VWAP Bounce", "Above VWAP"}
+
+        # unchanged bars are served from the cache; a revised last bar is recomputed
+        revised = panel["S3"].copy()
+        revised.iloc[-1, revised.columns.get_loc("volume")] += 100
+        panel["S3"] = revised
+        second = engine.scan(panel)
+        assert calls == [60, 1]
+        assert second == strategies.StrategyEngine(["vwap_bounce", "above_vwap"]).scan(panel)
+
+        with pytest.raises(ValueError):
+            strategies.StrategyEngine(["no_such_strategy"])
+    finally:
+        strategies.STRATEGIES.pop("above_vwap")
+
+
+def test_bar_close_schedule_spreads_slices_and_skips_seen_bars():
+    run_scanner = pytest.importorskip("run_scanner")
+
+    schedule = run_scanner.BarCloseSchedule([f"S{i}" for i in range(10)], slices=3, settle=2.0, spread=30.0)
+    minute = 1_700_000_040.0  # a minute boundary
+    assert [len(s) for s in schedule.slices] == [4, 4, 2]
+    assert schedule.next_slot(minute) == (minute + 2.0, schedule.slices[0])
+    assert schedule.next_slot(minute + 2.5) == (minute + 12.0, schedule.slices[1])
+    assert schedule.next_slot(minute + 23.0) == (minute + 62.0, schedule.slices[0])
+
+    panel = {"S0": make_bars(30), "S1": make_bars(30, seed=2)}
+    assert list(schedule.fresh(panel)) == ["S0", "S1"]
+    panel["S1"] = make_bars(31, seed=2)  # only S1 got a new bar
+    assert list(schedule.fresh(panel)) == ["S1"]
+    assert schedule.fresh(panel) == {}
+
+    signal = {"symbol": "S1", "side": "buy", "stop_loss": 99.0, "setup_tag": "VWAP Bounce"}
+    assert schedule.dedup([signal, dict(signal)], panel) == [signal]
+    assert schedule.dedup([signal], panel) == []
+    panel["S1"] = make_bars(32, seed=2)
+    assert schedule.dedup([signal], panel) == [signal]
+
+
+# ----------------------------
+# Streaming scanner against the replay feed
+# ----------------------------
+
+def test_stream_scanner_fires_on_replayed_bars():
+    import threading
+    import time
+    bar_stream = pytest.importorskip("core.bar_stream")
+    from core.vwap_signal_generator import scan_vwap_bounce_panel
+    from sim.replay_server import ReplayDataServer
+
+    panel = {f"S{i}": make_bounce_bars(50, seed=i) for i in range(40)}
+    expected = {s["symbol"] for s in scan_vwap_bounce_panel(panel)}
+
+    received = []
+    server = ReplayDataServer(panel).start()
+    scanner = bar_stream.BarStreamScanner(panel, received.append, data_stream_url=server.url,
+                                          engine=IndicatorEngine(), store=None)
+    thread = threading.Thread(target=scanner.run, daemon=True)
+    thread.start()
+
+    assert server.finished.wait(timeout=10)
+    deadline = time.time() + 10
+    while scanner.bars_received < server.bars_sent and time.time() < deadline:
+        time.sleep(0.05)
+    scanner.stop()
+    thread.join(timeout=10)
+    server.stop()
+
+    assert scanner.bars_received == server.bars_sent == 40 * 50
+    assert expected and expected <= {s["symbol"] for s in received}
+
+
+# ----------------------------
+# Bar store
+# ----------------------------
+
+def test_bar_store_appends_revises_and_memory_maps(tmp_path):
+    from core.bar_store import BarStore
+
+    bars = make_bars(30)
+    day = bars.index[0].tz_convert("America/New_York").date()
+    store = BarStore(str(tmp_path))
+
+    assert store.append("AAPL", bars.iloc[:20]) == 20
+    revised = bars.iloc[15:30].copy()
+    revised.iloc[4, revised.columns.get_loc("close")] = 999.0  # same timestamp as the last stored bar
+    assert store.append("AAPL", revised) == 10
+
+    records = BarStore(str(tmp_path)).read("AAPL", day)
+    assert isinstance(records, np.memmap) and len(records) == 30
+    assert records["close"][19] == 999.0
+    assert records["close"][-1] == bars["close"].iloc[-1]
+
+    frame = store.read_frame("AAPL", day, tail=5)
+    assert list(frame.index) == list(bars.index[-5:])
+    assert store.symbols(day) == ["AAPL"] and store.days() == [day]
+
+
+def test_get_bars_batch_only_requests_bars_not_in_store(tmp_path, monkeypatch):
+    bi = pytest.importorskip("core.broker_interface")
+    from core.bar_store import BarStore
+
+    history = {s: make_bars(60, seed=i) for i, s in enumerate(["AAPL", "MSFT"])}
+    requested = []
+
+    class FakeApi:
+        def get_bars(self, symbols, timeframe, start=None, feed=None):
+            start = pd.Timestamp(start)
+            requested.append(start)
+            frames = [history[s][history[s].index >= start].assign(symbol=s) for s in symbols]
+            return type("Bars", (), {"df": pd.concat(frames)})()
+
+    now = history["AAPL"].index[-1]
+    monkeypatch.setattr(bi, "api", FakeApi())
+    monkeypatch.setattr(bi, "bar_store", BarStore(str(tmp_path)))
+    monkeypatch.setattr(bi, "market_today", lambda: now.tz_convert("America/New_York").date())
+    monkeypatch.setattr(pd.Timestamp, "now", classmethod(lambda cls, tz=None: now))
+
+    first = bi.get_bars_batch(["AAPL", "MSFT"])
+    second = bi.get_bars_batch(["AAPL", "MSFT"])
+
+    assert requested[1] == now  # warm call only asks from the last stored bar
+    assert len(first["AAPL"]) == 50
+    pd.testing.assert_frame_equal(first["MSFT"], second["MSFT"])
+    pd.testing.assert_frame_equal(first["MSFT"], history["MSFT"].tail(50),
+                                  check_freq=False, check_index_type=False)
+
+
+# ----------------------------
+# Backtest
+# ----------------------------
+
+def test_backtest_replays_signals_through_process_signal():
+    pytest.importorskip("core.execution_engine")
+    from core.vwap_signal_generator import scan_vwap_bounce_panel
+    from sim.backtest import bars_from_panel, find_signal_bars, run_backtest
+
+    panel = {}
+    for i in range(30):
+        setup = make_bounce_bars(50, seed=i)
+        after = make_bars(60, seed=100 + i)
+        after.index = after.index + pd.Timedelta(minutes=50)
+        after[["open", "high", "low", "close"]] += setup["close"].iloc[-1] - after["close"].iloc[0]
+        panel[f"S{i}"] = pd.concat([setup, after])
+    bars = bars_from_panel(panel)
+
+    # The vectorized detector agrees with the live evaluator at the setup bar
+    setup_time = panel["S0"].index[49].value
+    detected = {symbol for t, symbol, _, _ in find_signal_bars(bars) if t == setup_time}
+    live = {s["symbol"] for s in scan_vwap_bounce_panel({k: v.iloc[:50] for k, v in panel.items()})}
+    assert detected == live
+
+    trades, summary = run_backtest(bars, starting_equity=100_000)
+    filled = trades[trades["entry_time"].notna()]
+    assert len(filled) > 0
+    assert set(filled["exit_reason"]) <= {"stop_loss", "take_profit", "open"}
+    assert (filled["entry_time"] > filled["signal_time"]).all()
+    assert list(summary.index) == ["VWAP Bounce"]
+    assert summary.loc["VWAP Bounce", "total_pnl"] == pytest.approx(filled["pnl"].sum())
+
+
+def test_backtest_signals_match_the_live_scan_bar_by_bar():
+    from core.vwap_signal_generator import build_vwap_bounce_signal, scan_vwap_bounce_panel
+    from sim.backtest import LIVE_BARS, bars_from_panel, find_signal_bars
+
+    # A sharp opening rally, then the setup: the rally is older than the live
+    # window, so it must not weigh on the RSI at the setup bar
+    panel = {}
+    for i in range(30):
+        rally = make_bars(30, seed=200 + i)
+        setup = make_bounce_bars(60, seed=i)
+        setup.index = setup.index + pd.Timedelta(minutes=30)
+        climb = setup["close"].iloc[0] - rally["close"].iloc[0] + np.arange(-30, 0) * 2.0
+        rally[["open", "high", "low", "close"]] = rally[["open", "high", "low", "close"]].add(climb, axis=0)
+        after = make_bars(30, seed=100 + i)
+        after.index = after.index + pd.Timedelta(minutes=90)
+        after[["open", "high", "low", "close"]] += setup["close"].iloc[-1] - after["close"].iloc[0]
+        panel[f"S{i}"] = pd.concat([rally, setup, after])
+    bars = bars_from_panel(panel)
+    signals = find_signal_bars(bars)
+
+    # Every bar from 9:45 to 11:30
+    index = panel["S0"].index
+    fired = 0
+    for c in range(15, len(index)):
+        detected = [build_vwap_bounce_signal(symbol, price, vwap) for t, symbol, price, vwap in signals if t == index[c].value]
+        live = scan_vwap_bounce_panel({k: v.iloc[:c + 1] for k, v in panel.items()})
+        assert sorted(detected, key=lambda s: s["symbol"]) == sorted(live, key=lambda s: s["symbol"]), index[c]
+        fired += c >= LIVE_BARS and len(live)
+    assert fired
+
+
+def test_parameter_sweep_matches_the_fill_model_and_ranks_the_grid():
+    from sim.backtest import bars_from_panel, find_signal_bars
+    from sim.simulated_broker import fill_bracket
+    from sim.sweep import candidate_outcomes, run_sweep, score_grid
+
+    panel = {}
+    for i in range(30):
+        setup = make_bounce_bars(50, seed=i)
+        after = make_bars(60, seed=100 + i)
+        after.index = after.index + pd.Timedelta(minutes=50)
+        after[["open", "high", "low", "close"]] += setup["close"].iloc[-1] - after["close"].iloc[0]
+        panel[f"S{i}"] = pd.concat([setup, after])
+    bars = bars_from_panel(panel)
+
+    # With the live constants, the sweep finds the backtest's signals and the same bracket outcomes
+    live = {"rsi_max": [45], "stop_pct": [0.005], "reward_r": [1.5], "volume_window": [10],
+            "start": ["09:45"], "end": ["11:30"]}
+    found = candidate_outcomes(bars, live)
+    signals = find_signal_bars(bars)
+    assert signals and [(t, s) for t, s, _, _ in signals] == list(zip(found["t"], found["symbol"]))
+
+    expected = []
+    for t, symbol, price, vwap in signals:
+        stop = round(vwap * 0.995, 2)
+        fill = fill_bracket(bars[symbol], int(np.searchsorted(bars[symbol]["t"], t)), "buy", price, stop,
+                            round(price + (price - stop) * 1.5, 2))
+        expected.append(fill["pnl_per_share"] / (price - stop) if fill["entry_time"] else np.nan)
+    assert found["r"][:, 0, 0] == pytest.approx(np.array(expected), nan_ok=True)
+
+    row = score_grid(found, live).iloc[0]
+    taken = np.array(expected)[~np.isnan(expected)]
+    assert row["trades"] == len(taken) and row["expectancy"] == pytest.approx(taken.mean())
+    equity = np.cumsum(taken)
+    assert row["max_drawdown_r"] == pytest.approx((np.maximum(np.maximum.accumulate(equity), 0) - equity).max())
+
+    # The full default grid, fanned out to worker processes, scores the same as one process
+    ranked = run_sweep(bars, min_trades=1)
+    assert len(ranked) > 1000 and ranked["expectancy"].is_monotonic_decreasing
+    pd.testing.assert_frame_equal(run_sweep(bars, processes=2, min_trades=1), ranked)
+
+
+# ----------------------------
+# Account state cache
+# ----------------------------
+
+def test_account_cache_reuses_snapshot_until_an_order_is_sent(monkeypatch):
+    bi = pytest.importorskip("core.broker_interface")
+    from types import SimpleNamespace
+
+    calls = {"account": 0, "positions": 0}
+
+    class FakeApi:
+        def get_account(self):
+            calls["account"] += 1
+            return SimpleNamespace(equity="1000", last_equity="1000")
+
+        def list_positions(self):
+            calls["positions"] += 1
+            return [SimpleNamespace(symbol="AAPL", qty="5")]
+
+        def submit_order(self, **kwargs):
+            return SimpleNamespace(id="o1")
+
+    monkeypatch.setattr(bi, "api", FakeApi())
+    monkeypatch.setattr(bi, "account_cache", bi.AccountStateCache(ttl=60))
+
+    for _ in range(3):
+        bi.get_cached_account()
+        assert bi.get_cached_position("AAPL").qty == "5"
+        assert bi.get_cached_position("MSFT") is None
+    assert calls == {"account": 1, "positions": 1}
+
+    bi.submit_bracket_order("AAPL", 1, "buy", 100.0, 99.0, 101.5)
+    bi.get_cached_account()
+    bi.get_cached_position("AAPL")
+    assert calls == {"account": 2, "positions": 2}
+
+
+# ----------------------------
+# Batch risk evaluation
+# ----------------------------
+
+def test_batch_risk_enforces_portfolio_limits_in_confidence_order(monkeypatch):
+    rm = pytest.importorskip("core.risk_manager")
+
+    monkeypatch.setattr(rm, "settings", {
+        "max_daily_loss": 500, "max_position_size": 1000, "max_open_positions": 5,
+        "max_gross_exposure_pct": 0.11, "max_sector_exposure_pct": 0.05,
+    })
+    monkeypatch.setattr(rm, "_sectors", {"AAA": "tech", "BBB": "tech", "CCC": "tech", "HELD": "energy"})
+
+    # $6k already committed: a held position and an unfilled entry
+    snapshot = {"equity": 100_000.0, "pnl_today": 0.0,
+                "positions": {"HELD": (40, 4_000.0)}, "pending": {"WAIT": 2_000.0}}
+    prices = {s: 100.0 for s in ("AAA", "BBB", "CCC", "DDD", "EEE", "HELD")}
+
+    def signal(symbol, confidence):
+        return {"symbol": symbol, "side": "buy", "stop_loss": 90.0, "confidence": confidence}
+
+    signals = [signal("CCC", 0.75), signal("AAA", 0.9), signal("BBB", 0.8), signal("AAA", 0.6),
+               signal("DDD", 0.7), signal("EEE", 0.4), signal("HELD", 0.3), signal("ZZZ", 0.95)]
+    decisions = rm.evaluate_signals(signals, snapshot, prices)
+    reasons = [d["reason"] for d in decisions]
+
+    # 3% of equity per trade at $100 = 30 shares; tech's 5% runs out partway through BBB
+    assert [d["qty"] for d in decisions[1:3]] == [30, 20]
+    assert reasons == [
+        "sector exposure limit",        # CCC: tech is full
+        None, None,
+        "duplicate signal in batch",    # the weaker AAA
+        "max open positions",           # HELD, WAIT, AAA, BBB, CCC take all 5 slots
+        "max open positions",
+        "gross exposure limit",         # HELD's sector has room, the 11% gross budget doesn't
+        "no price",
+    ]
+
+    # a daily loss past the limit blocks the whole batch
+    snapshot["pnl_today"] = -600.0
+    assert not any(d["approved"] for d in rm.evaluate_signals(signals, snapshot, prices))
+
+
+# ----------------------------
+# Universe pre-filter
+# ----------------------------
+
+def test_universe_is_cached_per_day_and_filtered_by_liquidity(tmp_path, monkeypatch):
+    universe = pytest.importorskip("core.universe")
+    today = date(2024, 3, 6)
+    calls = {"assets": 0, "daily": 0}
+
+    def daily_frame(close, volume, days=25):
+        index = pd.date_range(end="2024-03-06 05:00", periods=days, freq="D", tz="UTC", name="timestamp")
+        return pd.DataFrame({"open": close, "high": close, "low": close, "close": close, "volume": volume}, index=index)
+
+    def fake_assets():
+        calls["assets"] += 1
+        return ["BIG", "MID", "THIN", "PENNY", "PRICEY"]
+
+    def fake_daily(symbols, days):
+        calls["daily"] += 1
+        panel = {
+            "BIG": daily_frame(100.0, 1e6),
+            "MID": daily_frame(50.0, 1e5),
+            "THIN": daily_frame(50.0, 1e3),
+            "PENNY": daily_frame(2.0, 1e7),
+            "PRICEY": daily_frame(900.0, 1e6),
+        }
+        # today's partial bar is ignored
+        panel["MID"].iloc[-1, panel["MID"].columns.get_loc("volume")] = 1e9
+        return panel
+
+    monkeypatch.setattr(universe, "get_tradable_symbols", fake_assets)
+    monkeypatch.setattr(universe, "get_daily_bars_batch", fake_daily)
+
+    cache = universe.UniverseCache(str(tmp_path), lookback_days=20)
+    kwargs = dict(min_price=5, max_price=500, min_avg_volume=1e4, max_symbols=None, day=today)
+    assert cache.candidates(**kwargs) == ["BIG", "MID"]
+    assert cache.liquidity(today).loc["MID", "avg_volume"] == pytest.approx(1e5)
+    assert cache.liquidity(today).loc["MID", "days"] == 20
+
+    # same day: served from disk
+    assert universe.UniverseCache(str(tmp_path)).candidates(**kwargs) == ["BIG", "MID"]
+    assert calls == {"assets": 1, "daily": 1}
+
+    # next day: rebuilt, and the previous day's files are dropped
+    cache.candidates(**dict(kwargs, day=date(2024, 3, 7)))
+    assert calls == {"assets": 2, "daily": 2}
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["assets-2024-03-07.json", "liquidity-2024-03-07.csv"]
+
+
+# ----------------------------
+# Request scheduler
+# ----------------------------
+
+def test_scheduler_runs_orders_first_and_stays_under_rate():
+    import threading
+    import time
+    from core.request_scheduler import RequestScheduler, PRIORITY_ORDER, PRIORITY_DATA
+
+    # 600/min = 10/s with a bucket of 60; drain it so later calls are paced
+    scheduler = RequestScheduler(rate_per_minute=600, workers=4, reserve=2)
+    scheduler.bucket.tokens = 0
+    order_lock = threading.Lock()
+    started = []
+
+    def record(name):
+        with order_lock:
+            started.append((name, time.monotonic()))
+        return name
+
+    futures = [scheduler.submit(record, f"data{i}", priority=PRIORITY_DATA) for i in range(5)]
+    order = scheduler.submit(record, "order", priority=PRIORITY_ORDER)
+    began = time.monotonic()
+    assert order.result(timeout=5) == "order"
+    assert [f.result(timeout=5) for f in futures] == [f"data{i}" for i in range(5)]
+
+    names = [name for name, _ in started]
+    assert names[0] == "order"
+    # each data call needs its own token plus the 2-token reserve, refilled at 10/s
+    assert started[-1][1] - began >= 0.6
+    assert scheduler.pending() == 0
+
+
+def test_scheduler_retries_in_the_background_and_trips_the_circuit_breaker():
+    import threading
+    from core.error_handler import CircuitBreaker, CircuitOpenError, DeferredRetries
+    from core.request_scheduler import RequestScheduler
+
+    scheduler = RequestScheduler(rate_per_minute=60000, workers=1, failure_threshold=3,
+                                 reset_timeout=60, retry_base=0.2, retry_cap=0.2)
+    calls = {"get_bars": 0, "get_position": 0}
+
+    def get_bars(fail_times):
+        calls["get_bars"] += 1
+        if calls["get_bars"] <= fail_times:
+            raise ConnectionError("connection reset")
+        return "bars"
+
+    def get_position():
+        calls["get_position"] += 1
+        raise LookupError("position does not exist")
+
+    # the one worker isn't held while a retry waits out its backoff
+    flaky = scheduler.submit(get_bars, 2, retries=2)
+    release = threading.Event()
+    other = scheduler.submit(lambda: release.set() or "other")
+    assert release.wait(timeout=0.15) and other.result(timeout=1) == "other"
+    assert flaky.result(timeout=5) == "bars" and calls["get_bars"] == 3
+
+    # client errors are answers, so they never trip the endpoint's breaker
+    for _ in range(4):
+        with pytest.raises(LookupError):
+            scheduler.call(get_position)
+    assert scheduler.breaker("get_position").state == "closed"
+
+    # three transient failures in a row open it; later calls fail fast without reaching the API
+    calls["get_bars"] = 0
+    with pytest.raises(ConnectionError):
+        scheduler.call(get_bars, 10, retries=2)
+    assert calls["get_bars"] == 3 and scheduler.breaker("get_bars").state == "open"
+    with pytest.raises(CircuitOpenError):
+        scheduler.call(get_bars, 0)
+    assert calls["get_bars"] == 3
+
+    # after the reset timeout one probe goes through: failure reopens, success closes
+    now = [0.0]
+    breaker = CircuitBreaker("get_bars", failure_threshold=1, reset_timeout=30, clock=lambda: now[0])
+    breaker.record_failure()
+    assert breaker.is_open() and breaker.retry_after() == 30
+    now[0] = 30
+    assert not breaker.is_open() and breaker.allow() and not breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == "open" and not breaker.allow()
+    now[0] = 60
+    assert breaker.allow()
+    breaker.record_success()
+    assert breaker.state == "closed" and breaker.allow() and breaker.allow()
+
+    # deferred symbols come back after their backoff, and are dropped after max_attempts failures
+    retries = DeferredRetries(base=2, cap=30, max_attempts=1)
+    assert retries.defer(["AAPL", "MSFT"], now=100) == []
+    assert 100 <= retries.next_due() <= 102 and sorted(retries.pop_due(now=102)) == ["AAPL", "MSFT"]
+    assert len(retries) == 0 and retries.next_due() is None
+    retries.clear(["MSFT"])
+    assert retries.defer(["AAPL", "MSFT"], now=200) == ["AAPL"]
+    assert retries.pop_due(now=199) == [] and retries.pop_due(now=204) == ["MSFT"]
+
+
+# ----------------------------
+# Metrics
+# ----------------------------
+
+def test_metrics_endpoint_feeds_dashboard():
+    import urllib.request
+    from core import metrics
+    from monitoring.monitoring_dashboard import parse_metrics, histograms, quantile, render
+
+    hist = metrics.Histogram("t_seconds", "test", ["stage"], buckets=(0.01, 0.1, 1.0))
+    for value in (0.005, 0.05, 0.05, 0.5):
+        hist.observe(value, stage="risk_check")
+    errors = metrics.Counter("t_errors_total", "test", ["endpoint"])
+    errors.inc(endpoint="get_bars")
+
+    registry = metrics.Registry()
+    registry.register(hist)
+    registry.register(errors)
+    text = registry.render()
+    assert 't_seconds_bucket{stage="risk_check",le="0.1"} 3' in text
+    assert 't_seconds_bucket{stage="risk_check",le="+Inf"} 4' in text
+
+    samples = parse_metrics(text)
+    group = histograms(samples, "t_seconds", "stage")["risk_check"]
+    assert group["count"] == 4 and group["sum"] == pytest.approx(0.605)
+    assert 0.01 <= quantile(group["buckets"], 0.5) <= 0.1
+
+    # the live registry is served over HTTP and renders without errors
+    with metrics.timed("risk_check"):
+        pass
+    metrics.record_api_call("get_bars", 0.02, failed=True)
+    server = metrics.start_metrics_server(0)
+    try:
+        url = f"http://127.0.0.1:{server.server_address[1]}/metrics"
+        body = urllib.request.urlopen(url, timeout=5).read().decode()
+    finally:
+        server.shutdown()
+    report = render(parse_metrics(body))
+    assert "risk_check" in report and "get_bars" in report
+
+
+# ----------------------------
+# Signal pipeline
+# ----------------------------
+
+def test_pipeline_keeps_scanner_unblocked_under_a_signal_burst(monkeypatch):
+    import threading
+    import time
+    pipeline_mod = pytest.importorskip("core.pipeline")
+
+    release = threading.Event()
+    submitted, journaled = [], []
+
+    def fake_prepare(signals, pending):
+        return [{"symbol": signal["symbol"], "qty": 1, "entry_price": 10.0} for signal in signals]
+
+    def fake_submit(ticket):
+        release.wait(5)  # a slow broker
+        submitted.append(ticket["symbol"])
+        return type("Order", (), {"id": f"o-{ticket['symbol']}"})()
+
+    monkeypatch.setattr(pipeline_mod, "prepare_orders", fake_prepare)
+    monkeypatch.setattr(pipeline_mod, "submit_prepared_order", fake_submit)
+    monkeypatch.setattr(pipeline_mod, "journal_order", lambda ticket, order: journaled.append(order.id))
+
+    pipeline = pipeline_mod.SignalPipeline(risk_workers=1, order_workers=1, queue_size=2,
+                                           signal_policy=pipeline_mod.DROP_OLDEST).start()
+    try:
+        began = time.perf_counter()
+        accepted = [pipeline.submit({"symbol": f"S{i}"}) for i in range(20)]
+        assert time.perf_counter() - began < 0.5  # the scanner never waited on the broker
+        assert all(accepted)
+
+        # a symbol already in flight isn't submitted twice
+        assert not pipeline.submit({"symbol": "S19"})
+
+        release.set()
+        assert pipeline.drain(timeout=5)
+    finally:
+        pipeline.stop(timeout=5)
+
+    # the blocked stages kept what they had; the risk queue shed its oldest signals
+    assert "S19" in submitted
+    assert len(submitted) < 20
+    assert sorted(journaled) == sorted(f"o-{s}" for s in submitted)
+    assert not pipeline.in_flight()
+
+
+# ----------------------------
+# External signal receiver
+# ----------------------------
+
+def test_signal_receiver_validates_dedups_batches_and_sheds():
+    import json
+    import threading
+    import urllib.error
+    import urllib.request
+    from scanner_hooks.signal_receiver import SignalReceiver
+
+    def post(receiver, payload):
+        request = urllib.request.Request(f"{receiver.url}/signals", data=json.dumps(payload).encode(),
+                                         headers={"Content-Type": "application/json"})
+        try:
+            with urllib.request.urlopen(request, timeout=5) as response:
+                return response.status, json.loads(response.read())
+        except urllib.error.HTTPError as e:
+            return e.code, json.loads(e.read())
+
+    batches = []
+    receiver = SignalReceiver(batches.append, batch_size=50).start()
+    try:
+        signals = [{"symbol": f"s{i}", "side": "buy", "stop_loss": 10.0 + i, "confidence": 0.7} for i in range(120)]
+        status, result = post(receiver, signals + [signals[0], {"symbol": "X", "side": "sell", "stop_loss": 1}])
+        assert status == 202
+        assert (result["accepted"], result["duplicate"]) == (120, 1)
+        # no sell-side brackets yet, so a sell would only be rejected by the broker
+        assert result["invalid"] == [{"index": 121, "error": "side must be buy"}]
+        assert post(receiver, {"symbol": "Y"})[0] == 400
+    finally:
+        receiver.stop()
+    handed = [signal for batch in batches for signal in batch]
+    assert [s["symbol"] for s in handed] == [f"S{i}" for i in range(120)]
+    assert handed[0] == {"symbol": "S0", "side": "buy", "stop_loss": 10.0, "confidence": 0.7, "setup_tag": "External"}
+    assert max(len(batch) for batch in batches) <= 50
+
+    # A stalled execution path fills the queue; what doesn't fit is shed, not waited on
+    release = threading.Event()
+    receiver = SignalReceiver(lambda batch: release.wait(5), queue_size=10, batch_size=1).start()
+    try:
+        status, result = post(receiver, [{"symbol": f"A{i}", "side": "buy", "stop_loss": 5} for i in range(30)])
+        assert status == 202 and (result["accepted"], result["shed"]) == (10, 20)
+        # the consumer holds at most one signal, so this fills the queue again
+        post(receiver, [{"symbol": "B", "side": "buy", "stop_loss": 5}])
+        status, result = post(receiver, [{"symbol": f"C{i}", "side": "buy", "stop_loss": 5} for i in range(5)])
+        assert status == 503 and result["shed"] == 5
+    finally:
+        release.set()
+        receiver.stop()
+
+
+def test_external_buy_with_stop_above_the_price_is_blocked(monkeypatch):
+    rm = pytest.importorskip("core.risk_manager")
+
+    monkeypatch.setattr(rm, "settings", {"max_daily_loss": 500, "max_position_size": 1000})
+    snapshot = {"equity": 100_000.0, "pnl_today": 0.0, "positions": {}, "pending": {}}
+    signals = [{"symbol": "AAPL", "side": "buy", "stop_loss": 110}, {"symbol": "MSFT", "side": "buy", "stop_loss": 90}]
+    above, below = rm.evaluate_signals(signals, snapshot, {"AAPL": 100.0, "MSFT": 100.0})
+    assert (above["approved"], above["qty"], above["reason"]) == (False, 0, "stop above entry")
+    assert below["approved"] and below["qty"] == 30
+
+
+# ----------------------------
+# Offline benchmark backends
+# ----------------------------
+
+def test_fake_alpaca_and_journal_drive_the_real_code_paths():
+    pytest.importorskip("core.broker_interface")
+    from sim.benchmark import offline_backends, bench_close_check
+    from sim.fake_alpaca import FakeAlpacaServer, fake_symbols
+    from sim.fake_journal import FakeJournalDB
+    from core.broker_interface import get_bars_batch, list_positions
+    from core.execution_engine import process_signal
+    from core.journal_logger import flush_journal
+
+    symbols = fake_symbols(30)
+    server = FakeAlpacaServer(symbols, closed_orders=12).start()
+    journal = FakeJournalDB()
+    try:
+        with offline_backends(server, journal):
+            # bars come back paginated for every symbol
+            panel = get_bars_batch(symbols, batch_size=10)
+            assert sorted(panel) == symbols
+            assert all(len(frame) == 50 for frame in panel.values())
+
+            # a signal goes through risk, sizing and a bracket order into the journal
+            price = float(panel[symbols[0]]["close"].iloc[-1])
+            order = process_signal({"symbol": symbols[0], "side": "buy", "stop_loss": round(price * 0.97, 2)})
+            assert order is not None and order.status == "filled"
+            assert symbols[0] in list_positions()
+            assert flush_journal(5)
+            assert [row["order_id"] for row in journal.rows.values()] == [order.id]
+
+            # every seeded bracket has exited, so the close check closes all of them
+            bench_close_check(symbols, journal, trades=12)
+            assert [t[1] for t in journal.open_trades()] == [symbols[0]]
+    finally:
+        server.stop()
+
+
+# ----------------------------
+# Lazy startup
+# ----------------------------
+
+def test_close_checker_starts_outside_repo_root_without_heavy_imports(tmp_path):
+    import os
+    import subprocess
+    import sys
+    from sim.benchmark import ROOT
+
+    code = (
+        "import sys, threading, close_checker, core.broker_interface as bi\n"
+        "heavy = [m for m in ('pandas', 'ta', 'alpaca_trade_api') if m in sys.modules]\n"
+        "threads = [t.name for t in threading.enumerate() if t is not threading.main_thread()]\n"
+        "print(heavy, threads, bi.settings.get('max_daily_loss') is not None)"
+    )
+    out = subprocess.run([sys.executable, "-c", code], cwd=tmp_path, env=dict(os.environ, PYTHONPATH=ROOT),
+                         capture_output=True, text=True)
+    assert out.returncode == 0, out.stderr
+    # nothing (broker dispatcher, journal writer) runs until it's first used
+    assert out.stdout.strip().splitlines()[-1] == "[] [] True"
+
+
+# ----------------------------
+# Write-behind journal
+# ----------------------------
+
+def test_journal_spools_until_flushed_and_recovers(tmp_path, monkeypatch):
+    from contextlib import contextmanager
+    jl = pytest.importorskip("core.journal_logger")
+
+    written = []
+
+    class FakeConn:
+        def cursor(self):
+            return self
+        def __enter__(self):
+            return self
+        def __exit__(self, *exc):
+            return False
+        def commit(self):
+            pass
+        def rollback(self):
+            pass
+
+    @contextmanager
+    def fake_connection():
+        yield FakeConn()
+
+    def fake_execute_values(cur, sql, rows, fetch=False, **kw):
+        rows = list(rows)
+        written.append((sql.split()[0], rows))
+        # the inserted row comes back; the update's ref 7 isn't an open row, so nothing does
+        return (rows if sql.split()[0] == "INSERT" else []) if fetch else None
+
+    monkeypatch.setattr(jl, "_connection", fake_connection)
+    monkeypatch.setattr(jl, "execute_values", fake_execute_values)
+
+    spool = str(tmp_path / "spool.jsonl")
+    writer = jl.JournalWriter(spool, batch_size=50, flush_interval=0.01)
+    writer._ensure_started = lambda: None  # the process dies before its writer thread runs
+    trade = {"symbol": "AAPL", "qty": 3, "entry_price": 100.0, "stop_loss": 99.0, "risk_amount": 3.0}
+    writer.submit("insert", jl._insert_row(trade))
+    writer.submit("update", jl._update_row({"ref": 7, "sell_date": date.today(), "sell_price": 101.0,
+                                             "net_pnl": 3.0, "net_roi": 1.0}))
+    assert not writer.flush(timeout=0.1)
+
+    # A new process replays the spool; flush() writes it without waiting out the flush interval
+    recovered = jl.JournalWriter(spool, batch_size=50, flush_interval=30)
+    assert recovered.recover() == 2
+    assert recovered.flush(timeout=5)
+    assert [kind for kind, _ in written] == ["INSERT", "UPDATE", "INSERT"]
+    assert written[0][1][0][1] == "AAPL" and written[1][1][0][0] == 7
+    assert written[2][1][0][1:] == ("", -1.0, 1, 300.0, 3.0)  # the opened-trades rollup
+    assert open(spool).read() == ""
+
+
+def test_journal_retries_outages_and_dead_letters_rejected_rows(tmp_path, monkeypatch):
+    import json
+    from contextlib import contextmanager
+    jl = pytest.importorskip("core.journal_logger")
+    import psycopg2
+
+    class FakeConn:
+        def cursor(self):
+            return self
+        def __enter__(self):
+            return self
+        def __exit__(self, *exc):
+            return False
+        def commit(self):
+            pass
+        def rollback(self):
+            pass
+        def execute(self, sql):
+            raise psycopg2.ProgrammingError("permission denied for table trades")
+
+    # a pool whose schema setup fails is never kept as ready
+    class FakePool:
+        closed = False
+        def __init__(self, *args, **kwargs):
+            pass
+        def getconn(self):
+            return FakeConn()
+        def putconn(self, conn):
+            pass
+        def closeall(self):
+            FakePool.closed = True
+
+    monkeypatch.setattr(jl, "_pool", None)
+    monkeypatch.setattr(jl, "ThreadedConnectionPool", FakePool)
+    monkeypatch.setattr(jl, "db_params", dict)
+    with pytest.raises(psycopg2.ProgrammingError):
+        with jl._connection():
+            pass
+    assert jl._pool is None and FakePool.closed
+
+    outages = [psycopg2.OperationalError("server closed the connection unexpectedly")]
+    written = []
+
+    @contextmanager
+    def fake_connection():
+        if outages:
+            raise outages.pop()
+        yield FakeConn()
+
+    def fake_execute_values(cur, sql, rows, fetch=False, **kw):
+        rows = list(rows)
+        if sql.split()[:3] == ["INSERT", "INTO", "trades"] and any(row[1] == "BAD" for row in rows):
+            raise psycopg2.DataError("invalid input syntax for type numeric")
+        written.append((sql.split()[2], rows))
+        return [] if fetch else None
+
+    monkeypatch.setattr(jl, "_connection", fake_connection)
+    monkeypatch.setattr(jl, "execute_values", fake_execute_values)
+
+    spool, dead = str(tmp_path / "spool.jsonl"), str(tmp_path / "dead.jsonl")
+    writer = jl.JournalWriter(spool, batch_size=50, flush_interval=0.01, dead_letter_path=dead)
+    rows = [jl._insert_row({"symbol": symbol, "qty": 1, "entry_price": 10.0, "risk_amount": 1.0})
+            for symbol in ("AAPL", "BAD", "MSFT", "NVDA")]
+    writer.submit_many("insert", rows)
+    assert writer.flush(timeout=10)
+
+    # the outage was waited out, the rejected row set aside, and everything else written
+    assert not outages
+    assert sorted(row[1] for table, batch in written if table == "trades" for row in batch) == ["AAPL", "MSFT", "NVDA"]
+    [letter] = [json.loads(line) for line in open(dead)]
+    assert letter["op"] == "insert" and letter["row"][1] == "BAD" and "numeric" in letter["error"]
+    assert open(spool).read() == ""
+
+
+def test_journal_replay_after_a_failed_commit_writes_each_trade_once(tmp_path, monkeypatch):
+    jl = pytest.importorskip("core.journal_logger")
+    import psycopg2
+    from sim.fake_journal import FakeJournalDB, _FakeConnection
+
+    # the rows are applied, then the connection drops before the commit is acknowledged
+    drops = [psycopg2.OperationalError("server closed the connection unexpectedly")]
+    def commit(self):
+        if drops:
+            raise drops.pop()
+    monkeypatch.setattr(_FakeConnection, "commit", commit)
+
+    db = FakeJournalDB()
+    with db.installed(str(tmp_path)):
+        jl.log_trade({"symbol": "AAPL", "qty": 10, "entry_price": 100.0, "stop_loss": 98.0, "risk_amount": 20.0,
+                      "order_id": "o-1"})
+        jl.log_trade({"symbol": "MSFT", "qty": 5, "entry_price": 50.0, "stop_loss": 49.0, "risk_amount": 5.0})
+        assert jl.flush_journal(10)
+
+    assert not drops
+    assert sorted(r["symbol"] for r in db.rows.values()) == ["AAPL", "MSFT"]
+    assert list(db.rollups["rollup_opened"].values()) == [(2, 1250.0, 25.0)]
+
+
+def test_rollups_track_journal_writes_and_match_a_full_rebuild(tmp_path):
+    jl = pytest.importorskip("core.journal_logger")
+    from core import trade_rollups
+    from sim.fake_journal import FakeJournalDB
+
+    db = FakeJournalDB()
+    rng = np.random.default_rng(3)
+    with db.installed(str(tmp_path)):
+        for i in range(60):
+            jl.log_trade({"symbol": f"S{i}", "qty": 10, "entry_price": 50.0, "stop_loss": 49.0, "risk_amount": 10.0,
+                          "setup_tag": ["VWAP Bounce", "Breakout"][i % 2],
+                          "confidence_score": None if i % 7 == 0 else round(float(rng.uniform(0.5, 1.0)), 2)})
+        jl.flush_journal()
+        pnls = rng.normal(2, 15, 40).round(2)
+        updates = [{"ref": ref, "sell_date": date.today(), "sell_price": 50.0, "net_pnl": float(pnl), "net_roi": 0.0}
+                   for ref, pnl in zip(sorted(db.rows)[:40], pnls)]
+        assert jl.update_closed_trades(updates)
+        assert jl.update_closed_trades(updates[:5])  # replayed close-outs aren't counted twice
+
+        by_setup = trade_rollups.pnl_by_setup()
+        by_confidence = trade_rollups.win_rate_by_confidence()
+        r_counts = trade_rollups.r_distribution(setup_tag="Breakout")
+
+        # brute force over the trades table
+        closed = [r for r in db.rows.values() if r.get("sell_date") is not None]
+        for tag in ("VWAP Bounce", "Breakout"):
+            rows = [r for r in closed if r["setup_tag"] == tag]
+            assert by_setup[tag]["opened"] == 30
+            assert by_setup[tag]["closed"] == len(rows)
+            assert by_setup[tag]["net_pnl"] == pytest.approx(sum(r["net_pnl"] for r in rows))
+            assert by_setup[tag]["wins"] == sum(r["net_pnl"] > 0 for r in rows)
+        assert sum(b["closed"] for b in by_confidence.values()) == 40
+        assert by_confidence[trade_rollups.UNKNOWN_CONFIDENCE]["closed"] == sum(
+            r["confidence_score"] is None for r in closed)
+        assert sum(r_counts.values()) == by_setup["Breakout"]["closed"]
+
+        # rebuilding from the trades table reproduces the incremental rollups
+        incremental = {t: dict(rows) for t, rows in db.rollups.items()}
+        assert trade_rollups.rebuild_rollups() == 60
+        assert {t: set(rows) for t, rows in db.rollups.items()} == {t: set(rows) for t, rows in incremental.items()}
+        for table, rows in db.rollups.items():
+            for key, values in rows.items():
+                assert values == pytest.approx(incremental[table][key])
+
+
+def test_trades_export_to_parquet_in_chunks(tmp_path):
+    pq = pytest.importorskip("pyarrow.parquet")
+    jl = pytest.importorskip("core.journal_logger")
+    from core.trade_rollups import export_trades
+    from sim.fake_journal import FakeJournalDB
+
+    with FakeJournalDB().installed(str(tmp_path)):
+        for i in range(60):
+            jl.log_trade({"symbol": f"S{i}", "qty": 10, "entry_price": 50.0, "stop_loss": 49.0, "risk_amount": 10.0})
+        assert export_trades(str(tmp_path / "trades.parquet"), chunk_rows=25) == 60
+
+    table = pq.read_table(str(tmp_path / "trades.parquet"))
+    assert table.num_rows == 60 and table.column("symbol").to_pylist()[-1] == "S59"
+
+
+# ----------------------------
+# Close checker reconciliation
+# ----------------------------
+
+def test_close_checker_matches_bracket_legs_in_one_pass(monkeypatch):
+    close_checker = pytest.importorskip("close_checker")
+    from alpaca_trade_api.entity import Order
+
+    def order(id, symbol, side, status, price=None, legs=None, filled_at="2024-03-04T15:40:00Z"):
+        return Order({"id": id, "symbol": symbol, "side": side, "status": status, "filled_qty": "10",
+                      "filled_avg_price": price, "filled_at": filled_at, "legs": legs or []})
+
+    history = [
+        # bracket whose take-profit leg filled
+        order("p1", "AAPL", "buy", "filled", "100", legs=[
+            {"id": "tp1", "symbol": "AAPL", "side": "sell", "status": "filled", "filled_avg_price": "103.0",
+             "filled_at": "2024-03-04T16:00:00Z"},
+            {"id": "sl1", "symbol": "AAPL", "side": "sell", "status": "canceled", "filled_avg_price": None,
+             "filled_at": None}]),
+        # bracket still working
+        order("p2", "MSFT", "buy", "filled", "400", legs=[
+            {"id": "tp2", "symbol": "MSFT", "side": "sell", "status": "new", "filled_avg_price": None,
+             "filled_at": None}]),
+        # plain exit for a journal row with no order id
+        order("x3", "NVDA", "sell", "filled", "51.5"),
+    ] + [order(f"n{i}", "TSLA", "buy", "canceled") for i in range(20)]
+
+    open_trades = [
+        {"ref": 1, "symbol": "AAPL", "qty": 10, "buy_price": 100.0, "date": date(2024, 3, 4), "order_id": "p1"},
+        {"ref": 2, "symbol": "MSFT", "qty": 2, "buy_price": 400.0, "date": date(2024, 3, 4), "order_id": "p2"},
+        {"ref": 3, "symbol": "NVDA", "qty": 4, "buy_price": 50.0, "date": date(2024, 3, 4), "order_id": None},
+        {"ref": 4, "symbol": "AMD", "qty": 1, "buy_price": 90.0, "date": date(2024, 3, 4), "order_id": "p9"},
+    ]
+    applied = []
+    monkeypatch.setattr(close_checker, "get_open_trades", lambda: open_trades)
+    monkeypatch.setattr(close_checker, "list_positions", lambda: {"MSFT": object()})
+    monkeypatch.setattr(close_checker, "list_closed_orders", lambda after: history)
+    monkeypatch.setattr(close_checker, "update_closed_trades", applied.extend)
+
+    close_checker.check_for_closed_trades()
+
+    assert [(u["ref"], u["sell_price"], u["net_pnl"]) for u in applied] == [(1, 103.0, 30.0), (3, 51.5, 6.0)]
+    assert applied[0]["sell_date"] == date(2024, 3, 4)
+
+
+def test_order_ledger_closes_trades_from_streamed_fills_and_recovers(tmp_path, monkeypatch):
+    import time
+    import threading
+    close_checker = pytest.importorskip("close_checker")
+    from core.order_ledger import OrderLedger, TradeUpdateStream
+    from sim.trade_update_server import TradeUpdateServer, bracket_updates
+
+    wal = str(tmp_path / "ledger.wal")
+    ledger = OrderLedger(wal, checkpoint_every=5)
+    closed = []
+    server = TradeUpdateServer().start()
+    listener = TradeUpdateStream(ledger, on_close=closed.append, base_url=server.url)
+    thread = threading.Thread(target=listener.run, daemon=True)
+    thread.start()
+    try:
+        assert server.subscribed.wait(timeout=10)
+        server.publish(*bracket_updates("p1", "AAPL", 10, 100.0, 103.0))
+        server.publish(*bracket_updates("p2", "MSFT", 2, 400.0, 398.0, exit_leg="stop_loss")[:2])
+        deadline = time.time() + 10
+        while listener.updates_received < 6 and time.time() < deadline:
+            time.sleep(0.02)
+    finally:
+        listener.stop()
+        thread.join(timeout=10)
+        server.stop()
+        ledger.close()
+
+    assert closed == ["p1"]
+    assert ledger.exit_fill("p1") == {"order_id": "p1-tp", "symbol": "AAPL", "price": 103.0, "qty": 10.0,
+                                      "filled_at": "2024-03-04T16:00:00Z"}
+    assert ledger.exit_fill("p2") is None and ledger.positions() == {"MSFT": 2.0}
+
+    # a restart rebuilds the same state from the snapshot plus the log after it
+    recovered = OrderLedger(wal).recover()
+    assert recovered.exit_fill("p1") == ledger.exit_fill("p1")
+    assert recovered.order("p2")["status"] == "filled" and recovered.positions() == ledger.positions()
+
+    # trades the ledger knows need no broker calls; the rest still go through the order history
+    def no_polling(*args, **kwargs):
+        raise AssertionError("polled the broker for a trade the ledger knows")
+
+    open_trades = [
+        {"ref": 1, "symbol": "AAPL", "qty": 10, "buy_price": 100.0, "date": date(2024, 3, 4), "order_id": "p1"},
+        {"ref": 2, "symbol": "MSFT", "qty": 2, "buy_price": 400.0, "date": date(2024, 3, 4), "order_id": "p2"},
+    ]
+    applied = []
+    monkeypatch.setattr(close_checker, "get_open_trades", lambda: open_trades)
+    monkeypatch.setattr(close_checker, "list_positions", no_polling)
+    monkeypatch.setattr(close_checker, "list_closed_orders", no_polling)
+    monkeypatch.setattr(close_checker, "update_closed_trades", applied.extend)
+
+    close_checker.check_for_closed_trades(recovered)
+    assert [(u["ref"], u["sell_price"], u["net_pnl"], u["sell_date"]) for u in applied] == [
+        (1, 103.0, 30.0, date(2024, 3, 4))]
+
+
+def test_periodic_close_check_polls_exits_missed_during_a_stream_gap(monkeypatch):
+    close_checker = pytest.importorskip("close_checker")
+    from alpaca_trade_api.entity import Order
+    from core.order_ledger import OrderLedger
+    from sim.trade_update_server import bracket_updates
+
+    # the entry fill streamed in, then the stream dropped before the stop leg filled
+    ledger = OrderLedger()
+    for update in bracket_updates("p2", "MSFT", 2, 400.0, 398.0, exit_leg="stop_loss")[:2]:
+        ledger.apply(update)
+    assert ledger.exit_fill("p2") is None
+
+    history = [Order({"id": "p2", "symbol": "MSFT", "side": "buy", "status": "filled", "filled_qty": "2",
+                      "filled_avg_price": "400", "filled_at": "2024-03-04T15:40:00Z", "legs": [
+                          {"id": "p2-sl", "symbol": "MSFT", "side": "sell", "status": "filled",
+                           "filled_avg_price": "398.0", "filled_at": "2024-03-04T16:00:00Z"}]})]
+    open_trades = [
+        {"ref": 2, "symbol": "MSFT", "qty": 2, "buy_price": 400.0, "date": date(2024, 3, 4), "order_id": "p2"},
+    ]
+    applied = []
+    monkeypatch.setattr(close_checker, "get_open_trades", lambda: open_trades)
+    monkeypatch.setattr(close_checker, "list_positions", lambda: {})
+    monkeypatch.setattr(close_checker, "list_closed_orders", lambda after: history)
+    monkeypatch.setattr(close_checker, "update_closed_trades", applied.extend)
+
+    # a streamed close leaves it to the ledger; the periodic pass asks the broker
+    close_checker.check_for_closed_trades(ledger)
+    assert applied == []
+    close_checker.check_for_closed_trades(ledger, poll_open=True)
+    assert [(u["ref"], u["sell_price"], u["net_pnl"]) for u in applied] == [(2, 398.0, -4.0)]
+
+# ----------------------------
+# Background logging
+# ----------------------------
+
+def test_background_logging_samples_hot_lines_and_records_trade_events(tmp_path):
+    import logging
+    from core.logging_setup import SampleFilter, setup_logging, stop_logging, log_event, read_events
+
+    sampler = SampleFilter(interval=60)
+
+    def record(created, msg="No bar data for AAPL", key="no_bars"):
+        rec = logging.LogRecord("scanner", logging.INFO, __file__, 1, msg, None, None)
+        rec.created = created
+        if key is not None:
+            rec.sample = key
+        return rec
+
+    passed = [rec for rec in (record(0), record(1), record(2), record(3, key="signal"), record(4, key=None),
+                              record(61), record(62)) if sampler.filter(rec)]
+    assert [rec.getMessage() for rec in passed] == [
+        "No bar data for AAPL", "No bar data for AAPL", "No bar data for AAPL",
+        "No bar data for AAPL (+2 similar in the last 60s)"]
+
+    root = logging.getLogger()
+    saved = root.handlers[:], root.level
+    log_path = tmp_path / "events.jsonl"
+    try:
+        setup_logging(level="INFO", event_log=str(log_path), sample_seconds=60)
+        logging.getLogger("scanner").info("not an event")
+        log_event("signal", symbol="AAPL", side="buy", stop_loss=99.5)
+        log_event("risk", symbol="AAPL", approved=True, qty=np.int64(10))
+    finally:
+        stop_logging()
+        root.handlers[:], _ = saved
+        root.setLevel(saved[1])
+
+    assert [(e["event"], e["symbol"]) for e in read_events(log_path)] == [("signal", "AAPL"), ("risk", "AAPL")]
+    assert [e["qty"] for e in read_events(log_path, kinds={"risk"})] == ["10"]
+    # once stopped, events are dropped rather than queued for a listener that's gone
+    log_event("order", symbol="AAPL")
+    assert len(list(read_events(log_path))) == 2